@@ -0,0 +1,275 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import temperature_analyzer_web as analisador
+
+# Benchmark com dados sintéticos: gera arquivos SITRAD, DATALOGGER e ENERGIA de vários tamanhos, mede cada etapa
+# (leitura, filtros, estatísticas, gráfico, relatório e faixas) separadamente e compara com um resultado de referência
+MODOS = ["SITRAD", "DATALOGGER", "ENERGIA"]
+LINHAS_PADRAO = [10000, 100000, 1000000]
+ABAS_SITRAD = 3
+EXTRAS_SITRAD = 2
+TRAFOS_ENERGIA = 3
+INTERVALO_MODO = {"SITRAD": "60s", "DATALOGGER": "300s", "ENERGIA": "1s"}
+FRACAO_AUSENTES = 0.002
+FAIXAS_BENCHMARK = 4
+TOLERANCIA_PADRAO = 0.25
+TEMPO_MINIMO_COMPARACAO = 0.05  # abaixo disso a variação é ruído
+VERSAO_RESULTADOS = 1
+REFERENCIA_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_referencia.json")
+
+def serie_temperatura(rng, n, passo_s, media=4.0, amplitude=3.0):
+    # ciclo diário, degelos periódicos e ruído, com alguns valores ausentes
+    t = np.arange(n, dtype=np.float64) * passo_s
+    valores = media + amplitude * np.sin(2 * np.pi * t / 86400) + rng.normal(0, 0.4, n)
+    valores += np.where((t % 21600) < 1200, 6.0, 0.0)
+    valores[rng.random(n) < FRACAO_AUSENTES] = np.nan
+    return np.round(valores, 1)
+
+def datas_sinteticas(n, freq, inicio="2024-01-01"):
+    return pd.date_range(inicio, periods=n, freq=freq)
+
+def gerar_sitrad(destino, n, rng):
+    # várias abas (um instrumento por aba), cada uma com Temperatura e colunas extras, respeitando o limite de linhas do Excel
+    abas = max(ABAS_SITRAD, -(-n // (analisador.LIMITE_LINHAS_EXCEL - 1)))
+    passo = pd.Timedelta(INTERVALO_MODO["SITRAD"]).total_seconds()
+    planilhas = []
+    for i, tamanho in enumerate(np.diff(np.linspace(0, n, abas + 1).astype(int))):
+        dados = {"Data/Hora": datas_sinteticas(tamanho, INTERVALO_MODO["SITRAD"]), "Temperatura": serie_temperatura(rng, tamanho, passo, media=-18.0 if i % 2 else 4.0)}
+        for j in range(EXTRAS_SITRAD):
+            dados[f"Extra {j + 1}"] = serie_temperatura(rng, tamanho, passo, media=10.0 * (j + 1), amplitude=1.0)
+        planilhas.append((f"Instrumento {i + 1}", pd.DataFrame(dados)))
+    analisador.escrever_xlsx(destino, planilhas)
+
+def gerar_datalogger(destino, n, rng):
+    # a primeira aba é um resumo; os dados ficam na segunda, com uma coluna de índice antes de Data/Hora
+    passo = pd.Timedelta(INTERVALO_MODO["DATALOGGER"]).total_seconds()
+    umidade = np.clip(60 + 15 * np.sin(2 * np.pi * np.arange(n) * passo / 86400 + 1.0) + rng.normal(0, 2, n), 0, 100).round(1)
+    dados = pd.DataFrame({"Nº": np.arange(1, n + 1), "Data/Hora": datas_sinteticas(n, INTERVALO_MODO["DATALOGGER"]), "Temperatura": serie_temperatura(rng, n, passo), "Umidade": umidade})
+    resumo = pd.DataFrame({"Campo": ["Modelo", "Registros", "Intervalo"], "Valor": ["Sintético", str(n), INTERVALO_MODO["DATALOGGER"]]})
+    analisador.escrever_xlsx(destino, [("Resumo", resumo)] + analisador.abas_dados(dados))
+
+def gerar_energia(destino, n, rng):
+    # epoch em milissegundos e potências com carga diária, gravados em blocos
+    inicio = int(pd.Timestamp("2024-01-01", tz=analisador.FUSO_ENERGIA).timestamp() * 1000)
+    passo_ms = int(pd.Timedelta(INTERVALO_MODO["ENERGIA"]).total_seconds() * 1000)
+    with open(destino, "w", encoding="utf-8", newline="") as f:
+        for i in range(0, n, analisador.LINHAS_POR_BLOCO):
+            m = min(analisador.LINHAS_POR_BLOCO, n - i)
+            t = np.arange(i, i + m, dtype=np.int64)
+            carga = 0.6 + 0.4 * np.sin(2 * np.pi * t * passo_ms / 86400000 - np.pi / 2)
+            dados = {"timestamp": inicio + t * passo_ms, "Potência": np.round(50000 * carga + rng.normal(0, 1500, m), 1)}
+            for j in range(TRAFOS_ENERGIA):
+                dados[f"Potência Trafo {j + 2}"] = np.round(20000 * carga + rng.normal(0, 800, m), 1)
+            pd.DataFrame(dados).to_csv(f, index=False, header=i == 0)
+
+GERADORES = {"SITRAD": (gerar_sitrad, ".xlsx"), "DATALOGGER": (gerar_datalogger, ".xlsx"), "ENERGIA": (gerar_energia, ".csv")}
+
+def arquivo_sintetico(diretorio, modo, n, semente=0):
+    # arquivos gerados são reaproveitados entre execuções (mesma semente, mesmo conteúdo)
+    gerador, extensao = GERADORES[modo]
+    caminho = os.path.join(diretorio, f"{modo.lower()}_{n}_{semente}{extensao}")
+    if not os.path.exists(caminho):
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        gerador(temporario, n, np.random.default_rng(semente))
+        os.replace(temporario, caminho)
+    return caminho
+
+def medir(funcao, repeticoes=1, memoria=True, preparar=None):
+    # tempo: menor e mediana das repetições sem tracemalloc; memória: pico numa execução separada com tracemalloc
+    tempos = []
+    resultado = None
+    for _ in range(max(repeticoes, 1)):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    pico = None
+    if memoria:
+        if preparar:
+            preparar()
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return resultado, {"tempo": round(min(tempos), 6), "tempo_mediana": round(statistics.median(tempos), 6), "repeticoes": len(tempos), "pico_memoria": pico}
+
+def faixas_benchmark(df, quantidade=FAIXAS_BENCHMARK):
+    datas = df["DataHora"].dropna()
+    limites = pd.date_range(datas.iloc[0], datas.iloc[-1], periods=quantidade + 1)  # horário local, como digitado na interface
+    return [{"nome": f"Faixa {i + 1}", "inicio": limites[i].strftime("%Y/%m/%d %H:%M:%S"), "fim": limites[i + 1].strftime("%Y/%m/%d %H:%M:%S")} for i in range(quantidade)]
+
+def executar_modo(caminho, modo, formato="xlsx", repeticoes=1, memoria=True, cache_dir=None):
+    etapas = []
+
+    def registrar(etapa, medicao, **detalhes):
+        etapas.append({"etapa": etapa, **medicao, "detalhes": detalhes})
+
+    # leitura a frio (sem cache em disco) e leitura do cache parquet, como na ingestão da página
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix="benchmark_cache_")
+    analisador.CACHE_DIR = cache_dir
+    df, medicao = medir(lambda: analisador.carregar_dados(caminho, modo), repeticoes, memoria, preparar=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+    registrar("leitura", medicao, bytes_arquivo=os.path.getsize(caminho), linhas=len(df), bytes_memoria=int(df.memory_usage(deep=True).sum()))
+    if analisador.pq is not None:
+        _, medicao = medir(lambda: analisador.carregar_dados(caminho, modo), repeticoes, memoria)
+        registrar("leitura_cache", medicao)
+    principal = "Potência" if modo == "ENERGIA" else "Temperatura"
+    minimo, maximo = (float(v) for v in df[principal].quantile([0.25, 0.75]))
+    filtros = {"filtro_hora": [{"tipo": "hora", "hora": "12:00"}], "filtro_valor": [{"tipo": "valor", "coluna": principal, "min": minimo, "max": maximo}]}
+    for etapa, lista in filtros.items():
+        (filtrado, pontos), medicao = medir(lambda: analisador.aplicar_filtros(df, modo, lista), repeticoes, memoria)
+        registrar(etapa, medicao, linhas=len(filtrado), pontos=len(pontos))
+    estatisticas, medicao = medir(lambda: analisador.montar_estatisticas(df, modo), repeticoes, memoria)
+    registrar("estatisticas", medicao)
+    fig, medicao = medir(lambda: analisador.gerar_grafico(df, modo, None, None, None, None, None, None, f"Benchmark {modo}"), repeticoes, memoria)
+    registrar("grafico", medicao, tracos=len(fig.data), bytes_json=len(fig.to_json()))
+    arquivos, medicao = medir(lambda: analisador.gerar_relatorio(df, modo, estatisticas, fig, formato), repeticoes, memoria)
+    registrar(f"relatorio_{formato}", medicao, bytes_saida=sum(len(conteudo) for _, conteudo in arquivos))
+    faixas = faixas_benchmark(df)
+    (conteudo, avisos), medicao = medir(lambda: analisador.exportar_faixas(df, faixas, "zip"), repeticoes, memoria)
+    registrar("faixas", medicao, faixas=len(faixas), bytes_saida=len(conteudo or b""), avisos=len(avisos))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return etapas
+
+def ambiente():
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": analisador.pa.__version__ if analisador.pa is not None else None,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "max_workers": analisador.MAX_WORKERS
+    }
+
+def executar_benchmark(modos=None, linhas=None, diretorio=None, formato="xlsx", repeticoes=1, memoria=True, semente=0, progresso=None):
+    diretorio = diretorio or os.path.join(tempfile.gettempdir(), "analisador_benchmark")
+    os.makedirs(diretorio, exist_ok=True)
+    resultados = []
+    for modo in modos or MODOS:
+        for n in linhas or LINHAS_PADRAO:
+            inicio = time.perf_counter()
+            caminho = arquivo_sintetico(diretorio, modo, n, semente)
+            geracao = time.perf_counter() - inicio
+            for etapa in executar_modo(caminho, modo, formato, repeticoes, memoria):
+                resultado = {"modo": modo, "linhas": n, **etapa}
+                resultados.append(resultado)
+                if progresso:
+                    progresso(resultado)
+            if progresso:
+                progresso({"modo": modo, "linhas": n, "etapa": "geracao", "tempo": round(geracao, 6), "pico_memoria": None})
+    return {"versao": VERSAO_RESULTADOS, "data": datetime.now().isoformat(timespec="seconds"), "ambiente": ambiente(), "resultados": resultados}
+
+def chave_resultado(resultado):
+    return resultado["modo"], resultado["linhas"], resultado["etapa"]
+
+def comparar(atual, referencia, tolerancia=TOLERANCIA_PADRAO, tempo_minimo=TEMPO_MINIMO_COMPARACAO):
+    # regressão: tempo (ou pico de memória) acima da referência mais a tolerância relativa
+    base = {chave_resultado(r): r for r in referencia["resultados"]}
+    comparacoes = []
+    for resultado in atual["resultados"]:
+        anterior = base.get(chave_resultado(resultado))
+        if anterior is None:
+            continue
+        razao_tempo = resultado["tempo"] / anterior["tempo"] if anterior["tempo"] else None
+        razao_memoria = resultado["pico_memoria"] / anterior["pico_memoria"] if resultado.get("pico_memoria") and anterior.get("pico_memoria") else None
+        regressao = []
+        if razao_tempo is not None and razao_tempo > 1 + tolerancia and resultado["tempo"] - anterior["tempo"] >= tempo_minimo:
+            regressao.append("tempo")
+        if razao_memoria is not None and razao_memoria > 1 + tolerancia:
+            regressao.append("memoria")
+        comparacoes.append({"modo": resultado["modo"], "linhas": resultado["linhas"], "etapa": resultado["etapa"], "tempo": resultado["tempo"], "tempo_referencia": anterior["tempo"], "razao_tempo": razao_tempo, "razao_memoria": razao_memoria, "regressao": regressao})
+    return comparacoes
+
+def carregar_referencia(caminho):
+    if not os.path.exists(caminho):
+        print(f"Sem referência em {caminho}; comparação ignorada.")
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        referencia = json.load(f)
+    if referencia.get("versao") != VERSAO_RESULTADOS:
+        print(f"Referência {caminho} em formato incompatível (versão {referencia.get('versao')}); comparação ignorada.")
+        return None
+    return referencia
+
+def diferencas_ambiente(referencia, atual):
+    # tempos medidos com outro número de CPUs, outras versões ou outra máquina não servem para apontar regressão
+    return {k: (v, atual.get(k)) for k, v in referencia.get("ambiente", {}).items() if v != atual.get(k)}
+
+def formatar_bytes(n):
+    return analisador.formatar_bytes(n) if n is not None else "-"
+
+def mostrar_resultado(resultado):
+    if resultado["etapa"] == "geracao":
+        print(f"{resultado['modo']:<10} {resultado['linhas']:>10,} {'(geração do arquivo)':<18} {resultado['tempo']:>9.3f}s".replace(",", "."))
+    else:
+        print(f"{resultado['modo']:<10} {resultado['linhas']:>10,} {resultado['etapa']:<18} {resultado['tempo']:>9.3f}s {formatar_bytes(resultado['pico_memoria']):>10}".replace(",", "."))
+    sys.stdout.flush()
+
+def mostrar_comparacao(comparacoes):
+    for c in comparacoes:
+        marca = "REGRESSÃO (" + ", ".join(c["regressao"]) + ")" if c["regressao"] else "ok"
+        memoria = f"{c['razao_memoria']:.2f}x" if c["razao_memoria"] is not None else "-"
+        print(f"{c['modo']:<10} {c['linhas']:>10,} {c['etapa']:<18} {c['tempo_referencia']:>9.3f}s -> {c['tempo']:>9.3f}s  memória {memoria:>6}  {marca}".replace(",", "."))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do Analisador de Temperatura e Energia com dados sintéticos.")
+    parser.add_argument("--modos", default=",".join(MODOS), help="Modos separados por vírgula (padrão: todos)")
+    parser.add_argument("--linhas", default=",".join(str(n) for n in LINHAS_PADRAO), help="Tamanhos separados por vírgula, ex.: 10000,100000,1000000,10000000")
+    parser.add_argument("--dados", help="Diretório dos arquivos sintéticos (reaproveitados entre execuções)")
+    parser.add_argument("--formato", default="xlsx", choices=analisador.FORMATOS_RELATORIO, help="Formato do relatório medido (padrão: xlsx)")
+    parser.add_argument("--repeticoes", type=int, default=1, help="Repetições por etapa; o menor tempo é o registrado")
+    parser.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (evita a execução extra com tracemalloc)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", default="benchmark_resultados.json", help="Arquivo JSON com os resultados")
+    parser.add_argument("--referencia", default=REFERENCIA_PADRAO, help="Resultado de referência para comparação (padrão: benchmark_referencia.json)")
+    parser.add_argument("--sem-referencia", action="store_true", help="Não compara com a referência")
+    parser.add_argument("--salvar-referencia", action="store_true", help="Grava os resultados também como nova referência")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO, help="Aumento relativo aceito antes de apontar regressão (padrão: 0.25)")
+    args = parser.parse_args(argv)
+    modos = [m.strip().upper() for m in args.modos.split(",") if m.strip()]
+    invalidos = [m for m in modos if m not in MODOS]
+    if invalidos:
+        parser.error(f"modo desconhecido: {', '.join(invalidos)}")
+    linhas = [int(n) for n in args.linhas.split(",") if n.strip()]
+    resultados = executar_benchmark(modos, linhas, args.dados, args.formato, args.repeticoes, not args.sem_memoria, args.semente, mostrar_resultado)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+    if args.salvar_referencia:
+        with open(args.referencia, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"Referência atualizada: {args.referencia}")
+        return 0
+    referencia = None if args.sem_referencia else carregar_referencia(args.referencia)
+    if referencia is not None:
+        comparacoes = comparar(resultados, referencia, args.tolerancia)
+        mostrar_comparacao(comparacoes)
+        regressoes = sum(1 for c in comparacoes if c["regressao"])
+        diferente = diferencas_ambiente(referencia, resultados["ambiente"])
+        if diferente:
+            print(f"Referência medida em outro ambiente ({', '.join(f'{k}: {v} -> {a}' for k, (v, a) in diferente.items())}): "
+                  f"{regressoes} possíveis regressões em {len(comparacoes)} etapas, apenas indicativas. "
+                  f"Grave uma referência neste ambiente com --salvar-referencia.")
+            return 0
+        print(f"{regressoes} regressões em {len(comparacoes)} etapas comparadas.")
+        return 1 if regressoes else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import sys
+import time
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import temperature_analyzer_web as analisador
+
+# Processamento em lote: aplica uma configuração salva pela interface a todos os arquivos de um diretório
+EXTENSOES_EXCEL = (".xlsx", ".xls")
+EXTENSOES_CSV = (".csv",)
+
+def listar_arquivos(diretorio, modo=None):
+    extensoes = EXTENSOES_CSV if modo == "ENERGIA" else EXTENSOES_EXCEL if modo else EXTENSOES_EXCEL + EXTENSOES_CSV
+    return sorted(os.path.join(diretorio, nome) for nome in os.listdir(diretorio) if nome.lower().endswith(extensoes) and not nome.startswith("~$"))
+
+def modo_arquivo(caminho, modo=None):
+    if caminho.lower().endswith(EXTENSOES_CSV):
+        return "ENERGIA"
+    return modo if modo in ("SITRAD", "DATALOGGER") else "SITRAD"
+
+def carregar_configuracao_lote(config):
+    if config is None:
+        return {}
+    if isinstance(config, dict):
+        return config
+    with open(config, encoding="utf-8") as f:
+        return json.load(f)
+
+def iniciar_worker():
+    analisador.MAX_WORKERS = 1  # o paralelismo fica entre arquivos, não entre abas
+
+def processar_arquivo(caminho, modo, config, saida):
+    inicio = time.perf_counter()
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    resultado = {"arquivo": caminho, "modo": modo, "status": "ok", "saidas": [], "avisos": []}
+    try:
+        df = analisador.carregar_dados(caminho, modo)
+        if df.empty:
+            raise ValueError("Nenhum dado válido encontrado no arquivo.")
+        filtros = [f for f in analisador.filtros_configuracao(config) if all(c in df.columns for c in f.get("colunas", [f.get("coluna", "DataHora")]))]
+        filtrado, pontos_filtrados = analisador.aplicar_filtros(df, modo, filtros)
+        pontos_marcados = analisador.pontos_configuracao(config.get("pontos_marcados", []))
+        estatisticas = analisador.montar_estatisticas(filtrado, modo, pontos_filtrados, pontos_marcados)
+        estado = analisador.estado_filtros(filtros)
+        fig = analisador.gerar_grafico(filtrado, modo, estado["filtro_ativo"], estado["filtro_valor_min"], estado["filtro_valor_max"], estado["filtro_valor_tipo"], config.get("escala_y_min"), config.get("escala_y_max"), f"Gráfico de Dados: {nome}", pontos_marcados, pontos_filtrados, max_pontos=config.get("max_pontos_grafico") or analisador.MAX_PONTOS_GRAFICO)
+        regras = [r for r in config.get("excursoes", []) if r["coluna"] in df.columns]
+        if regras:
+            eventos = analisador.excursoes_conjunto(filtrado, regras)
+            analisador.adicionar_excursoes(fig, eventos)
+            destino = os.path.join(saida, f"{nome}_excursoes.csv")
+            analisador.tabela_excursoes(eventos).to_csv(destino, index=False)
+            resultado["saidas"].append(destino)
+            resultado["excursoes"] = len(eventos)
+        for nome_arquivo, conteudo in analisador.gerar_relatorio(filtrado, modo, estatisticas, fig, config.get("formato_relatorio", "xlsx"), f"{nome}_relatorio"):
+            destino = os.path.join(saida, nome_arquivo)
+            with open(destino, "wb") as f:
+                f.write(conteudo)
+            resultado["saidas"].append(destino)
+        energia = analisador.analise_energia(filtrado, modo, config.get("periodo_energia", "Dia"))
+        if energia is not None and not energia.empty:
+            destino = os.path.join(saida, f"{nome}_energia.csv")
+            energia.assign(**{"Janela da Demanda": analisador.formatar_datas(energia["Janela da Demanda"])}).to_csv(destino, index=False)
+            resultado["saidas"].append(destino)
+        for faixa in config.get("faixas", []):
+            try:
+                conteudo = analisador.exportar_faixa(df, faixa)
+            except ValueError:
+                resultado["avisos"].append(f"Faixa {faixa['nome']}: formato de data inválido.")
+                continue
+            if conteudo is None:
+                resultado["avisos"].append(f"Nenhum dado para a faixa {faixa['nome']}.")
+                continue
+            destino = os.path.join(saida, f"{nome}_{faixa['nome']}.xlsx")
+            with open(destino, "wb") as f:
+                f.write(conteudo)
+            resultado["saidas"].append(destino)
+        try:
+            destino = os.path.join(saida, f"{nome}_grafico.png")
+            fig.write_image(destino, format="png")
+            resultado["saidas"].append(destino)
+        except Exception as e:
+            resultado["avisos"].append("PNG não gerado: " + (str(e).strip().splitlines() or [type(e).__name__])[0])
+        resultado["linhas"] = len(df)
+        resultado["estatisticas"] = {k: v for k, v in estatisticas.items() if k not in ("Pontos_Filtrados", "Pontos_Marcados")}
+    except Exception as e:
+        # um arquivo com problema não interrompe o lote
+        resultado["status"] = "erro"
+        resultado["erro"] = f"{type(e).__name__}: {e}"
+    resultado["tempo"] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+def processar_lote(diretorio, config=None, saida=None, modo=None, max_workers=None, progresso=None):
+    config = carregar_configuracao_lote(config)
+    saida = saida or os.path.join(diretorio, "resultados")
+    os.makedirs(saida, exist_ok=True)
+    arquivos = [(caminho, modo_arquivo(caminho, modo)) for caminho in listar_arquivos(diretorio, modo)]
+    max_workers = min(max_workers or analisador.MAX_WORKERS, len(arquivos)) if arquivos else 0
+    resultados = {}
+    pendentes = list(arquivos)
+    if max_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=analisador.contexto_processos(), initializer=iniciar_worker) as executor:
+                futuros = {executor.submit(processar_arquivo, caminho, m, config, saida): caminho for caminho, m in arquivos}
+                for futuro in as_completed(futuros):
+                    resultado = futuro.result()
+                    resultados[futuros[futuro]] = resultado
+                    if progresso:
+                        progresso(len(resultados), len(arquivos), resultado)
+            pendentes = []
+        except (BrokenProcessPool, OSError, pickle.PicklingError):
+            pendentes = [(caminho, m) for caminho, m in arquivos if caminho not in resultados]  # segue sequencialmente
+    for caminho, m in pendentes:
+        resultado = processar_arquivo(caminho, m, config, saida)
+        resultados[caminho] = resultado
+        if progresso:
+            progresso(len(resultados), len(arquivos), resultado)
+    resumo = [resultados[caminho] for caminho, _ in arquivos]
+    with open(os.path.join(saida, "resumo_lote.json"), "w", encoding="utf-8") as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2)
+    return resumo
+
+def mostrar_progresso(concluidos, total, resultado):
+    nome = os.path.basename(resultado["arquivo"])
+    if resultado["status"] == "ok":
+        print(f"[{concluidos}/{total}] {nome}: ok ({resultado['tempo']:.2f}s, {len(resultado['saidas'])} arquivos gerados)")
+        for aviso in resultado["avisos"]:
+            print(f"    aviso: {aviso}")
+    else:
+        print(f"[{concluidos}/{total}] {nome}: ERRO - {resultado['erro']}")
+    sys.stdout.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processa em lote os arquivos de um diretório com uma configuração salva pelo Analisador de Temperatura e Energia.")
+    parser.add_argument("diretorio", help="Diretório com os arquivos .xlsx/.xls/.csv")
+    parser.add_argument("--config", help="Arquivo JSON gerado por 'Salvar Configurações'")
+    parser.add_argument("--saida", help="Diretório dos resultados (padrão: <diretorio>/resultados)")
+    parser.add_argument("--modo", choices=["SITRAD", "DATALOGGER", "ENERGIA"], help="Modo dos arquivos (padrão: SITRAD para planilhas e ENERGIA para CSV)")
+    parser.add_argument("--formato", choices=analisador.FORMATOS_RELATORIO, help="Formato do relatório (padrão: o da configuração ou xlsx)")
+    parser.add_argument("--workers", type=int, help="Número de processos (padrão: ANALISADOR_MAX_WORKERS ou núcleos disponíveis)")
+    args = parser.parse_args(argv)
+    config = carregar_configuracao_lote(args.config)
+    if args.formato:
+        config["formato_relatorio"] = args.formato
+    resumo = processar_lote(args.diretorio, config, args.saida, args.modo, args.workers, mostrar_progresso)
+    erros = sum(1 for r in resumo if r["status"] != "ok")
+    print(f"{len(resumo) - erros} de {len(resumo)} arquivos processados com sucesso.")
+    return 1 if erros else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,51 @@
-
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 from io import BytesIO
 import os
 import numpy as np
 import re
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import json
+import warnings
+import hashlib
+import time
+import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque, OrderedDict
+import threading
+import weakref
+import sys
+from itertools import count, islice
+import openpyxl
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import zipfile
+import gzip
+import logging
+import functools
+import cProfile
+import pstats
+import marshal
+from io import StringIO
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # cache persistente fica desativado sem pyarrow
+    pa = None
+    pq = None
 
 # Configuração da página
-st.set_page_config(page_title="Analisador de Temperatura e Energia", layout="wide")
+def configurar_pagina():
+    st.set_page_config(page_title="Analisador de Temperatura e Energia", layout="wide")
 
-# CSS para visual Tkinter-like
-st.markdown("""
+    # CSS para visual Tkinter-like
+    st.markdown("""
 <style>
     .main {
         background-color: #f5f7fa;
@@ -91,7 +121,7 @@ st.markdown("""
         overflow-y: auto;
     }
 </style>
-""", unsafe_allow_html=True)
+    """, unsafe_allow_html=True)
 
 # Funções de lógica
 def get_button_colors(modo):
@@ -108,92 +138,1809 @@ def atualizar_menu_tipo_valor(modo, df):
     else:  # ENERGIA
         return ["Potência"] + [col for col in df.columns if col.startswith("Potência_Trafo") and pd.api.types.is_numeric_dtype(df[col])]
 
-@st.cache_data
-def analisar_arquivo(uploaded_file, modo, aba=None):
-    dados = []
+# Instrumentação por execução (etapas, funções, caches e tamanhos); sem medição ativa nada é registrado
+LOG_DESEMPENHO = os.environ.get("ANALISADOR_LOG_DESEMPENHO")
+DEPURACAO = os.environ.get("ANALISADOR_DEPURACAO", "") == "1"
+LINHAS_PERFIL = 40
+logger_desempenho = logging.getLogger("analisador.desempenho")
+if LOG_DESEMPENHO and not logger_desempenho.handlers:
+    # uma linha JSON por execução do script
+    manipulador = logging.FileHandler(LOG_DESEMPENHO, encoding="utf-8")
+    manipulador.setFormatter(logging.Formatter("%(message)s"))
+    logger_desempenho.addHandler(manipulador)
+    logger_desempenho.setLevel(logging.INFO)
+    logger_desempenho.propagate = False
+_medicao_local = threading.local()
+
+def iniciar_medicao(perfilar=False):
+    agora = time.perf_counter()
+    medicao = {
+        "data": datetime.now().isoformat(timespec="seconds"), "relogio": agora, "ultimo_marco": agora,
+        "etapas": [], "funcoes": {}, "cache": {}, "tamanhos": {}, "contexto": {},
+        "perfil": cProfile.Profile() if perfilar else None
+    }
+    _medicao_local.atual = medicao
+    if medicao["perfil"] is not None:
+        medicao["perfil"].enable()
+    return medicao
+
+def medicao_atual():
+    return getattr(_medicao_local, "atual", None)
+
+def marcar(etapa):
+    # fecha a etapa da página iniciada no marco anterior
+    medicao = medicao_atual()
+    if medicao is None:
+        return
+    agora = time.perf_counter()
+    medicao["etapas"].append({"etapa": etapa, "inicio": round(medicao["ultimo_marco"] - medicao["relogio"], 6), "tempo": round(agora - medicao["ultimo_marco"], 6)})
+    medicao["ultimo_marco"] = agora
+
+def acumular_funcao(medicao, nome, inicio):
+    registro = medicao["funcoes"].setdefault(nome, {"chamadas": 0, "tempo": 0.0})
+    registro["chamadas"] += 1
+    registro["tempo"] += time.perf_counter() - inicio
+
+def instrumentado(funcao):
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        medicao = medicao_atual()
+        if medicao is None:
+            return funcao(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            acumular_funcao(medicao, funcao.__name__, inicio)
+    return envoltorio
+
+def contar_cache(nome):
+    # para funções com st.cache_*: o corpo chama registrar_falha_cache quando executa; se não chamou, foi acerto
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            medicao = medicao_atual()
+            if medicao is None:
+                return funcao(*args, **kwargs)
+            contagem = medicao["cache"].setdefault(nome, {"acertos": 0, "falhas": 0})
+            falhas = contagem["falhas"]
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                acumular_funcao(medicao, nome, inicio)
+                if contagem["falhas"] == falhas:
+                    contagem["acertos"] += 1
+        return envoltorio
+    return decorador
+
+def registrar_cache(nome, acerto):
+    medicao = medicao_atual()
+    if medicao is not None:
+        contagem = medicao["cache"].setdefault(nome, {"acertos": 0, "falhas": 0})
+        contagem["acertos" if acerto else "falhas"] += 1
+
+def registrar_falha_cache(nome):
+    registrar_cache(nome, False)
+
+def registrar_tamanho(nome, tamanho):
+    medicao = medicao_atual()
+    if medicao is not None:
+        medicao["tamanhos"][nome] = int(tamanho)
+
+def tamanho_registrado(nome):
+    medicao = medicao_atual()
+    return medicao is not None and nome in medicao["tamanhos"]
+
+def registrar_contexto(**valores):
+    medicao = medicao_atual()
+    if medicao is not None:
+        medicao["contexto"].update(valores)
+
+def registro_medicao(medicao):
+    return {
+        "data": medicao["data"],
+        "total": round(time.perf_counter() - medicao["relogio"], 6),
+        "interrompida": medicao.get("interrompida", False),
+        **medicao["contexto"],
+        "etapas": medicao["etapas"],
+        "funcoes": {nome: {"chamadas": r["chamadas"], "tempo": round(r["tempo"], 6)} for nome, r in medicao["funcoes"].items()},
+        "cache": medicao["cache"],
+        "tamanhos": medicao["tamanhos"]
+    }
+
+def finalizar_medicao(medicao):
+    _medicao_local.atual = None
+    perfil = medicao["perfil"]
+    if perfil is not None:
+        perfil.disable()
+    registro = registro_medicao(medicao)
+    logger_desempenho.info(json.dumps(registro, ensure_ascii=False, default=str))
+    st.session_state['medicao_anterior'] = registro
+    if perfil is not None:
+        texto = StringIO()
+        estatisticas = pstats.Stats(perfil, stream=texto)
+        estatisticas.sort_stats("cumulative").print_stats(LINHAS_PERFIL)
+        # mesmo formato de Profile.dump_stats, legível por pstats/snakeviz
+        st.session_state['perfil_execucao'] = {"data": medicao["data"], "total": registro["total"], "texto": texto.getvalue(), "dados": marshal.dumps(estatisticas.stats)}
+    return registro
+
+def depuracao_ativa():
+    return DEPURACAO or st.query_params.get("depuracao") == "1"
+
+def mostrar_desempenho():
+    medicao = medicao_atual()
+    if medicao is None:
+        return
+    registro = registro_medicao(medicao)
+    with st.expander("Desempenho"):
+        st.write(f"**Execução atual:** {registro['total'] * 1000:.0f} ms até este painel")
+        anterior = st.session_state.get('medicao_anterior')
+        if anterior:
+            st.caption(f"Execução anterior: {anterior['total'] * 1000:.0f} ms no total" + (" (interrompida por st.rerun)" if anterior["interrompida"] else ""))
+        if registro["etapas"]:
+            st.write("**Etapas da página**")
+            etapas = [{"Etapa": e["etapa"], "Início (ms)": round(e["inicio"] * 1000, 1), "Tempo (ms)": round(e["tempo"] * 1000, 1)}
+                      for e in registro["etapas"]]
+            st.dataframe(pd.DataFrame(etapas), use_container_width=True, hide_index=True)
+        if registro["funcoes"]:
+            st.write("**Funções** (o tempo inclui as chamadas internas)")
+            funcoes = sorted(registro["funcoes"].items(), key=lambda f: -f[1]["tempo"])
+            st.dataframe(pd.DataFrame([{"Função": nome, "Chamadas": r["chamadas"], "Tempo (ms)": round(r["tempo"] * 1000, 1)}
+                                       for nome, r in funcoes]), use_container_width=True, hide_index=True)
+        if registro["cache"]:
+            st.write("**Cache**")
+            caches = [{"Cache": nome, "Acertos": c["acertos"], "Falhas": c["falhas"]} for nome, c in registro["cache"].items()]
+            st.dataframe(pd.DataFrame(caches), use_container_width=True, hide_index=True)
+        if registro["tamanhos"]:
+            st.write("**Tamanhos**")
+            st.dataframe(pd.DataFrame([{"Item": nome, "Tamanho": formatar_bytes(n)} for nome, n in registro["tamanhos"].items()]), use_container_width=True, hide_index=True)
+        if st.button("Perfilar Próxima Execução", key="perfilar_execucao", help="Executa a página uma vez com cProfile"):
+            st.session_state['perfilar_proxima'] = True
+            st.rerun()
+        perfil = st.session_state.get('perfil_execucao')
+        if perfil:
+            st.write(f"**Perfil de {perfil['data']}** ({perfil['total'] * 1000:.0f} ms)")
+            st.code(perfil["texto"], language=None)
+            st.download_button("Baixar Perfil (.prof)", perfil["dados"], "execucao.prof", "application/octet-stream", key="baixar_perfil")
+
+# Cache persistente dos dados normalizados (Parquet), chaveado pelo conteúdo do arquivo
+CACHE_DIR = os.environ.get("ANALISADOR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "analisador_temperatura"))
+CACHE_MAX_BYTES = int(os.environ.get("ANALISADOR_CACHE_MAX_MB", "2048")) * 1024 * 1024
+VERSAO_CACHE = 3
+
+def ler_bytes(arquivo):
+    if isinstance(arquivo, bytes):
+        return arquivo
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, "rb") as f:
+            return f.read()
+    if hasattr(arquivo, "getvalue"):
+        return arquivo.getvalue()
+    pos = arquivo.tell()
+    conteudo = arquivo.read()
+    arquivo.seek(pos)
+    return conteudo
+
+def chave_cache(conteudo, modo, aba=None):
+    digest = hashlib.sha256(conteudo).hexdigest()
+    return hashlib.sha256(f"{VERSAO_CACHE}|{digest}|{modo}|{aba}".encode("utf-8")).hexdigest()
+
+def caminho_cache(chave):
+    return os.path.join(CACHE_DIR, f"{chave}.parquet")
+
+def ler_cache_parquet(chave):
+    if pq is None:
+        return None
+    caminho = caminho_cache(chave)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        df = pq.read_table(caminho, memory_map=True).to_pandas()
+        os.utime(caminho)  # marca como usado recentemente para a política LRU
+        return df
+    except Exception:
+        return None
+
+def gravar_cache_parquet(chave, df):
+    if pq is None:
+        return False
+    caminho = caminho_cache(chave)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), temporario)
+        os.replace(temporario, caminho)
+    except Exception:
+        # colunas com tipos mistos não são serializáveis; nesse caso apenas não há cache
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        return False
+    limpar_cache_parquet()
+    return True
+
+def limpar_cache_parquet(limite_bytes=None):
+    limite_bytes = CACHE_MAX_BYTES if limite_bytes is None else limite_bytes
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entradas = []
+    for nome in os.listdir(CACHE_DIR):
+        if nome.endswith(".parquet"):
+            caminho = os.path.join(CACHE_DIR, nome)
+            try:
+                info = os.stat(caminho)
+            except OSError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, caminho))
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        try:
+            os.remove(caminho)
+            total -= tamanho
+        except OSError:
+            pass
+
+# Ingestão em segundo plano, com um DataFrame por arquivo compartilhado entre as sessões
+INGESTAO_WORKERS = int(os.environ.get("ANALISADOR_INGESTAO_WORKERS", "2"))
+MAX_ERROS_INGESTAO = 8
+ESPERA_INGESTAO = 0.3  # arquivos pequenos ou já em cache aparecem sem passar pelo acompanhamento
+PRAZO_COLETA = 30  # segundos em que o resultado fica com a tarefa, mesmo se despejado do cache, até as sessões o buscarem
+
+# Cache de conjuntos lidos (LRU por bytes, com validade), chaveado por impressão digital do arquivo
+MAX_BYTES_CONJUNTOS = int(os.environ.get("ANALISADOR_MAX_MB_CONJUNTOS", "1024")) * 1024 * 1024
+VALIDADE_CONJUNTOS = int(os.environ.get("ANALISADOR_VALIDADE_CONJUNTOS_MIN", "120")) * 60
+BLOCOS_IMPRESSAO = 16
+BYTES_BLOCO_IMPRESSAO = 64 * 1024
+
+class IngestaoCancelada(Exception):
+    pass
+
+class ErroIngestao(ValueError):
+    # erros de leitura por posição da fonte pedida
+    def __init__(self, erros):
+        super().__init__(erros[0][1])
+        self.erros = erros
+
+@st.cache_resource
+def servico_ingestao():
+    conjuntos = {
+        "itens": OrderedDict(), "bytes": 0, "limite": MAX_BYTES_CONJUNTOS, "validade": VALIDADE_CONJUNTOS,
+        "contadores": {"acertos": 0, "falhas": 0, "compartilhadas": 0, "despejos": 0, "expirados": 0}
+    }
+    return {
+        "executor": ThreadPoolExecutor(max_workers=INGESTAO_WORKERS, thread_name_prefix="ingestao"),
+        "tarefas": OrderedDict(), "conjuntos": conjuntos, "trava": threading.Lock()
+    }
+
+def impressao_digital(dados):
+    # arquivos pequenos são lidos inteiros; nos grandes, início, fim e blocos espaçados uniformemente
+    dados = memoryview(dados).cast("B")
+    tamanho = len(dados)
+    h = hashlib.blake2b(digest_size=16)
+    if tamanho <= 2 * BLOCOS_IMPRESSAO * BYTES_BLOCO_IMPRESSAO:
+        h.update(dados)
+    else:
+        passo = (tamanho - BYTES_BLOCO_IMPRESSAO) // (BLOCOS_IMPRESSAO - 1)
+        for i in range(BLOCOS_IMPRESSAO):
+            h.update(dados[i * passo:i * passo + BYTES_BLOCO_IMPRESSAO])
+        h.update(dados[-BYTES_BLOCO_IMPRESSAO:])
+    return f"{tamanho}:{h.hexdigest()}"
+
+def impressao_arquivo(arquivo):
+    if hasattr(arquivo, "getbuffer"):
+        with arquivo.getbuffer() as dados:  # sem copiar o conteúdo enviado
+            return impressao_digital(dados)
+    return impressao_digital(ler_bytes(arquivo))
+
+def chave_conjunto(impressao, modo, aba=None):
+    return hashlib.sha256(f"{VERSAO_CACHE}|{impressao}|{modo}|{aba}".encode("utf-8")).hexdigest()
+
+def identificador_sessao():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else None
+
+def expirar_conjuntos(conjuntos, agora):
+    for chave in [c for c, (_, _, acesso) in conjuntos["itens"].items() if agora - acesso > conjuntos["validade"]]:
+        _, tamanho, _ = conjuntos["itens"].pop(chave)
+        conjuntos["bytes"] -= tamanho
+        conjuntos["contadores"]["expirados"] += 1
+
+def buscar_conjunto(conjuntos, chave):
+    agora = time.time()
+    expirar_conjuntos(conjuntos, agora)
+    item = conjuntos["itens"].get(chave)
+    if item is None:
+        return None
+    conjuntos["itens"][chave] = (item[0], item[1], agora)
+    conjuntos["itens"].move_to_end(chave)
+    return item[0]
+
+def guardar_conjunto(conjuntos, chave, df):
+    if chave in conjuntos["itens"]:
+        return
+    tamanho = tamanho_objeto(df)
+    conjuntos["itens"][chave] = (df, tamanho, time.time())
+    conjuntos["bytes"] += tamanho
+    while conjuntos["bytes"] > conjuntos["limite"] and len(conjuntos["itens"]) > 1:
+        _, (_, tamanho_antigo, _) = conjuntos["itens"].popitem(last=False)
+        conjuntos["bytes"] -= tamanho_antigo
+        conjuntos["contadores"]["despejos"] += 1
+
+def estatisticas_conjuntos():
+    servico = servico_ingestao()
+    with servico["trava"]:
+        conjuntos = servico["conjuntos"]
+        expirar_conjuntos(conjuntos, time.time())
+        em_andamento = sum(1 for t in servico["tarefas"].values() if t["estado"] in ("fila", "lendo"))
+        return dict(conjuntos["contadores"], entradas=len(conjuntos["itens"]), bytes=conjuntos["bytes"],
+                    limite=conjuntos["limite"], leituras_em_andamento=em_andamento)
+
+def limpar_tarefas(servico, agora):
+    # resultados já entregues ao cache saem depois do prazo de coleta; erros ficam até serem liberados (limitados)
+    for chave in [c for c, t in servico["tarefas"].items() if t["estado"] == "pronta" and agora - t["fim"] > PRAZO_COLETA]:
+        del servico["tarefas"][chave]
+    erros = [c for c, t in servico["tarefas"].items() if t["estado"] == "erro"]
+    for chave in erros[:max(0, len(erros) - MAX_ERROS_INGESTAO)]:
+        del servico["tarefas"][chave]
+
+def executar_ingestao(servico, tarefa, conteudo, modo, aba):
+    def progresso(**info):
+        if tarefa["cancelar"].is_set():
+            raise IngestaoCancelada()
+        with servico["trava"]:
+            tarefa["progresso"].update(info)
+    with servico["trava"]:
+        if tarefa["cancelar"].is_set():
+            tarefa["estado"] = "cancelada"
+            return
+        tarefa["estado"], tarefa["inicio"] = "lendo", time.time()
+    try:
+        df = carregar_dados(conteudo, modo, aba, progresso)
+    except IngestaoCancelada:
+        estado, valor = "cancelada", None
+    except Exception as e:
+        estado, valor = "erro", str(e)
+    else:
+        CONJUNTOS_COMPARTILHADOS[df.attrs["chave"]] = df
+        estado, valor = "pronta", df
+    with servico["trava"]:
+        tarefa["estado"], tarefa["resultado"], tarefa["fim"] = estado, valor, time.time()
+        if estado == "pronta":
+            guardar_conjunto(servico["conjuntos"], tarefa["chave"], df)
+        if estado == "cancelada" and servico["tarefas"].get(tarefa["chave"]) is tarefa:
+            del servico["tarefas"][tarefa["chave"]]
+        limpar_tarefas(servico, tarefa["fim"])
+
+def chave_arquivo(arquivo, modo, aba=None):
+    # a impressão digital é calculada uma vez por arquivo enviado na sessão
+    memo = st.session_state.setdefault('impressoes_arquivos', OrderedDict())
+    identificador = getattr(arquivo, "file_id", None) or id(arquivo)
+    if identificador not in memo:
+        memo[identificador] = impressao_arquivo(arquivo)
+        while len(memo) > 32:
+            memo.popitem(last=False)
+    return chave_conjunto(memo[identificador], modo, aba)
+
+@instrumentado
+def solicitar_ingestao(arquivo, modo, aba=None, chave=None):
+    # devolve (estado, chave, resultado): "pronta" com o DataFrame, "erro" com a mensagem ou "fila"/"lendo"
+    chave = chave or chave_conjunto(impressao_arquivo(arquivo), modo, aba)
+    servico = servico_ingestao()
+    sessao = identificador_sessao()
+    with servico["trava"]:
+        conjuntos = servico["conjuntos"]
+        limpar_tarefas(servico, time.time())
+        df = buscar_conjunto(conjuntos, chave)
+        tarefa = servico["tarefas"].get(chave)
+        if df is None and tarefa is not None and tarefa["estado"] == "pronta":
+            df = tarefa["resultado"]  # despejado do cache antes de ser buscado
+        registrar_cache("conjuntos", df is not None)
+        if df is not None:
+            conjuntos["contadores"]["acertos"] += 1
+            return "pronta", chave, df
+        if tarefa is None or tarefa["cancelar"].is_set():
+            conjuntos["contadores"]["falhas"] += 1
+            tarefa = {
+                "chave": chave, "nome": getattr(arquivo, "name", None), "estado": "fila",
+                "progresso": {"linhas": 0, "total_linhas": None, "abas": 0, "total_abas": None},
+                "resultado": None, "cancelar": threading.Event(), "sessoes": set(), "inicio": None, "fim": None
+            }
+            servico["tarefas"][chave] = tarefa
+            tarefa["futuro"] = servico["executor"].submit(executar_ingestao, servico, tarefa, ler_bytes(arquivo), modo, aba)
+        elif tarefa["estado"] != "erro" and sessao not in tarefa["sessoes"]:
+            conjuntos["contadores"]["compartilhadas"] += 1  # outra sessão já está lendo o mesmo arquivo
+        servico["tarefas"].move_to_end(chave)
+        tarefa["sessoes"].add(sessao)
+        futuro = tarefa["futuro"]
+    if not futuro.done():
+        try:
+            futuro.result(timeout=ESPERA_INGESTAO)
+        except Exception:
+            pass
+    with servico["trava"]:
+        return tarefa["estado"], chave, tarefa["resultado"]
+
+def estado_ingestoes(chaves):
+    servico = servico_ingestao()
+    with servico["trava"]:
+        estados = []
+        for chave in chaves:
+            if chave in servico["tarefas"]:
+                estados.append(dict(servico["tarefas"][chave], progresso=dict(servico["tarefas"][chave]["progresso"])))
+            else:
+                estados.append({"chave": chave, "estado": "pronta" if chave in servico["conjuntos"]["itens"] else "cancelada"})
+        return estados
+
+def liberar_ingestoes(chaves, sessao=None):
+    # a sessão deixa de esperar por estas tarefas; as que ficarem sem ninguém esperando são canceladas
+    servico = servico_ingestao()
+    with servico["trava"]:
+        for chave in chaves:
+            tarefa = servico["tarefas"].get(chave)
+            if tarefa is None:
+                continue
+            tarefa["sessoes"].discard(sessao)
+            if not tarefa["sessoes"] and tarefa["estado"] in ("fila", "lendo"):
+                tarefa["cancelar"].set()
+                if tarefa["futuro"].cancel():
+                    del servico["tarefas"][chave]
+            elif tarefa["estado"] == "erro" and not tarefa["sessoes"]:
+                del servico["tarefas"][chave]  # um novo envio do mesmo arquivo tenta de novo
+
+def acompanhar_ingestoes(chaves, grupo="principal"):
+    # tarefas de que a sessão precisa nesta execução, por parte da página; as anteriores que nenhuma parte
+    # usa mais são liberadas
+    pendentes = st.session_state.setdefault('ingestoes_pendentes', {})
+    anteriores = {c for lista in pendentes.values() for c in lista}
+    pendentes[grupo] = list(chaves)
+    atuais = {c for lista in pendentes.values() for c in lista}
+    liberar_ingestoes([c for c in anteriores if c not in atuais], identificador_sessao())
+
+def fracao_ingestao(progresso):
+    if progresso.get("total_linhas"):
+        return min(progresso["linhas"] / progresso["total_linhas"], 0.99)
+    if progresso.get("total_abas"):
+        return progresso["abas"] / progresso["total_abas"]
+    return 0.0
+
+def descricao_ingestao(tarefa):
+    progresso = tarefa["progresso"]
+    texto = f"{tarefa['nome'] or 'arquivo'}: " + ("na fila" if tarefa["estado"] == "fila" else f"{progresso['linhas']:,} linhas lidas".replace(",", "."))
+    if progresso.get("total_abas") and progresso["total_abas"] > 1:
+        texto += f", {progresso['abas']} de {progresso['total_abas']} abas"
+    if tarefa.get("inicio"):
+        texto += f" ({time.time() - tarefa['inicio']:.0f}s)"
+    return texto
+
+@st.fragment(run_every=1)
+def aguardar_ingestao(chaves, grupo="principal"):
+    # só esta parte da página é reexecutada enquanto os arquivos são lidos
+    tarefas = estado_ingestoes(chaves)
+    if all(t["estado"] not in ("fila", "lendo") for t in tarefas):
+        st.rerun()
+    for tarefa in tarefas:
+        if tarefa["estado"] in ("fila", "lendo"):
+            st.progress(fracao_ingestao(tarefa["progresso"]), text=descricao_ingestao(tarefa))
+    if st.button("Cancelar Leitura", key=f"cancelar_ingestao_{grupo}"):
+        acompanhar_ingestoes([], grupo)
+        st.session_state.setdefault('ingestoes_canceladas', {})[grupo] = list(chaves)
+        st.rerun()
+
+def ingerir_fontes(fontes, modo, grupo="principal"):
+    # DataFrames das fontes (arquivo, aba) quando todas estiverem lidas; enquanto isso mostra o progresso e devolve None
+    chaves = [chave_arquivo(arquivo, modo, aba) for arquivo, aba in fontes]
+    canceladas = st.session_state.setdefault('ingestoes_canceladas', {})
+    if canceladas.get(grupo) == chaves:
+        acompanhar_ingestoes([], grupo)
+        st.info("Leitura cancelada. Altere a seleção ou envie o arquivo novamente para ler.")
+        return None
+    canceladas.pop(grupo, None)
+    acompanhar_ingestoes(chaves, grupo)
+    resultados = [solicitar_ingestao(arquivo, modo, aba, chave) for (arquivo, aba), chave in zip(fontes, chaves)]
+    erros = [(i, resultado) for i, (estado, _, resultado) in enumerate(resultados) if estado == "erro"]
+    if erros:
+        raise ErroIngestao(erros)
+    if all(estado == "pronta" for estado, _, _ in resultados):
+        return [resultado for _, _, resultado in resultados]
+    aguardar_ingestao(chaves, grupo)
+    return None
+
+def ingerir_arquivos(arquivos, modo, aba=None):
+    return ingerir_fontes([(arquivo, aba) for arquivo in arquivos], modo)
+
+# Versão sem cache em memória, usada também pelo processamento em lote
+@instrumentado
+def carregar_dados(arquivo, modo, aba=None, progresso=None):
+    chave = chave_cache(ler_bytes(arquivo), modo, aba)
+    df = ler_cache_parquet(chave)
+    if df is None:
+        df = ler_arquivo(arquivo, modo, aba, progresso)
+        gravar_cache_parquet(chave, df)
+    df.attrs["chave"] = chave
+    return df
+
+# Leitura de planilhas: xlsx em streaming com abas em paralelo, .xls decodificado uma única vez
+MAX_WORKERS = int(os.environ.get("ANALISADOR_MAX_WORKERS", str(os.cpu_count() or 1)))
+LINHAS_PROGRESSO = 50000
+_conteudo_worker = None
+
+def definir_conteudo_worker(conteudo):
+    global _conteudo_worker
+    _conteudo_worker = conteudo
+
+def contexto_processos():
+    # sem "fork": os processos são criados a partir das threads do servidor (ingestão em segundo plano), e um
+    # filho copiado de um processo com várias threads pode travar em locks herdados
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+
+def executar_em_paralelo(funcao, argumentos, max_workers=None, initializer=None, initargs=()):
+    argumentos = list(argumentos)
+    max_workers = min(max_workers or MAX_WORKERS, len(argumentos))
+    if max_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto_processos(), initializer=initializer, initargs=initargs) as executor:
+                return list(executor.map(funcao, *zip(*argumentos)))
+        except (BrokenProcessPool, OSError, pickle.PicklingError):
+            pass  # ambiente sem suporte a processos: segue sequencialmente
+    if initializer is not None:
+        initializer(*initargs)
+    return [funcao(*args) for args in argumentos]
+
+def abrir_workbook(conteudo):
+    try:
+        return openpyxl.load_workbook(BytesIO(conteudo), read_only=True, data_only=True)
+    except Exception:
+        return None  # formatos não suportados pelo openpyxl (ex.: .xls) usam o leitor do pandas
+
+def abrir_xls(conteudo):
+    # .xls não tem leitura em streaming: o pandas decodifica o workbook inteiro ao abri-lo, então ele é
+    # aberto uma vez por leitura e todas as abas saem dele (xlsx é um zip e segue pelo openpyxl)
+    return None if conteudo[:4] == b"PK\x03\x04" else pd.ExcelFile(BytesIO(conteudo))
+
+def listar_abas(uploaded_file):
+    conteudo = ler_bytes(uploaded_file)
+    wb = abrir_workbook(conteudo)
+    if wb is None:
+        return pd.ExcelFile(BytesIO(conteudo)).sheet_names
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+def abas_arquivo(arquivo):
+    # abas memorizadas na sessão pela impressão digital do arquivo: listar as de um .xls decodifica o workbook inteiro
+    chave = chave_arquivo(arquivo, None)
+    memo = st.session_state.setdefault('abas_arquivos', OrderedDict())
+    if chave not in memo:
+        memo[chave] = listar_abas(arquivo)
+        while len(memo) > 32:
+            memo.popitem(last=False)
+    return memo[chave]
+
+def ler_registros_excel(conteudo, sheet, inicio=0, progresso=None, xls=None):
+    # retorna cabeçalho, linhas de dados a partir de `inicio` e a linha imediatamente anterior a ele;
+    # com `progresso`, as linhas são lidas em blocos e o total lido é informado a cada bloco
+    wb = abrir_workbook(conteudo) if xls is None else None
+    if wb is None:
+        if xls is None:
+            with pd.ExcelFile(BytesIO(conteudo)) as xls:
+                return ler_registros_excel(conteudo, sheet, inicio, progresso, xls)
+        linhas = list(xls.parse(sheet, header=None).itertuples(index=False, name=None))
+        if not linhas:
+            return None, [], None
+        return linhas[0], linhas[1 + inicio:], linhas[inicio] if inicio > 0 and inicio < len(linhas) else None
+    try:
+        planilha = wb[sheet]
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        anterior = None
+        if inicio > 0:
+            deque(islice(linhas, inicio - 1), maxlen=0)
+            anterior = next(linhas, None)
+        if progresso is None:
+            registros = list(linhas)
+        else:
+            registros = []
+            total = planilha.max_row - 1 - inicio if planilha.max_row else None  # dimensão declarada na planilha, quando existe
+            for bloco in iter(lambda: list(islice(linhas, LINHAS_PROGRESSO)), []):
+                registros.extend(bloco)
+                progresso(len(registros), total)
+    finally:
+        wb.close()
+    return cabecalho, registros, anterior
+
+def montar_aba(cabecalho, registros):
+    if cabecalho is None:
+        return pd.DataFrame()
+    bruto = pd.DataFrame.from_records([cabecalho] + registros)
+    # mesmo comportamento do pd.read_excel: colunas vazias à direita e linhas vazias são descartadas
+    preenchidas = np.flatnonzero(bruto.notna().to_numpy().any(axis=0))
+    bruto = bruto.iloc[:, :preenchidas[-1] + 1 if len(preenchidas) else 0]
+    df = bruto.iloc[1:].dropna(how="all").reset_index(drop=True).infer_objects()
+    df.columns = [f"Unnamed: {i}" if pd.isna(c) else c for i, c in enumerate(bruto.iloc[0])]
+    return df
+
+def ler_aba_excel(conteudo, sheet, progresso=None, xls=None):
+    cabecalho, registros, _ = ler_registros_excel(conteudo, sheet, progresso=progresso, xls=xls)
+    return montar_aba(cabecalho, registros)
+
+def normalizar_aba(df, modo, sheet):
     if modo == "SITRAD":
-        excel = pd.ExcelFile(uploaded_file)
-        abas = excel.sheet_names if aba is None else [aba]
-        for sheet in abas:
-            df = excel.parse(sheet)
-            columns = ["DataHora", "Temperatura"] + [f"Dados_Extra{i+1}" for i in range(len(df.columns)-2)]
-            df = df.iloc[:, :len(columns)]
-            df.columns = columns
-            df["Aba"] = sheet
-            df["DataHora"] = pd.to_datetime(df["DataHora"], errors="coerce")
-            df["Temperatura"] = pd.to_numeric(df["Temperatura"], errors="coerce")
-            for col in columns[2:-1]:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-            dados.append(df)
-    elif modo == "DATALOGGER":
-        excel = pd.ExcelFile(uploaded_file)
-        abas = excel.sheet_names[1:2] if aba is None else [aba]
-        for sheet in abas:
-            df = excel.parse(sheet)
-            df = df.iloc[:, 1:4]
-            df.columns = ["DataHora", "Temperatura", "Umidade"]
-            df["Aba"] = sheet
-            df["DataHora"] = pd.to_datetime(df["DataHora"], errors="coerce")
-            df["Temperatura"] = pd.to_numeric(df["Temperatura"], errors="coerce")
-            df["Umidade"] = pd.to_numeric(df["Umidade"], errors="coerce")
-            dados.append(df)
-    else:  # ENERGIA
-        df = pd.read_csv(uploaded_file)
-        if len(df.columns) < 2:
-            raise ValueError("O arquivo CSV deve conter pelo menos 2 colunas (Data/Hora e Potência).")
-        columns = ["DataHora", "Potência"]
-        if len(df.columns) > 2:
-            columns.extend([f"Potência_Trafo{i+2}" for i in range(min(3, len(df.columns)-2))])
+        columns = ["DataHora", "Temperatura"] + [f"Dados_Extra{i+1}" for i in range(len(df.columns)-2)]
         df = df.iloc[:, :len(columns)]
         df.columns = columns
-        df["Aba"] = "ENERGIA"
-        if pd.api.types.is_numeric_dtype(df["DataHora"]):
-            df["DataHora"] = pd.to_datetime(df["DataHora"], unit="ms", errors="coerce").dt.tz_localize("UTC").dt.tz_convert("America/Sao_Paulo")
-        else:
-            df["DataHora"] = pd.to_datetime(df["DataHora"], errors="coerce")
-        if df["DataHora"].isna().all():
-            raise ValueError("Formato de data/hora inválido.")
-        df["DataHora_str"] = df["DataHora"].dt.strftime("%Y/%m/%d %H:%M:%S")
-        df["Potência"] = pd.to_numeric(df["Potência"], errors="coerce")
-        for col in columns[2:]:
+        df["Aba"] = sheet
+        df["DataHora"] = pd.to_datetime(df["DataHora"], errors="coerce")
+        df["Temperatura"] = pd.to_numeric(df["Temperatura"], errors="coerce")
+        for col in columns[2:-1]:
             df[col] = pd.to_numeric(df[col], errors="coerce")
-        dados.append(df)
-    return pd.concat(dados, ignore_index=True)
+    else:  # DATALOGGER
+        df = df.iloc[:, 1:4]
+        df.columns = ["DataHora", "Temperatura", "Umidade"]
+        df["Aba"] = sheet
+        df["DataHora"] = pd.to_datetime(df["DataHora"], errors="coerce")
+        df["Temperatura"] = pd.to_numeric(df["Temperatura"], errors="coerce")
+        df["Umidade"] = pd.to_numeric(df["Umidade"], errors="coerce")
+    return df
+
+def processar_aba(sheet, modo):
+    return normalizar_aba(ler_aba_excel(_conteudo_worker, sheet), modo, sheet)
+
+def ler_abas_xls(xls, abas, modo, progresso=None):
+    # abas lidas em sequência do workbook já decodificado (um processo por aba repetiria a decodificação)
+    dados, linhas = [], 0
+    for i, sheet in enumerate(abas):
+        dados.append(normalizar_aba(ler_aba_excel(None, sheet, xls=xls), modo, sheet))
+        linhas += len(dados[-1])
+        if progresso:
+            progresso(linhas=linhas, total_linhas=None, abas=i + 1, total_abas=len(abas))
+    return dados
+
+# Leitura do CSV de energia em blocos, com tipos compactos (float32, Aba categórica)
+LINHAS_POR_BLOCO = int(os.environ.get("ANALISADOR_LINHAS_POR_BLOCO", "500000"))
+FUSO_ENERGIA = "America/Sao_Paulo"
+
+def origem_csv(arquivo):
+    if isinstance(arquivo, (str, os.PathLike)):
+        return arquivo  # o pandas lê o arquivo do disco em blocos, sem carregá-lo inteiro
+    return BytesIO(ler_bytes(arquivo))
+
+def converter_bloco_energia(bloco, columns, epoch):
+    bloco = bloco.iloc[:, :len(columns)]
+    if epoch:
+        datas = pd.to_datetime(pd.to_numeric(bloco.iloc[:, 0], errors="coerce"), unit="ms", errors="coerce", utc=True).dt.tz_convert(FUSO_ENERGIA)
+    else:
+        datas = pd.to_datetime(bloco.iloc[:, 0], errors="coerce")
+    convertido = {"DataHora": datas.array}
+    for i, col in enumerate(columns[1:], start=1):
+        convertido[col] = pd.to_numeric(bloco.iloc[:, i], errors="coerce").to_numpy(dtype="float32", na_value=np.nan)
+    return pd.DataFrame(convertido)
+
+def estimar_linhas_csv(arquivo):
+    # pelo tamanho do arquivo e pelas quebras de linha do início, sem ler tudo
+    if isinstance(arquivo, (str, os.PathLike)):
+        tamanho = os.path.getsize(arquivo)
+        with open(arquivo, "rb") as f:
+            inicio = f.read(65536)
+    else:
+        conteudo = ler_bytes(arquivo)
+        tamanho, inicio = len(conteudo), conteudo[:65536]
+    return int(tamanho * inicio.count(b"\n") / len(inicio)) if inicio else 0
+
+def ler_csv_energia(arquivo, linhas_por_bloco=None, progresso=None):
+    linhas_por_bloco = linhas_por_bloco or LINHAS_POR_BLOCO
+    amostra = pd.read_csv(origem_csv(arquivo), nrows=1000)
+    if len(amostra.columns) < 2:
+        raise ValueError("O arquivo CSV deve conter pelo menos 2 colunas (Data/Hora e Potência).")
+    columns = ["DataHora", "Potência"]
+    if len(amostra.columns) > 2:
+        columns.extend([f"Potência_Trafo{i+2}" for i in range(min(3, len(amostra.columns)-2))])
+    nomes = list(amostra.columns[:len(columns)])
+    epoch = pd.api.types.is_numeric_dtype(amostra.iloc[:, 0])
+    # tipos explícitos evitam a inferência por bloco; se houver texto nas colunas numéricas, converte com coerção
+    dtypes = {nome: "float32" for nome in nomes[1:]}
+    if epoch:
+        dtypes[nomes[0]] = "float64"
+    total = estimar_linhas_csv(arquivo) if progresso else None
+
+    def ler_blocos(leitor):
+        blocos, linhas = [], 0
+        for bloco in leitor:
+            blocos.append(converter_bloco_energia(bloco, columns, epoch))
+            linhas += len(bloco)
+            if progresso:
+                progresso(linhas, max(total, linhas))
+        return blocos
+    try:
+        blocos = ler_blocos(pd.read_csv(origem_csv(arquivo), usecols=nomes, dtype=dtypes, chunksize=linhas_por_bloco))
+    except ValueError:
+        blocos = ler_blocos(pd.read_csv(origem_csv(arquivo), usecols=nomes, chunksize=linhas_por_bloco))
+    df = pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame(columns=columns)
+    if df["DataHora"].isna().all():
+        raise ValueError("Formato de data/hora inválido.")
+    df["Aba"] = pd.Categorical.from_codes(np.zeros(len(df), dtype="int8"), categories=["ENERGIA"])
+    return df
+
+@instrumentado
+def ler_arquivo(uploaded_file, modo, aba=None, progresso=None):
+    # progresso(linhas=, total_linhas=, abas=, total_abas=) é chamado ao longo da leitura; uma exceção
+    # levantada por ele (cancelamento) interrompe a leitura
+    dados = []
+    if modo in ["SITRAD", "DATALOGGER"]:
+        conteudo = ler_bytes(uploaded_file)
+        xls = abrir_xls(conteudo)
+        if aba is not None:
+            abas = [aba]
+        else:
+            abas = listar_abas(conteudo) if xls is None else xls.sheet_names
+            abas = abas if modo == "SITRAD" else abas[1:2]
+        if xls is not None:
+            with xls:
+                dados = ler_abas_xls(xls, abas, modo, progresso)
+        elif progresso is None:
+            dados = executar_em_paralelo(processar_aba, [(sheet, modo) for sheet in abas], initializer=definir_conteudo_worker, initargs=(conteudo,))
+        elif len(abas) == 1 or min(MAX_WORKERS, len(abas)) <= 1:
+            # leitura sequencial: progresso por bloco de linhas
+            linhas = 0
+            for i, sheet in enumerate(abas):
+                def progresso_aba(lidas, total, i=i):
+                    progresso(linhas=linhas + lidas, total_linhas=linhas + total if total and len(abas) == 1 else None, abas=i, total_abas=len(abas))
+                df_aba = normalizar_aba(ler_aba_excel(conteudo, sheet, progresso_aba), modo, sheet)
+                dados.append(df_aba)
+                linhas += len(df_aba)
+                progresso(linhas=linhas, total_linhas=None, abas=i + 1, total_abas=len(abas))
+        else:
+            # abas em paralelo: progresso por aba concluída
+            linhas = 0
+            for df_aba in iterar_em_paralelo(processar_aba, [(sheet, modo) for sheet in abas], initializer=definir_conteudo_worker, initargs=(conteudo,)):
+                dados.append(df_aba)
+                linhas += len(df_aba)
+                progresso(linhas=linhas, total_linhas=None, abas=len(dados), total_abas=len(abas))
+    else:  # ENERGIA
+        dados.append(ler_csv_energia(uploaded_file, progresso=(lambda lidas, total: progresso(linhas=lidas, total_linhas=total, abas=0, total_abas=1)) if progresso else None))
+    return indexar_tempo(pd.concat(dados, ignore_index=True))
+
+# Índice temporal: dados ordenados por DataHora e chave de minuto do dia calculados uma vez na leitura
+COLUNAS_INTERNAS = ["MinutoDia"]
+
+def indexar_tempo(df):
+    df = df.sort_values("DataHora", kind="stable", na_position="last", ignore_index=True)
+    df["MinutoDia"] = (df["DataHora"].dt.hour * 60 + df["DataHora"].dt.minute).fillna(-1).astype("int16")
+    return df
+
+def minuto_do_dia(df):
+    if "MinutoDia" in df.columns:
+        return df["MinutoDia"]
+    return df["DataHora"].dt.hour * 60 + df["DataHora"].dt.minute
+
+def chave_tempo(valor, datas):
+    valor = alinhar_fuso(valor, datas)
+    if valor.tzinfo is not None:
+        valor = valor.tz_convert("UTC").tz_localize(None)
+    return valor.to_datetime64()
+
+def posicoes_intervalo(df, inicio, fim):
+    # busca binária sobre o array datetime64 (NaT fica no fim)
+    datas = df["DataHora"].values
+    i = np.searchsorted(datas, chave_tempo(inicio, df["DataHora"]), side="left")
+    j = np.searchsorted(datas, chave_tempo(fim, df["DataHora"]), side="right")
+    return int(i), int(j)
+
+def fatiar_intervalo(df, inicio, fim):
+    # retorna uma fatia sem cópia dos dados
+    i, j = posicoes_intervalo(df, inicio, fim)
+    return df.iloc[i:j]
+
+def posicao_nat(df):
+    # como NaT fica no fim da ordenação, a primeira posição com NaT é o número de datas válidas
+    return int(np.searchsorted(df["DataHora"].values, np.datetime64("NaT"), side="left"))
+
+# Consolidação de vários arquivos do mesmo modo por mescla dos conjuntos já ordenados
+def tempos_ordenacao(df):
+    # int64 em ns (UTC para datas com fuso); NaT fica de fora da mescla
+    return df["DataHora"].values[:posicao_nat(df)].astype("datetime64[ns]").view("int64")
+
+def mesclar_sequencias(a, b):
+    tempos_a, linhas_a = a
+    tempos_b, linhas_b = b
+    # em empates, a sequência da esquerda (arquivo anterior) vem primeiro
+    destino_a = np.arange(len(tempos_a)) + np.searchsorted(tempos_b, tempos_a, side="left")
+    destino_b = np.arange(len(tempos_b)) + np.searchsorted(tempos_a, tempos_b, side="right")
+    tempos = np.empty(len(tempos_a) + len(tempos_b), dtype=np.int64)
+    linhas = np.empty(len(tempos), dtype=np.int64)
+    tempos[destino_a], tempos[destino_b] = tempos_a, tempos_b
+    linhas[destino_a], linhas[destino_b] = linhas_a, linhas_b
+    return tempos, linhas
+
+def ordem_mesclada(conjuntos):
+    # devolve a ordem final como posições na concatenação dos conjuntos (NaT de todos no fim)
+    inicios = np.cumsum([0] + [len(df) for df in conjuntos])
+    sequencias = []
+    datas_nat = []
+    for df, inicio in zip(conjuntos, inicios):
+        tempos = tempos_ordenacao(df)
+        sequencias.append((tempos, np.arange(inicio, inicio + len(tempos))))
+        datas_nat.append(np.arange(inicio + len(tempos), inicio + len(df)))
+    while len(sequencias) > 1:
+        sequencias = [mesclar_sequencias(sequencias[i], sequencias[i + 1]) if i + 1 < len(sequencias) else sequencias[i] for i in range(0, len(sequencias), 2)]
+    return sequencias[0][0], np.concatenate([sequencias[0][1]] + datas_nat)
+
+def linhas_duplicadas(tempos, abas):
+    # só linhas com o mesmo instante de uma vizinha podem repetir (DataHora, Aba); mantém a primeira
+    duplicadas = np.zeros(len(abas), dtype=bool)
+    iguais = np.flatnonzero(np.diff(tempos) == 0)
+    if len(iguais):
+        candidatas = np.union1d(iguais, iguais + 1)
+        repetidas = pd.DataFrame({"t": tempos[candidatas], "a": abas[candidatas]}).duplicated(keep="first").to_numpy()
+        duplicadas[candidatas[repetidas]] = True
+    return duplicadas
+
+def coluna_consolidada(conjuntos, coluna, ordem):
+    partes = [df[coluna] if coluna in df.columns else pd.Series(np.nan, index=range(len(df))) for df in conjuntos]
+    if all(isinstance(p.dtype, pd.CategoricalDtype) for p in partes):
+        valores = pd.api.types.union_categoricals([p.array for p in partes], ignore_order=True)
+        return pd.Series(valores.take(ordem))
+    return pd.concat(partes, ignore_index=True).iloc[ordem].reset_index(drop=True)
+
+@instrumentado
+def consolidar_conjuntos(conjuntos):
+    tempos, ordem = ordem_mesclada(conjuntos)
+    abas = pd.concat([df["Aba"].astype(object) if "Aba" in df.columns else pd.Series(None, index=range(len(df)), dtype=object)
+                      for df in conjuntos], ignore_index=True).to_numpy()[ordem]
+    validas = len(tempos)
+    duplicadas = linhas_duplicadas(tempos, abas[:validas])
+    ordem = np.concatenate([ordem[:validas][~duplicadas], ordem[validas:]])
+    colunas = list(dict.fromkeys(c for df in conjuntos for c in df.columns))
+    resultado = pd.DataFrame({c: coluna_consolidada(conjuntos, c, ordem) for c in colunas})
+    if "MinutoDia" in resultado.columns and resultado["MinutoDia"].isna().any():
+        resultado["MinutoDia"] = (resultado["DataHora"].dt.hour * 60 + resultado["DataHora"].dt.minute).fillna(-1).astype("int16")
+    resultado.attrs["chave"] = hashlib.sha256("|".join(str(df.attrs.get("chave") or id(df)) for df in conjuntos).encode("utf-8")).hexdigest()
+    resultado.attrs["consolidacao"] = {"arquivos": len(conjuntos), "linhas": int(sum(len(df) for df in conjuntos)), "duplicadas": int(duplicadas.sum())}
+    return resultado
+
+@contar_cache("consolidar_arquivos")
+@st.cache_resource(max_entries=4)
+def consolidar_arquivos(chaves, _conjuntos):
+    registrar_falha_cache("consolidar_arquivos")
+    df = consolidar_conjuntos(_conjuntos)
+    CONJUNTOS_COMPARTILHADOS[df.attrs["chave"]] = df
+    return df
+
+@instrumentado
+def preparar_exportacao(df):
+    # datas são formatadas só aqui, no momento de exibir/exportar
+    df_export = df.drop(columns=[c for c in COLUNAS_INTERNAS if c in df.columns])
+    if "DataHora" in df_export.columns:
+        df_export["DataHora"] = formatar_datas(df_export["DataHora"])
+    return df_export
+
+def formatar_datas(datas):
+    # equivalente a dt.strftime("%Y/%m/%d %H:%M:%S"), mas feito sobre o texto ISO do numpy
+    if datas.dt.tz is not None:
+        datas = datas.dt.tz_localize(None)
+    texto = datas.to_numpy().astype("datetime64[s]").astype("U19")
+    caracteres = texto.view("U1").reshape(-1, 19)
+    caracteres[:, [4, 7]] = "/"
+    caracteres[:, 10] = " "
+    return pd.Series(texto, index=datas.index, dtype=object).where(datas.notna().to_numpy())
+
+# Filtros: predicados combinados por AND, cada um com sua máscara em cache
+DIAS_SEMANA = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+MAX_BYTES_FILTROS = int(os.environ.get("ANALISADOR_MAX_MB_FILTROS", "512")) * 1024 * 1024
+
+@instrumentado
+def mascara_filtro(df, filtro):
+    tipo = filtro["tipo"]
+    if tipo == "hora":
+        hora, minuto = map(int, filtro["hora"].split(":"))
+        if hora > 23 or minuto > 59:
+            raise ValueError("Hora inválida.")
+        return minuto_do_dia(df).to_numpy() == hora * 60 + minuto
+    if tipo == "valor":
+        if filtro["min"] > filtro["max"]:
+            raise ValueError("Mínimo deve ser menor que máximo.")
+        valores = df[filtro["coluna"]].to_numpy(dtype=np.float64, na_value=np.nan)
+        return (valores >= filtro["min"]) & (valores <= filtro["max"])  # NaN nunca passa
+    if tipo == "intervalo":
+        i, j = posicoes_intervalo(df, *intervalo_faixa(filtro))
+        mascara = np.zeros(len(df), dtype=bool)
+        mascara[i:j] = True
+        return mascara
+    if tipo == "dia_semana":
+        return df["DataHora"].dt.dayofweek.isin(filtro["dias"]).to_numpy()
+    if tipo == "nan":
+        presentes = df[filtro["colunas"]].notna().all(axis=1).to_numpy()
+        return presentes if filtro.get("manter", "validos") == "validos" else ~presentes
+    raise ValueError(f"Filtro desconhecido: {tipo}")
+
+def chave_filtro(filtro):
+    return json.dumps(filtro, sort_keys=True, ensure_ascii=False, default=str)
+
+def mesmo_alvo(a, b):
+    # um filtro novo substitui o anterior do mesmo tipo (e da mesma coluna, no filtro de valor)
+    return a["tipo"] == b["tipo"] and a.get("coluna") == b.get("coluna")
+
+def adicionar_filtro(filtros, filtro):
+    return [f for f in filtros if not mesmo_alvo(f, filtro)] + [filtro]
+
+def descricao_filtro(filtro):
+    tipo = filtro["tipo"]
+    if tipo == "hora":
+        return f"Hora = {filtro['hora']}"
+    if tipo == "valor":
+        return f"{filtro['min']} ≤ {filtro['coluna']} ≤ {filtro['max']}"
+    if tipo == "intervalo":
+        return f"Período: {filtro['inicio']} até {filtro['fim']}"
+    if tipo == "dia_semana":
+        return "Dias: " + ", ".join(DIAS_SEMANA[d] for d in filtro["dias"])
+    return ("Sem" if filtro.get("manter", "validos") == "validos" else "Somente") + " valores ausentes em " + ", ".join(filtro["colunas"])
+
+def novo_cache_filtros(limite_bytes=None):
+    return {"itens": OrderedDict(), "bytes": 0, "limite": limite_bytes or MAX_BYTES_FILTROS, "trava": threading.Lock()}
+
+@st.cache_resource
+def cache_filtros_compartilhado():
+    # máscaras e posições dos recortes filtrados ficam no processo, compartilhados entre sessões que usam o mesmo arquivo
+    return novo_cache_filtros()
+
+def cache_do_conjunto(df):
+    # conjuntos com chave de conteúdo usam o cache do processo; os demais (modo incremental), o da sessão
+    return cache_filtros_compartilhado() if df.attrs.get("chave") and not df.attrs.get("incremental") else st.session_state['cache_filtros']
+
+def buscar_no_cache(cache, chave):
+    with cache["trava"]:
+        item = cache["itens"].get(chave)
+        registrar_cache(f"filtros/{chave[0]}", item is not None)
+        if item is None:
+            return None
+        cache["itens"].move_to_end(chave)
+        return item[0]
+
+def guardar_no_cache(cache, chave, valor, tamanho):
+    with cache["trava"]:
+        if chave in cache["itens"]:
+            return
+        cache["itens"][chave] = (valor, tamanho)
+        cache["bytes"] += tamanho
+        while cache["bytes"] > cache["limite"] and len(cache["itens"]) > 1:
+            _, (_, tamanho_antigo) = cache["itens"].popitem(last=False)
+            cache["bytes"] -= tamanho_antigo
+
+def identidade_dados(df):
+    # recortes filtrados herdam a chave do conjunto e levam a lista de filtros que os gerou
+    return (df.attrs.get("chave") or id(df), df.attrs.get("filtros"), len(df))
+
+def mascara_combinada(df, filtros, cache):
+    identidade = identidade_dados(df)
+    mascara = np.ones(len(df), dtype=bool)
+    for filtro in filtros:
+        chave = ("mascara", identidade, chave_filtro(filtro))
+        parcial = buscar_no_cache(cache, chave)
+        if parcial is None:
+            parcial = mascara_filtro(df, filtro)
+            guardar_no_cache(cache, chave, parcial, parcial.nbytes)
+        mascara &= parcial
+    return mascara
+
+def colunas_pontos_filtros(df, modo, filtros):
+    # como antes: filtro de valor marca a própria coluna; filtro de hora marca todas as séries
+    colunas = [f["coluna"] for f in filtros if f["tipo"] == "valor"]
+    if not colunas and any(f["tipo"] == "hora" for f in filtros):
+        colunas = colunas_series(df, modo)
+    return list(dict.fromkeys(colunas))
+
+@instrumentado
+def posicoes_filtradas(df, filtros, cache=None):
+    # recorte = posições das linhas do conjunto que passam em todos os filtros (None sem filtros). Só as posições
+    # ficam no cache; cada consumidor lê do conjunto as linhas e colunas de que precisa
+    if not filtros:
+        return None
+    cache = novo_cache_filtros() if cache is None else cache
+    chave_filtros = tuple(chave_filtro(f) for f in filtros)
+    chave = ("posicoes", identidade_dados(df), chave_filtros)
+    posicoes = buscar_no_cache(cache, chave)
+    if posicoes is None:
+        posicoes = np.flatnonzero(mascara_combinada(df, filtros, cache))
+        guardar_no_cache(cache, chave, posicoes, posicoes.nbytes)
+    return {"filtros": chave_filtros, "posicoes": posicoes}
+
+def identidade_recorte(df, recorte):
+    # a mesma identidade do recorte materializado (identidade_dados), sem materializá-lo
+    if recorte is None:
+        return identidade_dados(df)
+    return (df.attrs.get("chave") or id(df), recorte["filtros"], len(recorte["posicoes"]))
+
+def linhas_recorte(df, recorte):
+    return len(df) if recorte is None else len(recorte["posicoes"])
+
+def recorte_filtrado(df, recorte, colunas=None):
+    # cópia das linhas do recorte (só das colunas pedidas) para quem precisa de um DataFrame; não vai para
+    # o cache nem para a sessão. Sem recorte, o próprio conjunto
+    if recorte is None:
+        return df
+    dados = df if colunas is None else df[[c for c in df.columns if c in colunas]]
+    dados = dados.iloc[recorte["posicoes"]]
+    dados.attrs["filtros"] = recorte["filtros"]
+    return dados
+
+def pontos_recorte(df, modo, filtros, recorte):
+    colunas = colunas_pontos_filtros(df, modo, filtros)
+    if recorte is None or not colunas:
+        return pontos_vazios()
+    return extrair_pontos(recorte_filtrado(df, recorte, ["DataHora", *colunas]), colunas)
+
+@instrumentado
+def aplicar_filtros(df, modo, filtros, cache=None):
+    # devolve (dados filtrados, pontos filtrados) materializados, para o lote e o benchmark; sem filtros o próprio
+    # conjunto é devolvido, sem cópia. A página trabalha só com as posições (posicoes_filtradas)
+    recorte = posicoes_filtradas(df, filtros, cache)
+    if recorte is None:
+        return df, pontos_vazios()
+    return recorte_filtrado(df, recorte), pontos_recorte(df, modo, filtros, recorte)
+
+def estado_filtros(filtros):
+    # chaves usadas pelo gráfico (linhas de limite), pelas estatísticas e pela configuração salva
+    valor = [f for f in filtros if f["tipo"] == "valor"]
+    hora = [f for f in filtros if f["tipo"] == "hora"]
+    return {
+        "filtro_ativo": "valor" if valor else "hora" if hora else (filtros[-1]["tipo"] if filtros else None),
+        "filtro_hora_valor": hora[-1]["hora"] if hora else None,
+        "filtro_valor_min": valor[-1]["min"] if valor else None,
+        "filtro_valor_max": valor[-1]["max"] if valor else None,
+        "filtro_valor_tipo": valor[-1]["coluna"] if valor else None
+    }
+
+def filtros_configuracao(config):
+    if config.get("filtros") is not None:
+        return config["filtros"]
+    # configurações antigas: um único filtro ativo
+    if config.get("filtro_ativo") == "hora" and config.get("filtro_hora"):
+        return [{"tipo": "hora", "hora": config["filtro_hora"]}]
+    if config.get("filtro_ativo") == "valor" and config.get("filtro_valor_tipo") and config.get("filtro_valor_min") is not None and config.get("filtro_valor_max") is not None:
+        return [{"tipo": "valor", "coluna": config["filtro_valor_tipo"], "min": config["filtro_valor_min"], "max": config["filtro_valor_max"]}]
+    return []
+
+def intervalo_faixa(faixa):
+    inicio = pd.to_datetime(faixa["inicio"], format="%Y/%m/%d %H:%M:%S")
+    fim = pd.to_datetime(faixa["fim"], format="%Y/%m/%d %H:%M:%S")
+    return inicio, fim
+
+def exportar_faixa(df, faixa):
+    inicio, fim = intervalo_faixa(faixa)
+    filtrado = fatiar_intervalo(df, inicio, fim)
+    if filtrado.empty:
+        return None
+    return planilha_faixa(filtrado)
+
+# Exportação em lote das faixas: xlsx gravado em streaming, em blocos de linhas
+LINHAS_POR_BLOCO_EXPORTACAO = 50000
+CARACTERES_INVALIDOS_ABA = re.compile(r"[\[\]:*?/\\]")
+CARACTERES_INVALIDOS_XML = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+LIMITE_CARACTERES_CELULA = 32767
+XML_CABECALHO = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+XML_PLANILHA = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XML_RELACOES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XML_PACOTE = "http://schemas.openxmlformats.org/package/2006/relationships"
+XML_TIPOS = (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{abas}</Types>'
+)
+XML_TIPO_ABA = (
+    '<Override PartName="/xl/worksheets/sheet{i}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+XML_RAIZ = (
+    f'<Relationships xmlns="{XML_PACOTE}">'
+    f'<Relationship Id="rId1" Type="{XML_RELACOES}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+)
+XML_PASTA = f'<workbook xmlns="{XML_PLANILHA}" xmlns:r="{XML_RELACOES}"><sheets>{{abas}}</sheets></workbook>'
+XML_ABA = '<sheet name="{titulo}" sheetId="{i}" r:id="rId{i}"/>'
+XML_RELACOES_PASTA = f'<Relationships xmlns="{XML_PACOTE}">{{abas}}</Relationships>'
+XML_RELACAO_ABA = f'<Relationship Id="rId{{i}}" Type="{XML_RELACOES}/worksheet" Target="worksheets/sheet{{i}}.xml"/>'
+
+def escapar_xml(serie):
+    serie = serie.str.replace(CARACTERES_INVALIDOS_XML, "", regex=True)
+    return serie.str.replace("&", "&amp;", regex=False).str.replace("<", "&lt;", regex=False).str.replace(">", "&gt;", regex=False)
+
+def celulas_coluna(serie):
+    if pd.api.types.is_bool_dtype(serie):
+        return ('<c t="b"><v>' + serie.astype(int).astype(str) + "</v></c>").to_numpy(dtype=object)
+    if pd.api.types.is_numeric_dtype(serie):
+        valores = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+        return np.where(np.isfinite(valores), ("<c><v>" + serie.astype(str) + "</v></c>").to_numpy(dtype=object), "<c/>")
+    vazio = serie.isna().to_numpy()
+    texto = escapar_xml(serie.astype(str).str.slice(0, LIMITE_CARACTERES_CELULA))
+    return np.where(vazio, "<c/>", ('<c t="inlineStr"><is><t xml:space="preserve">' + texto + "</t></is></c>").to_numpy(dtype=object))
+
+def xml_linhas(df):
+    colunas = [celulas_coluna(df[c]) for c in df.columns]
+    return "".join(["<row>" + "".join(celulas) + "</row>" for celulas in zip(*colunas)])
+
+def escrever_xml_aba(arquivo, df):
+    cabecalho = pd.Series([str(c) for c in df.columns if c not in COLUNAS_INTERNAS], dtype=object)
+    dimensao = f"A1:{openpyxl.utils.get_column_letter(max(len(cabecalho), 1))}{len(df) + 1}"
+    arquivo.write(f'{XML_CABECALHO}<worksheet xmlns="{XML_PLANILHA}"><dimension ref="{dimensao}"/><sheetData>'.encode("utf-8"))
+    arquivo.write(("<row>" + "".join(celulas_coluna(cabecalho)) + "</row>").encode("utf-8"))
+    for i in range(0, len(df), LINHAS_POR_BLOCO_EXPORTACAO):
+        arquivo.write(xml_linhas(preparar_exportacao(df.iloc[i:i + LINHAS_POR_BLOCO_EXPORTACAO])).encode("utf-8"))
+    arquivo.write(b"</sheetData></worksheet>")
+
+def escrever_xlsx(destino, abas):
+    titulos = []
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for i, (titulo, df) in enumerate(abas, start=1):
+            with zf.open(f"xl/worksheets/sheet{i}.xml", "w", force_zip64=True) as arquivo:
+                escrever_xml_aba(arquivo, df)
+            titulos.append(titulo.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;"))
+        indices = range(1, len(titulos) + 1)
+        zf.writestr("[Content_Types].xml", XML_CABECALHO + XML_TIPOS.format(abas="".join(XML_TIPO_ABA.format(i=i) for i in indices)))
+        zf.writestr("_rels/.rels", XML_CABECALHO + XML_RAIZ)
+        abas_pasta = "".join(XML_ABA.format(titulo=t, i=i) for i, t in zip(indices, titulos))
+        zf.writestr("xl/workbook.xml", XML_CABECALHO + XML_PASTA.format(abas=abas_pasta))
+        zf.writestr("xl/_rels/workbook.xml.rels", XML_CABECALHO + XML_RELACOES_PASTA.format(abas="".join(XML_RELACAO_ABA.format(i=i) for i in indices)))
+
+def planilha_faixa(df, titulo="Sheet1"):
+    # faixas acima do limite de linhas do Excel seguem em várias abas, como no relatório
+    buf = BytesIO()
+    escrever_xlsx(buf, abas_dados(df, titulo, LIMITE_LINHAS_EXCEL - 1))
+    return buf.getvalue()
+
+def exportar_faixa_worker(nome, df):
+    return nome, planilha_faixa(df)
+
+def nome_unico(nome, usados, limite=None):
+    base = nome[:limite] if limite else nome
+    candidato, n = base, 2
+    while candidato.lower() in usados:
+        sufixo = f" ({n})"
+        candidato = (base[:limite - len(sufixo)] if limite else base) + sufixo
+        n += 1
+    usados.add(candidato.lower())
+    return candidato
+
+def iterar_em_paralelo(funcao, argumentos, max_workers=None, initializer=None, initargs=()):
+    # como executar_em_paralelo, mas devolve os resultados em ordem à medida que ficam prontos,
+    # com no máximo 2 tarefas por processo em andamento (memória limitada)
+    argumentos = list(argumentos)
+    max_workers = min(max_workers or MAX_WORKERS, len(argumentos))
+    feitos = 0
+    if max_workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto_processos(), initializer=initializer, initargs=initargs) as executor:
+                pendentes = deque()
+                try:
+                    for args in argumentos:
+                        pendentes.append(executor.submit(funcao, *args))
+                        if len(pendentes) >= 2 * max_workers:
+                            yield pendentes.popleft().result()
+                            feitos += 1
+                    while pendentes:
+                        yield pendentes.popleft().result()
+                        feitos += 1
+                except GeneratorExit:
+                    executor.shutdown(wait=False, cancel_futures=True)  # consumidor desistiu (cancelamento)
+                    raise
+            return
+        except (BrokenProcessPool, OSError, pickle.PicklingError):
+            pass  # ambiente sem suporte a processos: segue sequencialmente
+    if initializer is not None and feitos < len(argumentos):
+        initializer(*initargs)
+    for args in argumentos[feitos:]:
+        yield funcao(*args)
+
+@instrumentado
+def exportar_faixas(df, faixas, formato="zip", max_workers=None):
+    fatias, avisos = [], []
+    for faixa in faixas:
+        try:
+            inicio, fim = intervalo_faixa(faixa)
+        except ValueError:
+            avisos.append(f"Erro na faixa {faixa['nome']}: Formato de data inválido.")
+            continue
+        filtrado = fatiar_intervalo(df, inicio, fim)
+        if filtrado.empty:
+            avisos.append(f"Nenhum dado para a faixa {faixa['nome']}.")
+            continue
+        fatias.append((faixa["nome"], filtrado))
+    if not fatias:
+        return None, avisos
+    buf = BytesIO()
+    usados = set()
+    if formato == "zip":
+        # cada faixa vira um .xlsx gerado em paralelo; o zip é montado na ordem das faixas
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            for nome, conteudo in iterar_em_paralelo(exportar_faixa_worker, fatias, max_workers):
+                zf.writestr(nome_unico(CARACTERES_INVALIDOS_ABA.sub("_", nome) or "Faixa", usados) + ".xlsx", conteudo)
+    else:
+        # planilha única: uma aba por faixa (ou mais, acima do limite de linhas), gravadas em sequência no processo
+        # principal, pois todas vão para o mesmo zip; só o modo zip gera as faixas em paralelo
+        abas = []
+        for nome, filtrado in fatias:
+            base = CARACTERES_INVALIDOS_ABA.sub("_", nome) or "Faixa"
+            base = base[:31] if len(filtrado) < LIMITE_LINHAS_EXCEL else base[:27]  # espaço para o sufixo "_N"
+            abas.extend((nome_unico(titulo, usados, 31), parte) for titulo, parte in abas_dados(filtrado, base, LIMITE_LINHAS_EXCEL - 1))
+        escrever_xlsx(buf, abas)
+    return buf.getvalue(), avisos
+
+# Redução de pontos do gráfico: mínimo/máximo por intervalo, preservando picos, excursões e lacunas
+MAX_PONTOS_GRAFICO = int(os.environ.get("ANALISADOR_MAX_PONTOS_GRAFICO", "4000"))
+LINHAS_REDUCAO_DIRETA = 50
+LIMIAR_WEBGL = 2000
+
+def alinhar_fuso(valor, serie):
+    valor = pd.Timestamp(valor)
+    fuso = getattr(serie.dt, "tz", None)
+    if fuso is not None and valor.tzinfo is None:
+        # horário digitado que cai no salto do horário de verão vai para o primeiro instante existente; na hora
+        # repetida do fim do horário de verão vale a primeira ocorrência (NaT aqui desfaria o limite do intervalo)
+        return valor.tz_localize(fuso, nonexistent="shift_forward", ambiguous=True)
+    if fuso is None and valor.tzinfo is not None:
+        return valor.tz_localize(None)
+    return valor
+
+def indices_reduzidos(y, max_pontos):
+    n = len(y)
+    if not max_pontos or n <= max_pontos:
+        return None
+    tamanho = int(np.ceil(n / max(max_pontos // 3, 1)))  # até 3 pontos por intervalo: mínimo, máximo e lacuna
+    intervalos = int(np.ceil(n / tamanho))
+    valores = np.full(intervalos * tamanho, np.nan)
+    valores[:n] = y
+    valores = valores.reshape(intervalos, tamanho)
+    nulos = np.isnan(valores)
+    base = np.arange(intervalos) * tamanho
+    i_min = np.where(nulos, np.inf, valores).argmin(axis=1) + base
+    i_max = np.where(nulos, -np.inf, valores).argmax(axis=1) + base
+    i_nulo = (nulos.argmax(axis=1) + base)[nulos.any(axis=1)]
+    indices = np.unique(np.concatenate([i_min, i_max, i_nulo]))
+    return indices[indices < n]
+
+def reduzir_pontos(x, y, max_pontos=MAX_PONTOS_GRAFICO):
+    indices = indices_reduzidos(y.to_numpy(dtype="float64", na_value=np.nan), max_pontos)
+    if indices is None:
+        return x, y
+    return x.iloc[indices], y.iloc[indices]
+
+def dados_serie(df, col, buffers=None, piramide=None, max_pontos=MAX_PONTOS_GRAFICO):
+    # buffers já reduzidos (modo incremental) evitam percorrer a série inteira a cada atualização
+    if buffers and col in buffers:
+        return buffers[col]
+    # até LINHAS_REDUCAO_DIRETA vezes o limite de pontos, a redução mínimo/máximo roda sobre os dados brutos
+    if piramide is not None and max_pontos and len(df) > LINHAS_REDUCAO_DIRETA * max_pontos and col in piramide["min"].columns.get_level_values(0):
+        datas = tempo_local(df["DataHora"].iloc[[0, posicao_nat(df) - 1]])
+        if not datas.isna().any():
+            return serie_agregada(df, piramide, col, datas.iloc[0], datas.iloc[1], max_pontos)
+    return df["DataHora"], df[col]
+
+def criar_trace(x, y, name, color, max_pontos=MAX_PONTOS_GRAFICO):
+    x_reduzido, y_reduzido = reduzir_pontos(x, y, max_pontos)
+    trace = go.Scattergl if len(x) > LIMIAR_WEBGL else go.Scatter
+    mode = "lines+markers" if len(x_reduzido) == len(x) and len(x) <= LIMIAR_WEBGL else "lines"
+    return trace(x=x_reduzido, y=y_reduzido, mode=mode, name=name, line=dict(color=color))
+
+# Excursões: períodos contínuos fora dos limites (RLE da máscara de violação, por série e aba)
+MAX_EXCURSOES_GRAFICO = 300
+COLUNAS_EXCURSOES = ["Série", "Aba", "Tipo", "Início", "Fim", "Duração", "Pico", "Média", "Amostras"]
+CORES_EXCURSOES = {"acima": "rgba(220, 53, 69, 0.18)", "abaixo": "rgba(13, 110, 253, 0.18)"}
+
+def eventos_vazios():
+    return pd.DataFrame(columns=COLUNAS_EXCURSOES)
+
+def sequencias(estado):
+    bordas = np.diff(estado.astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+    return np.flatnonzero(bordas == 1), np.flatnonzero(bordas == -1)
+
+def excursoes_serie(valores, limite, acima, histerese=0.0):
+    # devolve início, fim (exclusivo), pico e média de cada sequência; NaN encerra a excursão (sem leitura, sem confirmação)
+    with np.errstate(invalid="ignore"):
+        entra = valores > limite if acima else valores < limite
+        banda = valores >= limite - histerese if acima else valores <= limite + histerese
+    inicios, fins = sequencias(entra)
+    if histerese > 0 and len(inicios):
+        # com histerese a excursão começa na primeira leitura fora do limite e só termina ao sair da banda
+        # (limite ± histerese): é cada sequência da banda que contém alguma violação, a partir da primeira
+        inicios_banda, fins_banda = sequencias(banda)
+        k = np.searchsorted(inicios, inicios_banda)
+        contem = inicios[np.minimum(k, len(inicios) - 1)] < fins_banda
+        contem &= k < len(inicios)
+        inicios, fins = inicios[k[contem]], fins_banda[contem]
+    if not len(inicios):
+        return inicios, fins, np.empty(0), np.empty(0)
+    # reduceat sobre [início, fim) de cada sequência; o sentinela no fim permite fim == len(valores)
+    estendido = np.append(valores, 0.0)
+    limites = np.column_stack([inicios, fins]).ravel()
+    pico = (np.maximum if acima else np.minimum).reduceat(estendido, limites)[::2]
+    media = np.add.reduceat(estendido, limites)[::2] / (fins - inicios)
+    return inicios, fins, pico, media
+
+def grupos_aba(df, validas, cache=None):
+    # abas do SITRAD são instrumentos diferentes intercalados no tempo: cada uma é uma série própria.
+    # A codificação das abas (cara em texto) fica em cache por conjunto de dados
+    if "Aba" not in df.columns:
+        return [(None, None)]
+    cache = novo_cache_filtros() if cache is None else cache
+    chave = ("abas", identidade_dados(df))
+    codificacao = buscar_no_cache(cache, chave)
+    if codificacao is None:
+        codigos, abas = pd.factorize(df["Aba"].iloc[:validas])
+        codificacao = (list(abas), codigos.astype(np.int16) if len(abas) > 1 else None)
+        guardar_no_cache(cache, chave, codificacao, codigos.nbytes // 4 if len(abas) > 1 else 0)
+    abas, codigos = codificacao
+    if codigos is None:
+        return [(abas[0] if abas else None, None)]
+    return [(aba, np.flatnonzero(codigos == k)) for k, aba in enumerate(abas)]
 
-def gerar_grafico(df, modo, filtro_ativo, filtro_valor_min, filtro_valor_max, filtro_valor_tipo, escala_y_min, escala_y_max, title="Gráfico de Dados", pontos_marcados=None, pontos_filtrados=None):
+@instrumentado
+def detectar_excursoes(df, regra, cache=None):
+    # Início/Fim são a primeira e a última leitura fora do limite; a duração mínima é aplicada sobre esse intervalo
+    validas = posicao_nat(df)
+    tempos = df["DataHora"].values[:validas]
+    valores = df[regra["coluna"]].to_numpy(dtype=np.float64, na_value=np.nan)[:validas]
+    duracao_minima = np.timedelta64(int(float(regra.get("duracao_minima") or 0) * 60), "s")
+    histerese = float(regra.get("histerese") or 0.0)
+    partes = []
+    for aba, posicoes in grupos_aba(df, validas, cache):
+        t = tempos if posicoes is None else tempos[posicoes]
+        v = valores if posicoes is None else valores[posicoes]
+        for tipo, limite, acima in (("acima", regra.get("max"), True), ("abaixo", regra.get("min"), False)):
+            if limite is None:
+                continue
+            inicios, fins, pico, media = excursoes_serie(v, float(limite), acima, histerese)
+            duracao = t[fins - 1] - t[inicios]
+            manter = duracao >= duracao_minima
+            partes.append(pd.DataFrame({
+                "Série": regra["coluna"], "Aba": aba, "Tipo": tipo, "Início": t[inicios[manter]], "Fim": t[fins[manter] - 1],
+                "Duração": duracao[manter], "Pico": pico[manter], "Média": media[manter], "Amostras": fins[manter] - inicios[manter]
+            }))
+    eventos = pd.concat(partes, ignore_index=True) if partes else eventos_vazios()
+    fuso = getattr(df["DataHora"].dt, "tz", None)
+    if fuso is not None and not eventos.empty:
+        for col in ("Início", "Fim"):
+            eventos[col] = eventos[col].dt.tz_localize("UTC").dt.tz_convert(fuso)
+    return eventos
+
+def adicionar_regra_excursao(regras, regra):
+    # uma regra por série: a nova substitui a anterior da mesma coluna
+    return [r for r in regras if r["coluna"] != regra["coluna"]] + [regra]
+
+def descricao_regra_excursao(regra):
+    limites = []
+    if regra.get("min") is not None:
+        limites.append(f"< {regra['min']}")
+    if regra.get("max") is not None:
+        limites.append(f"> {regra['max']}")
+    detalhes = [f"duração ≥ {regra['duracao_minima']} min" if regra.get("duracao_minima") else None, f"histerese {regra['histerese']}" if regra.get("histerese") else None]
+    return f"{regra['coluna']} {' ou '.join(limites)}" + "".join(f", {d}" for d in detalhes if d)
+
+def excursoes_conjunto(df, regras, cache=None, recorte=None):
+    if not regras or df.empty:
+        return eventos_vazios()
+    cache = novo_cache_filtros() if cache is None else cache
+    chave = ("excursoes", identidade_recorte(df, recorte), tuple(chave_filtro(r) for r in regras))
+    eventos = buscar_no_cache(cache, chave)
+    if eventos is None:
+        df = recorte_filtrado(df, recorte, ["DataHora", "Aba", *(r["coluna"] for r in regras)])
+        partes = [detectar_excursoes(df, r, cache) for r in regras if r["coluna"] in df.columns]
+        eventos = pd.concat(partes, ignore_index=True).sort_values("Início", kind="stable", ignore_index=True) if partes else eventos_vazios()
+        guardar_no_cache(cache, chave, eventos, tamanho_objeto(eventos))
+    return eventos
+
+def adicionar_excursoes(fig, eventos, janela=None):
+    # regiões sombreadas como shapes de layout (uma única atualização); com muitos eventos, só os mais longos
+    if eventos.empty:
+        return fig
+    if janela is not None:
+        inicio, fim = (alinhar_fuso(v, eventos["Início"]) for v in janela)
+        eventos = eventos[(eventos["Fim"] >= inicio) & (eventos["Início"] <= fim)]
+    if len(eventos) > MAX_EXCURSOES_GRAFICO:
+        eventos = eventos.nlargest(MAX_EXCURSOES_GRAFICO, "Duração")
+    regioes = [dict(type="rect", xref="x", yref="paper", x0=inicio, x1=fim, y0=0, y1=1, fillcolor=CORES_EXCURSOES[tipo],
+                    line=dict(width=1, color=CORES_EXCURSOES[tipo]), layer="below")
+               for inicio, fim, tipo in zip(eventos["Início"], eventos["Fim"], eventos["Tipo"])]
+    fig.update_layout(shapes=list(fig.layout.shapes or ()) + regioes)
+    return fig
+
+def tabela_excursoes(eventos):
+    if eventos.empty:
+        return eventos
+    formatados = {"Início": formatar_datas(eventos["Início"]), "Fim": formatar_datas(eventos["Fim"]), "Duração": eventos["Duração"].astype(str)}
+    return eventos.assign(**formatados).round({"Pico": 2, "Média": 2})
+
+# Energia (modo ENERGIA): consumo, demanda em janelas de 15 minutos e fator de carga, sem interpolar lacunas
+JANELA_DEMANDA = pd.Timedelta(os.environ.get("ANALISADOR_JANELA_DEMANDA", "15min"))
+LACUNA_MAXIMA_ENERGIA = pd.Timedelta(os.environ.get("ANALISADOR_LACUNA_ENERGIA", "5min"))
+PERIODOS_ENERGIA = {"Dia": "datetime64[D]", "Mês": "datetime64[M]", "Total": None}
+COBERTURA_MINIMA_JANELA = 0.9  # janela móvel só conta com ao menos 90% do intervalo coberto por leituras
+COLUNAS_ENERGIA = [
+    "Período", "Série", "Energia (kWh)", "Demanda Máxima (kW)", "Janela da Demanda", "Demanda Móvel Máxima (kW)",
+    "Potência Média (kW)", "Fator de Carga", "Horas com Dados", "Horas sem Dados"
+]
+
+def sequencias_chave(chaves):
+    # início de cada sequência de chaves iguais (dados ordenados no tempo: períodos e janelas são contíguos)
+    return np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]]) if len(chaves) else np.empty(0, dtype=np.int64)
+
+def base_energia(df, lacuna_maxima=LACUNA_MAXIMA_ENERGIA, janela=JANELA_DEMANDA):
+    # tempos em ns (UTC para durações, horário local para períodos e janelas) e os intervalos integráveis
+    validas = posicao_nat(df)
+    utc = df["DataHora"].values[:validas].astype("datetime64[ns]").view("int64")
+    local = tempo_local(df["DataHora"]).values[:validas].astype("datetime64[ns]")
+    dt = np.diff(utc) / 1e9
+    integravel = (dt > 0) & (dt <= lacuna_maxima.total_seconds())
+    # primeira leitura dentro da janela móvel que termina em cada leitura (comum a todas as séries)
+    inicio_movel = np.searchsorted(utc, utc - janela.value, side="left")
+    return {"validas": validas, "utc": utc, "local": local, "dt": dt, "integravel": integravel, "janelas": local[:-1].view("int64") // janela.value, "inicio_movel": inicio_movel}
+
+def energia_intervalos(base, valores):
+    # Wh de cada intervalo [t_i, t_i+1] e segundos efetivamente integrados; sem leituras ausentes, os
+    # segundos integrados são os mesmos para todas as séries e ficam na base
+    media = (valores[:-1] + valores[1:]) / 2
+    finitos = np.isfinite(media)
+    if finitos.all():
+        if "segundos" not in base:
+            base["segundos"] = np.where(base["integravel"], base["dt"], 0.0)
+        return np.where(base["integravel"], media * base["dt"] / 3600, 0.0), base["segundos"]
+    integrar = base["integravel"] & finitos
+    return np.where(integrar, media * base["dt"] / 3600, 0.0), np.where(integrar, base["dt"], 0.0)
+
+def cobertura_insuficiente(base, segundos_integrados, janela=JANELA_DEMANDA):
+    coberto = np.zeros(len(segundos_integrados) + 1)
+    np.cumsum(segundos_integrados, out=coberto[1:])
+    return coberto - coberto[base["inicio_movel"]] < COBERTURA_MINIMA_JANELA * janela.total_seconds()
+
+def demanda_movel(base, wh, segundos_integrados, janela=JANELA_DEMANDA):
+    # potência média (kW) na janela que termina em cada leitura, por diferença de somas acumuladas
+    inicio = base["inicio_movel"]
+    acumulado = np.zeros(len(wh) + 1)
+    np.cumsum(wh, out=acumulado[1:])
+    demanda = acumulado - acumulado[inicio]
+    demanda *= 3600 / 1000 / janela.total_seconds()
+    if segundos_integrados is base.get("segundos"):
+        if "cobertura_insuficiente" not in base:
+            base["cobertura_insuficiente"] = cobertura_insuficiente(base, segundos_integrados, janela)
+        demanda[base["cobertura_insuficiente"]] = np.nan
+    else:
+        demanda[cobertura_insuficiente(base, segundos_integrados, janela)] = np.nan
+    return demanda
+
+@instrumentado
+def calcular_energia(df, colunas, periodo="Dia", lacuna_maxima=LACUNA_MAXIMA_ENERGIA, janela=JANELA_DEMANDA):
+    base = base_energia(df, lacuna_maxima, janela)
+    if base["validas"] < 2:
+        return pd.DataFrame(columns=COLUNAS_ENERGIA)
+    # cada intervalo [t_i, t_i+1] pertence ao período e à janela fixa do seu início
+    unidade = PERIODOS_ENERGIA[periodo]
+    chaves = base["local"][:-1].astype(unidade) if unidade else np.zeros(base["validas"] - 1, dtype=np.int8)
+    inicios = sequencias_chave(chaves)
+    rotulos = pd.Series(chaves[inicios]).dt.strftime("%Y/%m" if periodo == "Mês" else "%Y/%m/%d").to_numpy() if unidade else np.array(["Total"])
+    codigo_periodo = np.zeros(len(chaves), dtype=np.int64)
+    codigo_periodo[inicios[1:]] = 1
+    codigo_periodo = np.cumsum(codigo_periodo)
+    inicios_janela = sequencias_chave(base["janelas"])
+    periodo_janela = codigo_periodo[inicios_janela]
+    inicio_janela = (base["janelas"][inicios_janela] * janela.value).astype("datetime64[ns]")
+    horas_periodo = np.add.reduceat(base["dt"], inicios) / 3600
+    horas_janela = janela.total_seconds() / 3600
+    partes = []
+    for col in colunas:
+        valores = df[col].to_numpy(dtype=np.float64, na_value=np.nan)[:base["validas"]]
+        wh, segundos = energia_intervalos(base, valores)
+        kwh = np.add.reduceat(wh, inicios) / 1000
+        horas = np.add.reduceat(segundos, inicios) / 3600
+        demanda = np.add.reduceat(wh, inicios_janela) / 1000 / horas_janela
+        pico = pd.Series(demanda).groupby(periodo_janela).idxmax().reindex(range(len(inicios))).to_numpy()
+        tem_pico = ~pd.isna(pico)
+        pico = np.where(tem_pico, pico, 0).astype(np.int64)
+        demanda_maxima = np.where(tem_pico, demanda[pico], np.nan)
+        potencia_media = np.divide(kwh, horas, out=np.full(len(kwh), np.nan), where=horas > 0)
+        partes.append(pd.DataFrame({
+            "Período": rotulos,
+            "Série": col,
+            "Energia (kWh)": kwh,
+            "Demanda Máxima (kW)": demanda_maxima,
+            "Janela da Demanda": np.where(tem_pico, inicio_janela[pico], np.datetime64("NaT")),
+            "Demanda Móvel Máxima (kW)": np.fmax.reduceat(demanda_movel(base, wh, segundos, janela)[1:], inicios),
+            "Potência Média (kW)": potencia_media,
+            "Fator de Carga": np.divide(potencia_media, demanda_maxima, out=np.full(len(kwh), np.nan), where=demanda_maxima > 0),
+            "Horas com Dados": horas,
+            "Horas sem Dados": horas_periodo - horas
+        }))
+    return pd.concat(partes, ignore_index=True)
+
+def analise_energia(df, modo, periodo="Dia", faixa=None, cache=None, recorte=None):
+    # resultado em cache por conjunto (com filtros), faixa e período
+    if modo != "ENERGIA" or df.empty:
+        return None
+    cache = novo_cache_filtros() if cache is None else cache
+    chave = ("energia", identidade_recorte(df, recorte), periodo, None if faixa is None else tuple(str(v) for v in faixa), LACUNA_MAXIMA_ENERGIA.value, JANELA_DEMANDA.value)
+    resultado = buscar_no_cache(cache, chave)
+    if resultado is None:
+        dados = recorte_filtrado(df, recorte)  # só na falta: o recorte não fica guardado
+        dados = dados if faixa is None else fatiar_intervalo(dados, *faixa)
+        resultado = calcular_energia(dados, colunas_series(dados, modo), periodo)
+        guardar_no_cache(cache, chave, resultado, tamanho_objeto(resultado))
+    return resultado
+
+def mostrar_energia(df, modo, cache, faixa=None, titulo="Energia", chave="energia", recorte=None):
+    periodo = st.radio("Período", list(PERIODOS_ENERGIA), horizontal=True, key=f"periodo_{chave}")
+    resultado = analise_energia(df, modo, periodo, faixa, cache, recorte)
+    if resultado is None or resultado.empty:
+        st.write(f"**{titulo}** - Dados insuficientes")
+        return resultado
+    total = resultado.groupby("Série", sort=False).agg({"Energia (kWh)": "sum", "Demanda Máxima (kW)": "max", "Horas com Dados": "sum", "Horas sem Dados": "sum"})
+    for serie, r in total.iterrows():
+        fator = r["Energia (kWh)"] / r["Horas com Dados"] / r["Demanda Máxima (kW)"] if r["Horas com Dados"] > 0 and r["Demanda Máxima (kW)"] > 0 else np.nan
+        st.write(f"**{serie}** - Energia: {r['Energia (kWh)']:.2f} kWh | "
+                 f"Demanda Máxima ({JANELA_DEMANDA.seconds // 60} min): {r['Demanda Máxima (kW)']:.2f} kW | Fator de Carga: {fator:.2f}")
+    if total["Horas sem Dados"].max() > 0:
+        st.caption(f"Intervalos sem leitura por mais de {LACUNA_MAXIMA_ENERGIA} não são integrados ({total['Horas sem Dados'].max():.2f} h).")
+    tabela = resultado.assign(**{"Janela da Demanda": formatar_datas(resultado["Janela da Demanda"])}).round(3)
+    with st.expander(f"{titulo} por Período"):
+        st.dataframe(tabela, use_container_width=True, hide_index=True)
+        st.download_button("Baixar (CSV)", tabela.to_csv(index=False).encode("utf-8"), f"{chave}.csv", "text/csv", key=f"baixar_{chave}")
+    return resultado
+
+# Comparação de sensores: séries alinhadas numa grade de tempo comum (junção "as-of")
+MAX_BYTES_COMPARACAO = int(os.environ.get("ANALISADOR_MAX_MB_COMPARACAO", "256")) * 1024 * 1024
+MIN_AMOSTRAS_CORRELACAO = 10
+COLUNAS_DIFERENCAS = ["Série", "Amostras Comuns", "Diferença Média", "Diferença Absoluta Média", "Diferença Mínima", "Diferença Máxima", "Desvio Padrão"]
+
+def serie_temporal(df, coluna):
+    # instantes (ns, horário local) ordenados e valores, sem leituras vazias
+    tempos = tempo_local(df["DataHora"]).to_numpy("datetime64[ns]").view("int64")
+    valores = df[coluna].to_numpy(dtype="float64", na_value=np.nan)
+    validos = ~np.isnan(valores) & (tempos != np.iinfo(np.int64).min)
+    tempos, valores = tempos[validos], valores[validos]
+    if len(tempos) > 1 and (np.diff(tempos) < 0).any():
+        ordem = np.argsort(tempos, kind="stable")
+        tempos, valores = tempos[ordem], valores[ordem]
+    return tempos, valores
+
+def passo_tipico(tempos):
+    # mediana dos intervalos, arredondada ao segundo (leituras com pequenas variações de horário)
+    return int(round(np.median(np.diff(tempos)) / 10**9)) * 10**9 if len(tempos) > 1 else 0
+
+@instrumentado
+def alinhar_series(series, passo=None, tolerancia=None):
+    # series: {rótulo: (tempos, valores)}; sem passo, usa o intervalo típico da série mais espaçada,
+    # e sem tolerância, o próprio passo
+    rotulos = [rotulo for rotulo, (tempos, _) in series.items() if len(tempos)]
+    if not rotulos:
+        raise ValueError("Nenhuma leitura válida nas séries selecionadas.")
+    passo = max(int(pd.Timedelta(passo).value) if passo is not None else max(passo_tipico(series[r][0]) for r in rotulos), 10**9)
+    tolerancia = passo if tolerancia is None else int(pd.Timedelta(tolerancia).value)
+    inicio = min(series[r][0][0] for r in rotulos) // passo * passo
+    pontos = int((max(series[r][0][-1] for r in rotulos) - inicio) // passo) + 1
+    if pontos * len(rotulos) * 4 > MAX_BYTES_COMPARACAO:
+        raise ValueError(f"Grade muito fina para o período: {pontos:,} instantes por série. Aumente o passo.".replace(",", "."))
+    grade = inicio + np.arange(pontos, dtype="int64") * passo
+    matriz = np.empty((len(rotulos), pontos), dtype="float32")
+    for i, rotulo in enumerate(rotulos):
+        tempos, valores = series[rotulo]
+        posicoes = np.searchsorted(tempos, grade, side="right") - 1
+        fora = posicoes < 0
+        np.maximum(posicoes, 0, out=posicoes)
+        fora |= grade - tempos[posicoes] > tolerancia
+        matriz[i] = valores[posicoes]
+        matriz[i, fora] = np.nan
+    return {"tempos": grade.view("datetime64[ns]"), "matriz": matriz, "rotulos": rotulos, "passo": pd.Timedelta(passo), "tolerancia": pd.Timedelta(tolerancia)}
+
+def diferencas_series(alinhado, referencia):
+    matriz, rotulos = alinhado["matriz"], alinhado["rotulos"]
+    diferencas = matriz - matriz[rotulos.index(referencia)]
+    amostras = (~np.isnan(diferencas)).sum(axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # séries sem instantes em comum com a referência
+        tabela = pd.DataFrame({
+            "Série": rotulos, "Amostras Comuns": amostras,
+            "Diferença Média": np.nanmean(diferencas, axis=1, dtype="float64"),
+            "Diferença Absoluta Média": np.nanmean(np.abs(diferencas), axis=1, dtype="float64"),
+            "Diferença Mínima": np.nanmin(diferencas, axis=1), "Diferença Máxima": np.nanmax(diferencas, axis=1),
+            "Desvio Padrão": np.nanstd(diferencas, axis=1, dtype="float64")
+        }, columns=COLUNAS_DIFERENCAS)
+    return tabela[tabela["Série"] != referencia].reset_index(drop=True)
+
+def correlacoes_series(alinhado):
+    # Pearson aos pares, só nos instantes em que as duas séries têm valor: as somas de cada par saem de
+    # produtos de matrizes com a máscara de valores válidos, em vez de um laço por par
+    matriz = alinhado["matriz"]
+    validos = ~np.isnan(matriz)
+    mascara = validos.astype("float64")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        centrados = np.where(validos, matriz - np.nanmean(matriz, axis=1, dtype="float64")[:, None], 0.0)
+    amostras = mascara @ mascara.T
+    somas = centrados @ mascara.T  # somas[i, j]: soma da série i onde j também tem valor
+    quadrados = (centrados * centrados) @ mascara.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariancia = centrados @ centrados.T - somas * somas.T / amostras
+        correlacao = covariancia / np.sqrt((quadrados - somas ** 2 / amostras) * (quadrados.T - somas.T ** 2 / amostras))
+    correlacao = np.clip(correlacao, -1, 1)
+    correlacao[amostras < MIN_AMOSTRAS_CORRELACAO] = np.nan
+    return pd.DataFrame(correlacao, index=alinhado["rotulos"], columns=alinhado["rotulos"])
+
+def grafico_comparacao(alinhado, coluna, unidade, referencia=None, max_pontos=MAX_PONTOS_GRAFICO):
+    # com referência, cada série aparece como diferença para ela
+    matriz, rotulos = alinhado["matriz"], alinhado["rotulos"]
+    base = matriz[rotulos.index(referencia)] if referencia else 0
+    x = pd.Series(alinhado["tempos"])
+    cores = px.colors.qualitative.Dark24
+    fig = go.Figure()
+    for i, rotulo in enumerate(rotulos):
+        if rotulo != referencia:
+            fig.add_trace(criar_trace(x, pd.Series(matriz[i] - base), rotulo, cores[i % len(cores)], max_pontos))
+    fig.update_layout(
+        title=dict(text=f"Diferença para {referencia}" if referencia else f"Comparação: {coluna}", x=0.5, xanchor="center", font=dict(size=20)),
+        xaxis_title="Data e Hora",
+        yaxis_title=f"{'Diferença de ' if referencia else ''}{coluna} ({unidade})",
+        legend_orientation="h",
+        legend=dict(x=0.5, xanchor="center", y=-0.1),
+        height=600,
+        margin=dict(l=50, r=50, t=80, b=80),
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        font=dict(family="Roboto, sans-serif", size=14)
+    )
+    return fig
+
+def fontes_comparacao(arquivos, modo):
+    # uma fonte por aba de cada planilha (ou por arquivo, no modo ENERGIA)
+    fontes = {}
+    for arquivo in arquivos:
+        abas = abas_arquivo(arquivo) if modo in ["SITRAD", "DATALOGGER"] else [None]
+        for aba in abas if modo != "DATALOGGER" else abas[1:]:  # a primeira aba do DATALOGGER é o resumo
+            rotulo = " | ".join(str(p) for p in ([arquivo.name] if len(arquivos) > 1 or aba is None else []) + ([aba] if aba is not None else []))
+            fontes[rotulo] = (arquivo, aba)
+    return fontes
+
+def comparar_conjuntos(conjuntos, rotulos, coluna, passo, tolerancia, cache):
+    chave = ("comparacao", tuple(df.attrs.get("chave") or id(df) for df in conjuntos), tuple(rotulos), coluna, str(passo), str(tolerancia))
+    alinhado = buscar_no_cache(cache, chave)
+    if alinhado is None:
+        alinhado = alinhar_series({rotulo: serie_temporal(df, coluna) for rotulo, df in zip(rotulos, conjuntos)}, passo, tolerancia)
+        guardar_no_cache(cache, chave, alinhado, alinhado["matriz"].nbytes + alinhado["tempos"].nbytes)
+    return alinhado
+
+def mostrar_comparacao(arquivos, modo):
+    fontes = fontes_comparacao(arquivos, modo) if arquivos else {}
+    if len(fontes) < 2:
+        acompanhar_ingestoes([], "comparacao")
+        return
+    with st.expander("Comparação de Sensores"):
+        escolhidas = st.multiselect("Sensores", list(fontes), key="sensores_comparacao")
+        if len(escolhidas) < 2:
+            acompanhar_ingestoes([], "comparacao")
+            st.caption("Selecione ao menos dois sensores (abas ou arquivos) para alinhá-los numa grade de tempo comum.")
+            return
+        try:
+            conjuntos = ingerir_fontes([fontes[rotulo] for rotulo in escolhidas], modo, "comparacao")
+        except ErroIngestao as e:
+            for i, mensagem in e.erros:
+                st.error(f"{escolhidas[i]}: {mensagem}")
+            return
+        except Exception as e:
+            st.error(str(e))
+            return
+        if conjuntos is None:
+            return
+        colunas = [c for c in colunas_series(conjuntos[0], modo) if all(c in df.columns for df in conjuntos)]
+        col_c1, col_c2, col_c3, col_c4 = st.columns(4)
+        coluna = col_c1.selectbox("Série", colunas, key="serie_comparacao")
+        passo = col_c2.text_input("Passo da Grade", "", key="passo_comparacao", placeholder="automático (ex.: 1min)")
+        tolerancia = col_c3.text_input("Tolerância", "", key="tolerancia_comparacao", placeholder="igual ao passo")
+        referencia = col_c4.selectbox("Referência", escolhidas, key="referencia_comparacao")
+        try:
+            passo, tolerancia = [pd.Timedelta(valor) if valor else None for valor in (passo, tolerancia)]
+        except ValueError:
+            st.error("Passo ou tolerância inválidos. Use, por exemplo, 30s, 5min ou 1h.")
+            return
+        try:
+            alinhado = comparar_conjuntos(conjuntos, escolhidas, coluna, passo, tolerancia, cache_filtros_compartilhado())
+        except ValueError as e:
+            st.error(str(e))
+            return
+        instantes = f"{len(alinhado['tempos']):,}".replace(",", ".")
+        st.caption(f"{len(alinhado['rotulos'])} séries x {instantes} instantes, passo {alinhado['passo']}, "
+                   f"tolerância {alinhado['tolerancia']} ({formatar_bytes(alinhado['matriz'].nbytes)}).")
+        diferenca = st.checkbox("Mostrar diferença para a referência", key="diferenca_comparacao")
+        unidade = "W" if modo == "ENERGIA" else "%" if coluna == "Umidade" else "°C"
+        st.plotly_chart(grafico_comparacao(alinhado, coluna, unidade, referencia if diferenca else None, st.session_state['max_pontos_grafico']), use_container_width=True)
+        if referencia in alinhado["rotulos"]:
+            st.write(f"**Diferenças para {referencia}**")
+            st.dataframe(diferencas_series(alinhado, referencia).round(3), use_container_width=True, hide_index=True)
+        st.write("**Correlações**")
+        st.dataframe(correlacoes_series(alinhado).round(3), use_container_width=True)
+
+# Pontos filtrados/marcados mantidos como DataFrame (DataHora, Valor, Tipo)
+COLUNAS_PONTOS = ["DataHora", "Valor", "Tipo"]
+LIMITE_ROTULOS = 200
+PONTOS_POR_PAGINA = 100
+
+def colunas_extras(df):
+    return [c for c in df.columns if (c.startswith("Dados_Extra") or c.startswith("Potência_Trafo")) and pd.api.types.is_numeric_dtype(df[c])]
+
+def colunas_series(df, modo):
+    main_column = "Potência" if modo == "ENERGIA" else "Temperatura"
+    if modo == "DATALOGGER":
+        return [main_column] + (["Umidade"] if "Umidade" in df.columns else [])
+    return [main_column] + colunas_extras(df)
+
+def pontos_vazios():
+    return pd.DataFrame({"DataHora": pd.Series(dtype="datetime64[ns]"), "Valor": pd.Series(dtype="float64"), "Tipo": pd.Series(dtype="object")})
+
+@instrumentado
+def extrair_pontos(df, colunas):
+    pontos = df.melt(id_vars="DataHora", value_vars=colunas, var_name="Tipo", value_name="Valor")
+    return pontos.dropna(subset=["Valor"])[COLUNAS_PONTOS].reset_index(drop=True)
+
+def adicionar_ponto(pontos, x, valor, tipo):
+    novo = pd.DataFrame({"DataHora": [x], "Valor": [float(valor)], "Tipo": [tipo]})
+    return novo if pontos.empty else pd.concat([pontos, novo], ignore_index=True)
+
+def unidades_pontos(tipos):
+    return np.select([tipos == "Umidade", tipos.str.contains("Potência")], ["%", "W"], "°C")
+
+def pontos_como_lista(pontos):
+    if pontos is None or pontos.empty:
+        return []
+    return list(zip(pontos["DataHora"].dt.strftime('%Y/%m/%d %H:%M:%S'), pontos["Valor"].tolist(), pontos["Tipo"].tolist()))
+
+def adicionar_trace_pontos(fig, pontos, rotulo, cor):
+    if pontos is None or pontos.empty:
+        return
+    for tipo, grupo in pontos.groupby("Tipo", sort=False):
+        trace = go.Scattergl if len(grupo) > LIMIAR_WEBGL else go.Scatter
+        # rótulos fixos só para poucos pontos; acima disso o texto fica no hover, formatado no navegador
+        texto = (grupo["DataHora"].dt.strftime('%Y/%m/%d %H:%M:%S') + "\n" + grupo["Valor"].map("{:.1f}".format)) if len(grupo) <= LIMITE_ROTULOS else None
+        fig.add_trace(trace(
+            x=grupo["DataHora"], y=grupo["Valor"], mode="markers+text" if texto is not None else "markers",
+            name=f"{tipo} ({rotulo})", marker=dict(color=cor, size=10, symbol="x"), text=texto, textposition="top center",
+            hovertemplate="%{x|%Y/%m/%d %H:%M:%S}<br>%{y:.1f}<extra>" + f"{tipo} ({rotulo})" + "</extra>"
+        ), secondary_y=(tipo == "Umidade"))
+
+@instrumentado
+def gerar_grafico(df, modo, filtro_ativo, filtro_valor_min, filtro_valor_max, filtro_valor_tipo, escala_y_min, escala_y_max,
+                  title="Gráfico de Dados", pontos_marcados=None, pontos_filtrados=None, janela=None,
+                  max_pontos=MAX_PONTOS_GRAFICO, buffers=None, piramide=None):
     fig = make_subplots(rows=1, cols=1, shared_xaxes=True, specs=[[ {"secondary_y": True} if modo == "DATALOGGER" else {"secondary_y": False}]])
+    if janela is not None:
+        df = fatiar_intervalo(df, janela[0], janela[1])
+        buffers = None
     main_column = "Potência" if modo == "ENERGIA" else "Temperatura"
     default_color = "navy"
     highlight_color = "yellow"
     unit = "W" if modo == "ENERGIA" else "°C"
     x = df["DataHora"]
     y = df[main_column]
-    fig.add_trace(go.Scatter(x=x, y=y, mode="lines+markers", name=main_column, line=dict(color=default_color)), secondary_y=False)
+    fig.add_trace(criar_trace(*dados_serie(df, main_column, buffers, piramide, max_pontos), main_column, default_color, max_pontos), secondary_y=False)
     if filtro_ativo == "valor" and filtro_valor_min is not None and filtro_valor_max is not None and filtro_valor_tipo == main_column:
         mask = (y >= filtro_valor_min) & (y <= filtro_valor_max) & (~pd.isna(y))
-        fig.add_trace(go.Scatter(x=x[mask], y=y[mask], mode="lines+markers", name=f"{main_column} (Filtro)", line=dict(color=highlight_color)), secondary_y=False)
+        fig.add_trace(criar_trace(x[mask], y[mask], f"{main_column} (Filtro)", highlight_color, max_pontos), secondary_y=False)
     if modo == "DATALOGGER" and "Umidade" in df.columns:
         y_umidade = df["Umidade"]
-        fig.add_trace(go.Scatter(x=x, y=y_umidade, mode="lines+markers", name="Umidade", line=dict(color="lightblue")), secondary_y=True)
+        fig.add_trace(criar_trace(*dados_serie(df, "Umidade", buffers, piramide, max_pontos), "Umidade", "lightblue", max_pontos), secondary_y=True)
         if filtro_ativo == "valor" and filtro_valor_min is not None and filtro_valor_max is not None and filtro_valor_tipo == "Umidade":
             mask = (y_umidade >= filtro_valor_min) & (y_umidade <= filtro_valor_max) & (~pd.isna(y_umidade))
-            fig.add_trace(go.Scatter(x=x[mask], y=y_umidade[mask], mode="lines+markers", name="Umidade (Filtro)", line=dict(color=highlight_color)), secondary_y=True)
+            fig.add_trace(criar_trace(x[mask], y_umidade[mask], "Umidade (Filtro)", highlight_color, max_pontos), secondary_y=True)
         fig.update_yaxes(title_text="Umidade (%)", secondary_y=True)
     if modo == "SITRAD" or modo == "ENERGIA":
         colors = ["darkgreen", "purple", "deeppink"]
-        extra_columns = [c for c in df.columns if (c.startswith("Dados_Extra") or c.startswith("Potência_Trafo")) and pd.api.types.is_numeric_dtype(df[c])]
+        extra_columns = colunas_extras(df)
         for i, col in enumerate(extra_columns):
             y_extra = df[col]
-            fig.add_trace(go.Scatter(x=x, y=y_extra, mode="lines+markers", name=col, line=dict(color=colors[i % len(colors)])), secondary_y=False)
+            fig.add_trace(criar_trace(*dados_serie(df, col, buffers, piramide, max_pontos), col, colors[i % len(colors)], max_pontos), secondary_y=False)
             if filtro_ativo == "valor" and filtro_valor_min is not None and filtro_valor_max is not None and filtro_valor_tipo == col:
                 mask = (y_extra >= filtro_valor_min) & (y_extra <= filtro_valor_max) & (~pd.isna(y_extra))
-                fig.add_trace(go.Scatter(x=x[mask], y=y_extra[mask], mode="lines+markers", name=f"{col} (Filtro)", line=dict(color=highlight_color)), secondary_y=False)
-    if pontos_filtrados:
-        for _, x, y, tipo in pontos_filtrados:
-            fig.add_trace(go.Scatter(x=[x], y=[y], mode="markers+text", name=f"{tipo} (Filtro)", marker=dict(color="orange", size=10, symbol="x"), text=[f"{x.strftime('%Y/%m/%d %H:%M:%S')}\n{y:.1f}"], textposition="top center"), secondary_y=(tipo == "Umidade"))
-    if pontos_marcados:
-        for _, _, x, y, tipo in pontos_marcados:
-            fig.add_trace(go.Scatter(x=[x], y=[y], mode="markers+text", name=f"{tipo} (Marcado)", marker=dict(color="red", size=10, symbol="x"), text=[f"{x.strftime('%Y/%m/%d %H:%M:%S')}\n{y:.1f}"], textposition="top center"), secondary_y=(tipo == "Umidade"))
+                fig.add_trace(criar_trace(x[mask], y_extra[mask], f"{col} (Filtro)", highlight_color, max_pontos), secondary_y=False)
+    adicionar_trace_pontos(fig, pontos_filtrados, "Filtro", get_marker_color(filtro=True))
+    adicionar_trace_pontos(fig, pontos_marcados, "Marcado", get_marker_color())
     fig.update_layout(
         title=dict(text=title, x=0.5, xanchor="center", font=dict(size=20)),
         xaxis_title="Data e Hora",
@@ -210,67 +1957,489 @@ def gerar_grafico(df, modo, filtro_ativo, filtro_valor_min, filtro_valor_max, fi
         fig.update_yaxes(range=[escala_y_min, escala_y_max], secondary_y=False)
     return fig
 
-def mostrar_estatisticas(df, modo, pontos_filtrados=None, pontos_marcados=None):
+def seletor_janela(df):
+    inicio, fim = df["DataHora"].min(), df["DataHora"].max()
+    if pd.isnull(inicio) or pd.isnull(fim) or inicio >= fim:
+        return None
+    # o slider trabalha com horário local sem fuso; gerar_grafico realinha ao fuso dos dados
+    inicio, fim = inicio.tz_localize(None).to_pydatetime(), fim.tz_localize(None).to_pydatetime()
+    janela = st.slider("Janela de Visualização", min_value=inicio, max_value=fim, value=(inicio, fim), step=timedelta(minutes=1),
+                       format="YYYY/MM/DD HH:mm", key=f"janela_{inicio}_{fim}")
+    return None if janela == (inicio, fim) else janela
+
+def mostrar_tabela_pontos(pontos, titulo, chave):
+    st.write(f"**{titulo}:** {len(pontos)}")
+    paginas = max(1, int(np.ceil(len(pontos) / PONTOS_POR_PAGINA)))
+    pagina = st.number_input(f"Página ({paginas})", min_value=1, max_value=paginas, value=1, step=1, key=f"pagina_{chave}") if paginas > 1 else 1
+    trecho = pontos.iloc[(pagina - 1) * PONTOS_POR_PAGINA:pagina * PONTOS_POR_PAGINA]
+    st.dataframe(pd.DataFrame({
+        "DataHora": trecho["DataHora"].dt.strftime('%Y/%m/%d %H:%M:%S'),
+        "Valor": trecho["Valor"].round(1),
+        "Unidade": unidades_pontos(trecho["Tipo"]),
+        "Tipo": trecho["Tipo"]
+    }), hide_index=True, use_container_width=True)
+
+# Tabela "Dados do Arquivo": só a página pedida é recortada e formatada
+TAMANHOS_PAGINA_TABELA = [100, 500, 1000, 5000]
+
+def chave_ordenacao(serie):
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.to_numpy(dtype=np.float64, na_value=np.nan)
+    codigos, _ = pd.factorize(serie, sort=True)
+    return np.where(codigos < 0, np.nan, codigos.astype(np.float64))
+
+@instrumentado
+def permutacao_tabela(df, coluna, decrescente, cache, recorte=None):
+    # posições no conjunto, na ordem da tabela; a ordem de um recorte é a do conjunto restrita às suas linhas
+    chave = ("ordem", identidade_recorte(df, recorte), coluna, decrescente)
+    ordem = buscar_no_cache(cache, chave)
+    if ordem is None:
+        if recorte is None:
+            valores = chave_ordenacao(df[coluna])
+            ordem = np.argsort(-valores if decrescente else valores, kind="stable")  # NaN fica no fim nos dois sentidos
+        else:
+            ordem = permutacao_tabela(df, coluna, decrescente, cache)
+            selecionadas = np.zeros(len(df), dtype=bool)
+            selecionadas[recorte["posicoes"]] = True
+            ordem = ordem[selecionadas[ordem]]
+        guardar_no_cache(cache, chave, ordem, ordem.nbytes)
+    return ordem
+
+def datas_validas(df, recorte=None):
+    validas = posicao_nat(df)
+    return validas if recorte is None else int(np.searchsorted(recorte["posicoes"], validas, side="left"))
+
+def posicoes_pagina(df, inicio, fim, coluna="DataHora", decrescente=False, cache=None, recorte=None):
+    fim = min(fim, linhas_recorte(df, recorte))
+    if coluna == "DataHora":
+        posicoes = np.arange(inicio, fim)
+        if decrescente:
+            validas = datas_validas(df, recorte)  # datas em ordem inversa, NaT continua no fim
+            posicoes = np.where(posicoes < validas, validas - 1 - posicoes, posicoes)
+        return posicoes if recorte is None else recorte["posicoes"][posicoes]
+    return permutacao_tabela(df, coluna, decrescente, cache, recorte)[inicio:fim]
+
+@instrumentado
+def pagina_tabela(df, pagina, tamanho, coluna="DataHora", decrescente=False, cache=None, recorte=None):
+    cache = novo_cache_filtros() if cache is None else cache
+    inicio = (pagina - 1) * tamanho
+    return preparar_exportacao(df.iloc[posicoes_pagina(df, inicio, inicio + tamanho, coluna, decrescente, cache, recorte)])
+
+def pagina_do_instante(df, instante, tamanho, coluna="DataHora", decrescente=False, cache=None, recorte=None):
+    # linha com a primeira data >= instante (ou a última, se o instante for posterior a todas)
+    validas = datas_validas(df, recorte)
+    if validas == 0:
+        return 1
+    linha = int(np.searchsorted(df["DataHora"].values[:posicao_nat(df)], chave_tempo(instante, df["DataHora"]), side="left"))
+    if recorte is not None:
+        linha = int(np.searchsorted(recorte["posicoes"], linha, side="left"))
+    linha = min(linha, validas - 1)
+    if coluna == "DataHora":
+        posicao = validas - 1 - linha if decrescente else linha
+    else:
+        ordem = permutacao_tabela(df, coluna, decrescente, novo_cache_filtros() if cache is None else cache, recorte)
+        posicao = int(np.flatnonzero(ordem == (linha if recorte is None else recorte["posicoes"][linha]))[0])
+    return posicao // tamanho + 1
+
+def mostrar_tabela_dados(df, cache, recorte=None):
+    colunas = [c for c in df.columns if c not in COLUNAS_INTERNAS]
+    col_o1, col_o2, col_o3, col_o4 = st.columns([2, 2, 2, 3])
+    with col_o1:
+        coluna = st.selectbox("Ordenar por", colunas, index=colunas.index("DataHora") if "DataHora" in colunas else 0, key="ordem_tabela")
+    with col_o2:
+        decrescente = st.radio("Ordem", ["Crescente", "Decrescente"], horizontal=True, key="direcao_tabela") == "Decrescente"
+    with col_o3:
+        tamanho = st.selectbox("Linhas por Página", TAMANHOS_PAGINA_TABELA, index=TAMANHOS_PAGINA_TABELA.index(1000), key="tamanho_tabela")
+    linhas = linhas_recorte(df, recorte)
+    paginas = max(1, -(-linhas // tamanho))
+    with col_o4:
+        instante = st.text_input("Ir para Data/Hora (YYYY/MM/DD HH:MM:SS)", "", key="ir_para_tabela")
+        if st.button("Ir", key="ir_tabela") and instante:
+            try:
+                st.session_state['pagina_dados'] = pagina_do_instante(df, pd.to_datetime(instante, format="%Y/%m/%d %H:%M:%S"), tamanho, coluna, decrescente, cache, recorte)
+            except ValueError:
+                st.error("Formato de data inválido.")
+    if st.session_state.get('pagina_dados', 1) > paginas:
+        st.session_state['pagina_dados'] = paginas
+    pagina = st.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, step=1, key="pagina_dados")
+    st.markdown('<div class="data-table">', unsafe_allow_html=True)
+    pagina_visivel = pagina_tabela(df, int(pagina), tamanho, coluna, decrescente, cache, recorte)
+    registrar_tamanho("página da tabela", tamanho_objeto(pagina_visivel))
+    st.dataframe(pagina_visivel, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    inicio = (int(pagina) - 1) * tamanho
+    st.caption(f"Linhas {min(inicio + 1, linhas)} a {min(inicio + tamanho, linhas)} de {linhas}")
+
+# Resumo por coluna (total, válidos, mínimo, máximo, soma), atualizável bloco a bloco
+def atualizar_resumo(resumo, df, colunas):
+    for col in colunas:
+        r = resumo.setdefault(col, {"total": 0, "validos": 0, "min": np.nan, "max": np.nan, "soma": 0.0})
+        r["total"] += len(df)
+        if col not in df.columns or not pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        valores = df[col].to_numpy(dtype="float64", na_value=np.nan)
+        valores = valores[~np.isnan(valores)]
+        if len(valores):
+            r["validos"] += len(valores)
+            r["min"] = np.fmin(r["min"], valores.min())
+            r["max"] = np.fmax(r["max"], valores.max())
+            r["soma"] += valores.sum()
+    datas = resumo.setdefault("DataHora", {"min": pd.NaT, "max": pd.NaT})
+    inicio, fim = df["DataHora"].min(), df["DataHora"].max()
+    if not pd.isnull(inicio):
+        datas["min"] = inicio if pd.isnull(datas["min"]) else min(datas["min"], inicio)
+        datas["max"] = fim if pd.isnull(datas["max"]) else max(datas["max"], fim)
+    return resumo
+
+def resumo_colunas(df, colunas):
+    return atualizar_resumo({}, df, colunas)
+
+# Estatísticas completas por série, memorizadas por conjunto de dados e estado dos filtros
+PERCENTIS = [5, 25, 50, 75, 95]
+
+@instrumentado
+def calcular_estatisticas(df, colunas, posicoes=None):
+    # por série, os valores válidos são compactados uma vez; mínimo, máximo e percentis saem de uma única
+    # partição desse vetor, e soma e desvio de mais duas reduções sobre ele. Com posicoes (recorte filtrado),
+    # só as linhas selecionadas de cada coluna são lidas
+    total = len(df) if posicoes is None else len(posicoes)
+    numericas = [c for c in colunas if c in df.columns and pd.api.types.is_numeric_dtype(df[c])]
+    resumo = {}
+    for col in numericas:
+        valores = df[col].to_numpy(dtype="float64", na_value=np.nan)
+        if posicoes is not None:
+            valores = valores[posicoes]
+        valores = valores[~np.isnan(valores)]
+        n = len(valores)
+        resumo[col] = {"total": total, "validos": n, "min": np.nan, "max": np.nan, "soma": 0.0, "desvio": np.nan, **{f"p{p}": np.nan for p in PERCENTIS}}
+        if not n:
+            continue
+        alvos = np.array(PERCENTIS) / 100 * (n - 1)  # interpolação linear, como np.percentile
+        baixo, alto = np.floor(alvos).astype(int), np.ceil(alvos).astype(int)
+        valores.partition(np.unique(np.concatenate([[0, n - 1], baixo, alto])))
+        percentis = valores[baixo] + (valores[alto] - valores[baixo]) * (alvos - baixo)
+        soma = valores.sum()
+        desvios = valores - soma / n
+        resumo[col].update({"min": valores[0], "max": valores[n - 1], "soma": soma, "desvio": np.sqrt(np.dot(desvios, desvios) / (n - 1)) if n > 1 else np.nan})
+        resumo[col].update({f"p{p}": percentis[j] for j, p in enumerate(PERCENTIS)})
+    for col in colunas:
+        resumo.setdefault(col, {"total": total, "validos": 0, "min": np.nan, "max": np.nan, "soma": 0.0})
+    datas = df["DataHora"] if posicoes is None else df["DataHora"].iloc[posicoes]
+    resumo["DataHora"] = {"min": datas.min(), "max": datas.max()}
+    return resumo
+
+def impressao_dados(df, *estado, recorte=None):
+    # identifica o conjunto de dados (conteúdo do arquivo), o estado completo dos filtros que gerou o recorte
+    # (attrs["filtros"]) e as linhas das pontas, que distinguem fatias contíguas do mesmo conjunto
+    chave = df.attrs.get("chave")
+    if chave is None:
+        return None
+    if recorte is None:
+        pontas = df.index[[0, -1]].tolist() if len(df) else []
+    else:
+        pontas = df.index[recorte["posicoes"][[0, -1]]].tolist() if len(recorte["posicoes"]) else []
+    return hashlib.sha256(repr((identidade_recorte(df, recorte), pontas) + estado).encode("utf-8")).hexdigest()
+
+@contar_cache("estatisticas")
+@st.cache_data(max_entries=64)
+def estatisticas_memorizadas(impressao, colunas, _df, _posicoes=None):
+    registrar_falha_cache("estatisticas")
+    return calcular_estatisticas(_df, list(colunas), _posicoes)
+
+def obter_estatisticas(df, colunas, impressao=None, posicoes=None):
+    if impressao is None:
+        return calcular_estatisticas(df, colunas, posicoes)
+    return estatisticas_memorizadas(impressao, tuple(colunas), df, posicoes)
+
+# Modo incremental: arquivos que continuam crescendo são lidos a partir do último ponto ingerido
+TAMANHO_ASSINATURA = 4096
+VERSOES_INCREMENTAIS = count(1)  # cada atualização gera um conjunto novo, com chave própria
+
+def assinatura_prefixo(conteudo, tamanho):
+    return hashlib.sha256(conteudo[:min(TAMANHO_ASSINATURA, tamanho)] + conteudo[max(0, tamanho - TAMANHO_ASSINATURA):tamanho]).hexdigest()
+
+def ler_incremento(conteudo, modo, aba, estado):
+    # retorna (linhas novas, estado de leitura atualizado, se as linhas continuam a leitura anterior)
+    continua = estado is not None
+    if modo == "ENERGIA":
+        # linha sem quebra no fim fica para a próxima leitura, a menos que o arquivo tenha parado de crescer
+        parado = estado is not None and estado.get("visto") == len(conteudo)
+        fim = len(conteudo) if parado else conteudo.rfind(b"\n") + 1 or len(conteudo)
+        continua = continua and len(conteudo) >= estado["tamanho"] and assinatura_prefixo(conteudo, estado["tamanho"]) == estado["assinatura"]
+        if continua and estado.get("sem_quebra") and conteudo[estado["tamanho"]:estado["tamanho"] + 1] not in (b"", b"\n", b"\r"):
+            continua = False  # a última linha lida continuou a ser escrita: recomeça do zero
+        inicio = estado["tamanho"] if continua else 0
+        cabecalho = estado["cabecalho"] if continua else conteudo[:conteudo.find(b"\n") + 1]
+        if continua and fim <= inicio:
+            return None, dict(estado, visto=len(conteudo)), True
+        novos = ler_csv_energia(conteudo[:fim] if not continua else cabecalho + conteudo[inicio:fim])
+        novo_estado = {"tamanho": fim, "assinatura": assinatura_prefixo(conteudo, fim), "cabecalho": cabecalho,
+                       "visto": len(conteudo), "sem_quebra": not conteudo[:fim].endswith(b"\n")}
+        return novos, novo_estado, continua
+    # xlsx é um zip reescrito a cada gravação: o XML da aba ainda é percorrido, mas só as linhas novas são convertidas
+    xls = abrir_xls(conteudo)
+    abas = [aba] if aba is not None else listar_abas(conteudo) if xls is None else xls.sheet_names
+    abas = abas if aba is not None or modo == "SITRAD" else abas[1:2]
+    linhas = dict(estado["linhas"]) if continua else {}
+    ultimas = dict(estado["ultimas"]) if continua else {}
+    partes = []
+    for sheet in abas:
+        cabecalho, registros, anterior = ler_registros_excel(conteudo, sheet, linhas.get(sheet, 0), xls=xls)
+        if linhas.get(sheet, 0) and anterior != ultimas.get(sheet):
+            return ler_incremento(conteudo, modo, aba, None)  # conteúdo anterior mudou: recomeça do zero
+        if registros:
+            partes.append(normalizar_aba(montar_aba(cabecalho, registros), modo, sheet))
+            linhas[sheet] = linhas.get(sheet, 0) + len(registros)
+            ultimas[sheet] = registros[-1]
+    novos = pd.concat(partes, ignore_index=True) if partes else None
+    return novos, {"tamanho": len(conteudo), "linhas": linhas, "ultimas": ultimas}, continua
+
+def anexar_buffers(buffers, novos, colunas, max_pontos):
+    for col in colunas:
+        x, y = reduzir_pontos(novos["DataHora"], novos[col], max_pontos)
+        if col in buffers:
+            x, y = pd.concat([buffers[col][0], x], ignore_index=True), pd.concat([buffers[col][1], y], ignore_index=True)
+        if len(x) > 2 * max_pontos:
+            x, y = reduzir_pontos(x, y, max_pontos)  # mínimo/máximo dos buffers preserva os extremos
+        buffers[col] = (x.reset_index(drop=True), y.reset_index(drop=True))
+    return buffers
+
+@instrumentado
+def atualizar_fonte_incremental(arquivo, modo, aba=None, estado=None, max_pontos=MAX_PONTOS_GRAFICO):
+    conteudo = ler_bytes(arquivo)
+    if estado is not None and len(conteudo) == estado["leitura"]["tamanho"] and assinatura_prefixo(conteudo, len(conteudo)) == estado["assinatura"]:
+        return estado  # arquivo inalterado
+    novos, leitura, continua = ler_incremento(conteudo, modo, aba, estado["leitura"] if estado else None)
+    estado = dict(estado) if estado is not None and continua else {"dados": None, "resumo": {}, "buffers": {}}
+    estado["leitura"] = leitura
+    estado["assinatura"] = assinatura_prefixo(conteudo, len(conteudo))
+    if novos is None or novos.empty:
+        if estado["dados"] is None:
+            raise ValueError("O arquivo não contém dados.")
+        return estado
+    novos = indexar_tempo(novos)
+    dados = estado["dados"]
+    # as linhas novas só são anexadas se começam depois da última data válida; caso contrário reordena tudo.
+    # Linhas sem data (NaT, no fim de cada parte) ficam fora da comparação e continuam no fim do conjunto
+    validas = posicao_nat(dados) if dados is not None else 0
+    validas_novas = posicao_nat(novos)
+    ultimo = dados["DataHora"].iloc[validas - 1] if validas else pd.NaT
+    primeiro = novos["DataHora"].iloc[0]
+    ordenado = dados is None or pd.isnull(ultimo) or pd.isnull(primeiro) or primeiro >= ultimo
+    if dados is None:
+        dados = novos
+    elif ordenado:
+        dados = pd.concat([dados.iloc[:validas], novos.iloc[:validas_novas], dados.iloc[validas:], novos.iloc[validas_novas:]], ignore_index=True)
+    else:
+        dados = indexar_tempo(pd.concat([dados, novos], ignore_index=True))
+    colunas = colunas_series(dados, modo)
+    if ordenado:
+        estado["resumo"] = atualizar_resumo({k: dict(v) for k, v in estado["resumo"].items()}, novos, colunas)
+        estado["buffers"] = anexar_buffers(dict(estado["buffers"]), novos, colunas, max_pontos)
+    else:
+        estado["resumo"] = resumo_colunas(dados, colunas)
+        estado["buffers"] = anexar_buffers({}, dados, colunas, max_pontos)
+    # chave nova a cada atualização: os caches por identidade não confundem versões do conjunto (id() pode ser reaproveitado)
+    dados.attrs.update(chave=f"incremental-{next(VERSOES_INCREMENTAIS)}", incremental=True)
+    estado["dados"] = dados
+    return estado
+
+# Pirâmide de agregados por minuto, hora e dia, para faixas e gráficos de longos períodos
+NIVEIS_PIRAMIDE = ["min", "h", "D"]
+COMBINAR_AGREGADOS = {"count": "sum", "min": "min", "max": "max", "sum": "sum", "first": "first", "last": "last"}
+
+def tempo_local(datas):
+    if getattr(datas.dt, "tz", None) is not None:
+        datas = datas.dt.tz_localize(None)
+    return datas
+
+@instrumentado
+def construir_piramide(df, colunas):
+    datas = tempo_local(df["DataHora"])
+    validas = datas.notna().to_numpy()
+    valores = df.loc[validas, colunas].astype("float64")
+    nivel = valores.groupby(datas[validas].dt.floor("min").to_numpy()).agg(list(COMBINAR_AGREGADOS))
+    piramide = {"min": nivel}
+    for freq in NIVEIS_PIRAMIDE[1:]:
+        # cada nível é agregado a partir do anterior, sem voltar aos dados brutos
+        nivel = nivel.groupby(nivel.index.floor(freq)).agg({(col, estat): funcao for col in colunas for estat, funcao in COMBINAR_AGREGADOS.items()})
+        piramide[freq] = nivel
+    return piramide
+
+@contar_cache("piramide")
+@st.cache_resource(max_entries=8)
+def obter_piramide(chave, colunas, _df):
+    registrar_falha_cache("piramide")
+    return construir_piramide(_df, list(colunas))
+
+def piramide_dados(df, modo):
+    # no modo incremental o gráfico usa os buffers reduzidos; a pirâmide seria refeita a cada atualização
+    chave = df.attrs.get("chave")
+    if chave is None or df.attrs.get("incremental") or df.empty:
+        return None
+    return obter_piramide(chave, tuple(colunas_series(df, modo)), df)
+
+def limites_nivel(primeiro, ultimo, freq):
+    # intervalo [inicio, fim) de baldes do nível inteiramente contidos entre primeiro e ultimo
+    return primeiro.ceil(freq), (ultimo + pd.Timedelta(1, "ns")).floor(freq)
+
+def resumo_intervalo(df, piramide, colunas, inicio, fim):
+    trecho = fatiar_intervalo(df, inicio, fim)
+    if trecho.empty or piramide is None:
+        return resumo_colunas(trecho, colunas)
+    primeiro, ultimo = tempo_local(trecho["DataHora"].iloc[[0, -1]])
+    for freq in reversed(NIVEIS_PIRAMIDE):
+        a, b = limites_nivel(primeiro, ultimo, freq)
+        if a < b:
+            break
+    else:
+        return resumo_colunas(trecho, colunas)
+    # bordas fora dos baldes completos vêm dos dados brutos; o miolo vem do nível mais grosso que cabe
+    resumo = resumo_colunas(fatiar_intervalo(trecho, primeiro, a - pd.Timedelta(1, "ns")), colunas)
+    resumo = atualizar_resumo(resumo, fatiar_intervalo(trecho, b, ultimo), colunas)
+    nivel = piramide[freq]
+    miolo = nivel.iloc[nivel.index.searchsorted(a):nivel.index.searchsorted(b)]
+    for col in colunas:
+        r = resumo[col]
+        r["total"] = len(trecho)
+        if col in miolo.columns.get_level_values(0) and miolo[(col, "count")].sum():
+            r["validos"] += int(miolo[(col, "count")].sum())
+            r["min"] = np.fmin(r["min"], miolo[(col, "min")].min())
+            r["max"] = np.fmax(r["max"], miolo[(col, "max")].max())
+            r["soma"] += miolo[(col, "sum")].sum()
+    resumo["DataHora"] = {"min": trecho["DataHora"].iloc[0], "max": trecho["DataHora"].iloc[-1]}
+    return resumo
+
+def pontos_nivel(df, piramide, col, primeiro, ultimo, freq):
+    # mínimo e máximo por balde completo do nível; os baldes parciais das bordas são calculados sobre os
+    # dados brutos da fatia, para não misturar leituras de fora dela
+    a, b = limites_nivel(primeiro, ultimo, freq)
+    nivel = piramide[freq]
+    miolo = nivel.iloc[nivel.index.searchsorted(a):nivel.index.searchsorted(b)] if a < b else nivel.iloc[:0]
+    bordas = [(primeiro, fatiar_intervalo(df, primeiro, a - pd.Timedelta(1, "ns")))] if a < b else [(primeiro, df)]
+    if a < b:
+        bordas.append((b, fatiar_intervalo(df, b, ultimo)))
+    inicios, minimos, maximos = [miolo.index.to_numpy()], [miolo[(col, "min")].to_numpy()], [miolo[(col, "max")].to_numpy()]
+    for i, (inicio, borda) in enumerate(bordas):
+        if borda.empty:
+            continue
+        posicao = 0 if i == 0 else len(inicios)
+        inicios.insert(posicao, np.array([inicio.to_datetime64()], dtype=miolo.index.dtype))
+        minimos.insert(posicao, np.array([borda[col].min()]))
+        maximos.insert(posicao, np.array([borda[col].max()]))
+    inicio = np.concatenate(inicios)
+    lacuna = np.append(np.diff(inicio) > pd.Timedelta(1, freq).to_timedelta64(), False)
+    x = np.repeat(inicio, 3)
+    y = np.column_stack([np.concatenate(minimos), np.concatenate(maximos), np.full(len(inicio), np.nan)]).ravel()
+    manter = np.column_stack([np.ones(len(inicio), bool), np.ones(len(inicio), bool), lacuna]).ravel()
+    return pd.Series(x[manter]), pd.Series(y[manter])
+
+def serie_agregada(df, piramide, col, primeiro, ultimo, max_pontos):
+    # nível mais fino cujos baldes cabem no limite de pontos; se ele ficar bem abaixo do limite,
+    # o nível anterior é reduzido por mínimo/máximo até o limite
+    for k, freq in enumerate(NIVEIS_PIRAMIDE):
+        a, b = limites_nivel(primeiro, ultimo, freq)
+        indice = piramide[freq].index
+        baldes = max(indice.searchsorted(b) - indice.searchsorted(a), 0) + 2
+        if 2 * baldes <= max_pontos or freq == NIVEIS_PIRAMIDE[-1]:
+            break
+    if k > 0 and 4 * baldes < max_pontos:
+        return reduzir_pontos(*pontos_nivel(df, piramide, col, primeiro, ultimo, NIVEIS_PIRAMIDE[k - 1]), max_pontos)
+    return pontos_nivel(df, piramide, col, primeiro, ultimo, freq)
+
+def valores_resumo(resumo, col):
+    r = resumo.get(col)
+    if not r or not r["validos"]:
+        return None
+    return r["max"], r["min"], r["soma"] / r["validos"]
+
+def mostrar_resumo_faixa(nome, resumo):
+    st.write(f"**Estatísticas da Faixa {nome}**")
+    for col in resumo:
+        if col == "DataHora":
+            continue
+        valores = valores_resumo(resumo, col)
+        unidade = "%" if col == "Umidade" else ("W" if "Potência" in col else "°C")
+        if valores is not None:
+            st.write(f"{col} - Máxima: {valores[0]:.2f}{unidade} | Mínima: {valores[1]:.2f}{unidade} | Média: {valores[2]:.2f}{unidade}")
+        else:
+            st.write(f"{col} - Dados insuficientes para estatísticas")
+
+def mostrar_estatisticas(df, modo, pontos_filtrados=None, pontos_marcados=None, resumo=None, impressao=None, recorte=None):
+    if resumo is None:
+        resumo = obter_estatisticas(df, colunas_series(df, modo), impressao, None if recorte is None else recorte["posicoes"])
     with st.container():
         st.markdown("### Estatísticas")
         main_column = "Potência" if modo == "ENERGIA" else "Temperatura"
-        total = len(df)
-        validos = len(df.dropna(subset=[main_column]))
+        total = linhas_recorte(df, recorte)
+        validos = resumo[main_column]["validos"] if main_column in resumo else 0
         invalidos = total - validos
         st.write(f"**Total:** {total} | **Válidos:** {validos} | **Inválidos:** {invalidos}")
         unit = "W" if modo == "ENERGIA" else "°C"
-        if not df[main_column].isna().all() and pd.api.types.is_numeric_dtype(df[main_column]):
-            max_val = df[main_column].max()
-            min_val = df[main_column].min()
-            mean_val = df[main_column].mean()
+        principal = valores_resumo(resumo, main_column)
+        if principal is not None:
+            max_val, min_val, mean_val = principal
             st.write(f"**{main_column}** - Máxima: {max_val:.2f}{unit} | Mínima: {min_val:.2f}{unit} | Média: {mean_val:.2f}{unit}")
         else:
             st.write(f"**{main_column}** - Dados insuficientes para estatísticas")
-        if modo == "DATALOGGER" and "Umidade" in df.columns and not df["Umidade"].isna().all() and pd.api.types.is_numeric_dtype(df["Umidade"]):
-            umidade_max = df["Umidade"].max()
-            umidade_min = df["Umidade"].min()
-            umidade_media = df["Umidade"].mean()
+        umidade = valores_resumo(resumo, "Umidade") if modo == "DATALOGGER" else None
+        if umidade is not None:
+            umidade_max, umidade_min, umidade_media = umidade
             st.write(f"**Umidade** - Máxima: {umidade_max:.2f}% | Mínima: {umidade_min:.2f}% | Média: {umidade_media:.2f}%")
         elif modo == "DATALOGGER":
             st.write("**Umidade** - Dados insuficientes para estatísticas")
         if modo == "SITRAD" or modo == "ENERGIA":
-            extra_columns = [c for c in df.columns if (c.startswith("Dados_Extra") or c.startswith("Potência_Trafo")) and pd.api.types.is_numeric_dtype(df[c])]
+            extra_columns = colunas_extras(df)
             for col in extra_columns:
-                if not df[col].isna().all():
-                    max_val = df[col].max()
-                    min_val = df[col].min()
-                    mean_val = df[col].mean()
+                extra = valores_resumo(resumo, col)
+                if extra is not None:
+                    max_extra, min_extra, mean_extra = extra
                     unit_extra = "W" if col.startswith("Potência_Trafo") else "°C"
-                    st.write(f"**{col}** - Máxima: {max_val:.2f}{unit_extra} | Mínima: {min_val:.2f}{unit_extra} | Média: {mean_val:.2f}{unit_extra}")
+                    st.write(f"**{col}** - Máxima: {max_extra:.2f}{unit_extra} | Mínima: {min_extra:.2f}{unit_extra} | Média: {mean_extra:.2f}{unit_extra}")
                 else:
                     st.write(f"**{col}** - Dados insuficientes para estatísticas")
-        inicio = df["DataHora"].min().strftime("%Y/%m/%d %H:%M:%S") if not pd.isnull(df["DataHora"].min()) else "N/A"
-        fim = df["DataHora"].max().strftime("%Y/%m/%d %H:%M:%S") if not pd.isnull(df["DataHora"].max()) else "N/A"
+        datas = resumo.get("DataHora", {})
+        inicio = datas["min"].strftime("%Y/%m/%d %H:%M:%S") if not pd.isnull(datas.get("min")) else "N/A"
+        fim = datas["max"].strftime("%Y/%m/%d %H:%M:%S") if not pd.isnull(datas.get("max")) else "N/A"
         st.write(f"**Intervalo:** {inicio} até {fim}")
-        if pontos_filtrados:
-            st.write("**Pontos Filtrados:**")
-            for _, x, y, tipo in pontos_filtrados:
-                unit_p = "%" if tipo == "Umidade" else ("W" if "Potência" in tipo else "°C")
-                st.write(f"{x.strftime('%Y/%m/%d %H:%M:%S')} - {y:.1f}{unit_p} ({tipo})")
-        if pontos_marcados:
-            st.write("**Pontos Marcados Manualmente:**")
-            for _, _, x, y, tipo in pontos_marcados:
-                unit_p = "%" if tipo == "Umidade" else ("W" if "Potência" in tipo else "°C")
-                st.write(f"{x.strftime('%Y/%m/%d %H:%M:%S')} - {y:.1f}{unit_p} ({tipo})")
-        return {
-            "Total": total,
-            "Válidos": validos,
-            "Inválidos": invalidos,
-            f"{main_column}_Máxima": f"{max_val:.2f}{unit}" if not df[main_column].isna().all() and pd.api.types.is_numeric_dtype(df[main_column]) else "N/A",
-            f"{main_column}_Mínima": f"{min_val:.2f}{unit}" if not df[main_column].isna().all() and pd.api.types.is_numeric_dtype(df[main_column]) else "N/A",
-            f"{main_column}_Média": f"{mean_val:.2f}{unit}" if not df[main_column].isna().all() and pd.api.types.is_numeric_dtype(df[main_column]) else "N/A",
-            "Umidade_Máxima": f"{umidade_max:.2f}%" if modo == "DATALOGGER" and "Umidade" in df.columns and not df["Umidade"].isna().all() else "N/A",
-            "Umidade_Mínima": f"{umidade_min:.2f}%" if modo == "DATALOGGER" and "Umidade" in df.columns and not df["Umidade"].isna().all() else "N/A",
-            "Umidade_Média": f"{umidade_media:.2f}%" if modo == "DATALOGGER" and "Umidade" in df.columns and not df["Umidade"].isna().all() else "N/A",
-            "Intervalo": f"{inicio} até {fim}",
-            "Pontos_Filtrados": [(x.strftime('%Y/%m/%d %H:%M:%S'), y, tipo) for _, x, y, tipo in pontos_filtrados] if pontos_filtrados else [],
-            "Pontos_Marcados": [(x.strftime('%Y/%m/%d %H:%M:%S'), y, tipo) for _, _, x, y, tipo in pontos_marcados] if pontos_marcados else []
-        }
+        detalhes = {col: r for col, r in resumo.items() if col != "DataHora" and "desvio" in r and r["validos"]}
+        if detalhes:
+            with st.expander("Desvio Padrão e Percentis"):
+                percentis = {col: {"Desvio": r["desvio"], **{f"P{p}": r[f"p{p}"] for p in PERCENTIS}} for col, r in detalhes.items()}
+                st.dataframe(pd.DataFrame(percentis).T.round(2), use_container_width=True)
+        if pontos_filtrados is not None and not pontos_filtrados.empty:
+            mostrar_tabela_pontos(pontos_filtrados, "Pontos Filtrados", "filtrados")
+        if pontos_marcados is not None and not pontos_marcados.empty:
+            mostrar_tabela_pontos(pontos_marcados, "Pontos Marcados Manualmente", "marcados")
+        return montar_estatisticas(df, modo, pontos_filtrados, pontos_marcados, resumo, recorte=recorte)
+
+# Dicionário de estatísticas do relatório, sem exibição (usado também pelo processamento em lote)
+def montar_estatisticas(df, modo, pontos_filtrados=None, pontos_marcados=None, resumo=None, impressao=None, recorte=None):
+    if resumo is None:
+        resumo = obter_estatisticas(df, colunas_series(df, modo), impressao, None if recorte is None else recorte["posicoes"])
+    main_column = "Potência" if modo == "ENERGIA" else "Temperatura"
+    unit = "W" if modo == "ENERGIA" else "°C"
+    total = linhas_recorte(df, recorte)
+    validos = resumo[main_column]["validos"] if main_column in resumo else 0
+    principal = valores_resumo(resumo, main_column)
+    umidade = valores_resumo(resumo, "Umidade") if modo == "DATALOGGER" else None
+    datas = resumo.get("DataHora", {})
+    inicio = datas["min"].strftime("%Y/%m/%d %H:%M:%S") if not pd.isnull(datas.get("min")) else "N/A"
+    fim = datas["max"].strftime("%Y/%m/%d %H:%M:%S") if not pd.isnull(datas.get("max")) else "N/A"
+    return {
+        "Total": total,
+        "Válidos": validos,
+        "Inválidos": total - validos,
+        f"{main_column}_Máxima": f"{principal[0]:.2f}{unit}" if principal is not None else "N/A",
+        f"{main_column}_Mínima": f"{principal[1]:.2f}{unit}" if principal is not None else "N/A",
+        f"{main_column}_Média": f"{principal[2]:.2f}{unit}" if principal is not None else "N/A",
+        "Umidade_Máxima": f"{umidade[0]:.2f}%" if umidade is not None else "N/A",
+        "Umidade_Mínima": f"{umidade[1]:.2f}%" if umidade is not None else "N/A",
+        "Umidade_Média": f"{umidade[2]:.2f}%" if umidade is not None else "N/A",
+        "Intervalo": f"{inicio} até {fim}",
+        "Pontos_Filtrados": pontos_como_lista(pontos_filtrados),
+        "Pontos_Marcados": pontos_como_lista(pontos_marcados)
+    }
 
 def salvar_configuracoes():
     config = {
@@ -280,62 +2449,363 @@ def salvar_configuracoes():
         "filtro_valor_tipo": st.session_state.get('filtro_valor_tipo'),
         "escala_y_min": st.session_state.get('escala_y_min'),
         "escala_y_max": st.session_state.get('escala_y_max'),
+        "max_pontos_grafico": st.session_state.get('max_pontos_grafico'),
+        "filtro_hora": st.session_state.get('filtro_hora_valor'),
+        "filtros": st.session_state.get('filtros', []),
         "faixas": st.session_state.get('faixas', []),
-        "pontos_marcados": [(None, None, x.strftime('%Y/%m/%d %H:%M:%S'), y, tipo) for _, _, x, y, tipo in st.session_state.get('pontos_marcados', [])]
+        "excursoes": st.session_state.get('regras_excursao', []),
+        "pontos_marcados": [(None, None, x, y, tipo) for x, y, tipo in pontos_como_lista(st.session_state.get('pontos_marcados'))]
     }
     buf = BytesIO()
     buf.write(json.dumps(config, ensure_ascii=False).encode('utf-8'))
     return buf
 
+def pontos_configuracao(lista):
+    pontos = pd.DataFrame([(x, y, tipo) for _, _, x, y, tipo in lista], columns=COLUNAS_PONTOS)
+    pontos["DataHora"] = pd.to_datetime(pontos["DataHora"])
+    return pontos if not pontos.empty else pontos_vazios()
+
 def carregar_configuracoes(uploaded_config):
     try:
         config = json.load(uploaded_config)
-        if "filtro_ativo" in config:
-            st.session_state['filtro_ativo'] = config["filtro_ativo"]
-        if "filtro_valor_min" in config:
-            st.session_state['filtro_valor_min'] = config["filtro_valor_min"]
-        if "filtro_valor_max" in config:
-            st.session_state['filtro_valor_max'] = config["filtro_valor_max"]
-        if "filtro_valor_tipo" in config:
-            st.session_state['filtro_valor_tipo'] = config["filtro_valor_tipo"]
+        if "filtros" in config or "filtro_ativo" in config:
+            st.session_state['filtros'] = filtros_configuracao(config)
         if "escala_y_min" in config:
             st.session_state['escala_y_min'] = config["escala_y_min"]
         if "escala_y_max" in config:
             st.session_state['escala_y_max'] = config["escala_y_max"]
+        if "max_pontos_grafico" in config:
+            st.session_state['max_pontos_grafico'] = config["max_pontos_grafico"]
         if "faixas" in config:
             st.session_state['faixas'] = config["faixas"]
+        if "excursoes" in config:
+            st.session_state['regras_excursao'] = config["excursoes"]
         if "pontos_marcados" in config:
-            st.session_state['pontos_marcados'] = [(None, None, pd.to_datetime(x), y, tipo) for _, _, x, y, tipo in config["pontos_marcados"]]
+            st.session_state['pontos_marcados'] = pontos_configuracao(config["pontos_marcados"])
         st.success("Configurações carregadas com sucesso!")
     except:
         st.error("Erro ao carregar configurações. Verifique o formato do arquivo JSON.")
 
-def gerar_relatorio(df, modo, estatisticas, fig):
+# Relatório: dados em xlsx, Parquet ou CSV compactado, com estatísticas e gráfico
+LIMITE_LINHAS_EXCEL = 1048576
+FORMATOS_RELATORIO = ["xlsx", "parquet", "csv.gz"] if pq is not None else ["xlsx", "csv.gz"]
+TIPOS_MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "parquet": "application/octet-stream",
+    "gz": "application/gzip", "csv": "text/csv", "html": "text/html"
+}
+
+def abas_dados(df, nome="Dados", limite=LIMITE_LINHAS_EXCEL - 1):
+    if len(df) <= limite:
+        return [(nome, df)]
+    return [(nome if i == 0 else f"{nome}_{i // limite + 1}", df.iloc[i:i + limite]) for i in range(0, len(df), limite)]
+
+def tabela_estatisticas(estatisticas):
+    return pd.DataFrame([{k: json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, list) else v for k, v in estatisticas.items()}])
+
+def tabela_grafico(fig):
+    # pontos efetivamente desenhados (já reduzidos), série a série
+    series = [pd.DataFrame({"Série": trace.name, "DataHora": pd.to_datetime(pd.Series(trace.x)),
+                            "Valor": pd.to_numeric(pd.Series(trace.y), errors="coerce")})
+              for trace in fig.data if trace.x is not None and len(trace.x)]
+    return pd.concat(series, ignore_index=True)[["DataHora", "Série", "Valor"]] if series else None
+
+def escrever_csv_gz(destino, df):
+    with gzip.GzipFile(fileobj=destino, mode="wb", compresslevel=1) as gz:
+        for i in range(0, max(len(df), 1), LINHAS_POR_BLOCO_EXPORTACAO):
+            gz.write(preparar_exportacao(df.iloc[i:i + LINHAS_POR_BLOCO_EXPORTACAO]).to_csv(index=False, header=i == 0).encode("utf-8"))
+
+def escrever_parquet(destino, df):
+    # colunas numéricas e de data vão direto para o Arrow, sem formatar texto
+    tabela = pa.Table.from_pandas(df.drop(columns=[c for c in COLUNAS_INTERNAS if c in df.columns]), preserve_index=False)
+    pq.write_table(tabela, destino, compression="snappy", row_group_size=LINHAS_POR_BLOCO_EXPORTACAO * 4)
+
+@instrumentado
+def gerar_relatorio(df, modo, estatisticas, fig, formato="xlsx", nome="relatorio"):
     buf = BytesIO()
-    with pd.ExcelWriter(buf, engine='openpyxl') as writer:
-        df_export = df.copy()
-        if "DataHora_str" in df_export.columns:
-            df_export = df_export.drop(columns=["DataHora"]).rename(columns={"DataHora_str": "DataHora"})
-        else:
-            df_export["DataHora"] = df_export["DataHora"].dt.strftime("%Y/%m/%d %H:%M:%S")
-        df_export.to_excel(writer, sheet_name="Dados", index=False)
-        stats_df = pd.DataFrame([estatisticas])
-        stats_df.to_excel(writer, sheet_name="Estatísticas", index=False)
-    return buf
+    if formato == "xlsx":
+        abas = abas_dados(df) + [("Estatísticas", tabela_estatisticas(estatisticas))]
+        grafico = tabela_grafico(fig) if fig is not None else None
+        if grafico is not None:
+            abas.append(("Gráfico", grafico))
+        escrever_xlsx(buf, abas)
+        return [(f"{nome}.xlsx", buf.getvalue())]
+    if formato == "parquet":
+        escrever_parquet(buf, df)
+    elif formato == "csv.gz":
+        escrever_csv_gz(buf, df)
+    else:
+        raise ValueError(f"Formato de relatório desconhecido: {formato}")
+    arquivos = [(f"{nome}.{formato}", buf.getvalue())]
+    arquivos.append((f"{nome}_estatisticas.csv", tabela_estatisticas(estatisticas).to_csv(index=False).encode("utf-8")))
+    if fig is not None:
+        arquivos.append((f"{nome}_grafico.html", fig.to_html(include_plotlyjs="cdn").encode("utf-8")))
+    return arquivos
+
+# Contabilidade de memória: bytes por objeto da sessão e dos caches compartilhados do processo
+CONJUNTOS_COMPARTILHADOS = weakref.WeakValueDictionary()
+TEMPO_SESSAO = 3600
+TAMANHOS_CONJUNTOS = OrderedDict()
+TRAVA_TAMANHOS = threading.Lock()
+MAX_TAMANHOS_CONJUNTOS = 256
+
+def tamanho_dataframe(df):
+    # conjuntos com chave de conteúdo são medidos uma vez só (a varredura das colunas de texto é cara)
+    if not df.attrs.get("chave"):
+        return int(df.memory_usage(deep=True).sum())
+    identidade = identidade_dados(df)
+    with TRAVA_TAMANHOS:
+        if identidade in TAMANHOS_CONJUNTOS:
+            TAMANHOS_CONJUNTOS.move_to_end(identidade)
+            return TAMANHOS_CONJUNTOS[identidade]
+    tamanho = int(df.memory_usage(deep=True).sum())
+    with TRAVA_TAMANHOS:
+        TAMANHOS_CONJUNTOS[identidade] = tamanho
+        while len(TAMANHOS_CONJUNTOS) > MAX_TAMANHOS_CONJUNTOS:
+            TAMANHOS_CONJUNTOS.popitem(last=False)
+    return tamanho
+
+def tamanho_objeto(obj, vistos=None):
+    vistos = set() if vistos is None else vistos
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return tamanho_dataframe(obj)
+    if isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, BytesIO):
+        return obj.getbuffer().nbytes
+    if isinstance(obj, go.Figure):
+        return sum(tamanho_objeto(getattr(trace, eixo, None), vistos) for trace in obj.data for eixo in ("x", "y", "customdata"))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(tamanho_objeto(k, vistos) + tamanho_objeto(v, vistos) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, deque)):
+        return sys.getsizeof(obj) + sum(tamanho_objeto(v, vistos) for v in obj)
+    return sys.getsizeof(obj)
+
+def objetos_compartilhados():
+    ids = {id(df) for df in list(CONJUNTOS_COMPARTILHADOS.values())}
+    cache = cache_filtros_compartilhado()
+    with cache["trava"]:
+        for valor, _ in cache["itens"].values():
+            ids.update(id(v) for v in (valor if isinstance(valor, tuple) else (valor,)))
+    return ids
+
+@instrumentado
+def memoria_sessao(estado):
+    # objetos compartilhados aparecem com o tamanho total, mas não entram na conta da sessão
+    compartilhados = objetos_compartilhados()
+    vistos = set(compartilhados)
+    linhas = []
+    for chave in [c for c in list(estado.keys()) if c != 'medicao_memoria']:
+        obj = estado[chave]
+        compartilhado = id(obj) in compartilhados
+        linhas.append({"Objeto": chave, "Tipo": type(obj).__name__, "Bytes": tamanho_objeto(obj) if compartilhado else tamanho_objeto(obj, vistos), "Compartilhado": compartilhado})
+    return pd.DataFrame(linhas, columns=["Objeto", "Tipo", "Bytes", "Compartilhado"]).sort_values("Bytes", ascending=False, ignore_index=True)
+
+def rss_processo():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # pico, em sistemas sem /proc
+
+def memoria_processo():
+    conjuntos = list(CONJUNTOS_COMPARTILHADOS.values())
+    pngs = servico_png()
+    with pngs["trava"]:
+        bytes_png = sum(len(png) for png in pngs["cache"].values())
+    return {
+        "Conjuntos compartilhados": (len(conjuntos), sum(tamanho_objeto(df) for df in conjuntos)),
+        "Cache de conjuntos": (len(servico_ingestao()["conjuntos"]["itens"]), servico_ingestao()["conjuntos"]["bytes"]),
+        "Cache de filtros": (len(cache_filtros_compartilhado()["itens"]), cache_filtros_compartilhado()["bytes"]),
+        "Imagens PNG": (len(pngs["cache"]), bytes_png),
+        "Processo (RSS)": (None, rss_processo())
+    }
+
+@st.cache_resource
+def registro_sessoes():
+    return {"sessoes": {}, "trava": threading.Lock()}
+
+def registrar_sessao(total):
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    registro = registro_sessoes()
+    agora = time.time()
+    with registro["trava"]:
+        registro["sessoes"][ctx.session_id] = (agora, total)
+        for sessao in [s for s, (visto, _) in registro["sessoes"].items() if agora - visto > TEMPO_SESSAO]:
+            del registro["sessoes"][sessao]
+
+def formatar_bytes(n):
+    for unidade in ["B", "KB", "MB", "GB"]:
+        if n < 1024 or unidade == "GB":
+            return f"{n:.0f} {unidade}" if unidade == "B" else f"{n:.1f} {unidade}"
+        n /= 1024
+
+def mostrar_memoria():
+    # a medição percorre os objetos da sessão; só é feita quando pedida
+    with st.expander("Uso de Memória"):
+        if st.button("Medir Uso de Memória", key="medir_memoria"):
+            tabela = memoria_sessao(st.session_state)
+            registrar_sessao(int(tabela.loc[~tabela["Compartilhado"], "Bytes"].sum()))
+            st.session_state['medicao_memoria'] = (time.time(), tabela, memoria_processo())
+        if st.session_state.get('medicao_memoria') is not None:
+            medido, tabela, processo = st.session_state['medicao_memoria']
+            total = int(tabela.loc[~tabela["Compartilhado"], "Bytes"].sum())
+            compartilhados = int(tabela.loc[tabela['Compartilhado'], 'Bytes'].sum())
+            st.write(f"**Esta sessão** (medida às {datetime.fromtimestamp(medido).strftime('%H:%M:%S')})**:** {formatar_bytes(total)} exclusivos | "
+                     f"**Compartilhados referenciados:** {formatar_bytes(compartilhados)}")
+            st.dataframe(tabela[tabela["Bytes"] > 0].assign(Tamanho=lambda t: t["Bytes"].map(formatar_bytes)).drop(columns="Bytes"), use_container_width=True, hide_index=True)
+            st.write("**Processo**")
+            itens = [{"Item": k, "Entradas": "" if n is None else str(n), "Tamanho": formatar_bytes(b)} for k, (n, b) in processo.items()]
+            st.dataframe(pd.DataFrame(itens), use_container_width=True, hide_index=True)
+        conjuntos = estatisticas_conjuntos()
+        st.caption(f"Cache de conjuntos: {conjuntos['acertos']} acertos, {conjuntos['falhas']} leituras, "
+                   f"{conjuntos['compartilhadas']} leituras compartilhadas entre sessões, {conjuntos['despejos']} despejos por tamanho "
+                   f"e {conjuntos['expirados']} por validade (limite {formatar_bytes(conjuntos['limite'])}).")
+        with registro_sessoes()["trava"]:
+            sessoes = sorted(registro_sessoes()["sessoes"].items(), key=lambda s: -s[1][1])
+        st.write(f"**Sessões ativas:** {len(sessoes)} (tamanho na última medição de cada uma)")
+        linhas = [{"Sessão": s[:8], "Tamanho": formatar_bytes(b), "Última Execução": datetime.fromtimestamp(t).strftime("%H:%M:%S")}
+                  for s, (t, b) in sessoes]
+        st.dataframe(pd.DataFrame(linhas), use_container_width=True, hide_index=True)
+
+# Exportação do gráfico em PNG sob demanda, em segundo plano, com cache por entradas da figura
+MAX_PNGS_CACHE = int(os.environ.get("ANALISADOR_MAX_PNGS", "16"))
+PNG_WORKERS = int(os.environ.get("ANALISADOR_PNG_WORKERS", "1"))
+PRAZO_ERRO_PNG = 300  # segundos em que uma falha fica guardada à espera da sessão que pediu a imagem
+
+def testar_kaleido():
+    try:
+        go.Figure().to_image(format="png")
+        return True
+    except Exception:
+        return False
+
+@st.cache_resource
+def servico_png():
+    executor = ThreadPoolExecutor(max_workers=PNG_WORKERS, thread_name_prefix="png")
+    return {"executor": executor, "disponivel": executor.submit(testar_kaleido), "cache": OrderedDict(), "tarefas": {}, "erros": OrderedDict(), "trava": threading.Lock()}
+
+def renderizar_png(servico, chave, spec):
+    if not servico["disponivel"].result():
+        return
+    try:
+        png = pio.from_json(spec).to_image(format="png")
+    except Exception as e:
+        # a falha pode ser passageira: fica guardada só até ser informada (ou expirar), e um novo pedido tenta de novo
+        with servico["trava"]:
+            servico["erros"][chave] = (str(e), time.time())
+            while len(servico["erros"]) > MAX_PNGS_CACHE:
+                servico["erros"].popitem(last=False)
+            servico["tarefas"].pop(chave, None)
+        return
+    with servico["trava"]:
+        servico["cache"][chave] = png
+        while len(servico["cache"]) > MAX_PNGS_CACHE:
+            servico["cache"].popitem(last=False)
+        servico["tarefas"].pop(chave, None)
+
+def expirar_erros_png(servico):
+    # chamada com a trava do serviço; as falhas entram em ordem de tempo
+    agora = time.time()
+    while servico["erros"] and agora - next(iter(servico["erros"].values()))[1] > PRAZO_ERRO_PNG:
+        servico["erros"].popitem(last=False)
+
+def chave_grafico(*entradas):
+    # entradas pequenas (identidade do conjunto, opções, pontos marcados): a figura não é serializada
+    return hashlib.sha1(repr(entradas).encode("utf-8")).hexdigest()
+
+@instrumentado
+def solicitar_png(fig, chave):
+    servico = servico_png()
+    with servico["trava"]:
+        if chave in servico["cache"] or chave in servico["tarefas"]:
+            return
+        servico["erros"].pop(chave, None)
+    spec = fig.to_json()
+    registrar_tamanho("gráfico (JSON)", len(spec))
+    with servico["trava"]:
+        if chave not in servico["tarefas"]:
+            servico["tarefas"][chave] = servico["executor"].submit(renderizar_png, servico, chave, spec)
+
+def estado_png(chave, informar=True):
+    servico = servico_png()
+    if servico["disponivel"].done() and not servico["disponivel"].result():
+        return "indisponivel", None
+    with servico["trava"]:
+        if chave in servico["cache"]:
+            servico["cache"].move_to_end(chave)
+            return "pronto", servico["cache"][chave]
+        expirar_erros_png(servico)
+        if chave in servico["erros"]:
+            return "erro", (servico["erros"].pop(chave) if informar else servico["erros"][chave])[0]
+        return ("renderizando" if chave in servico["tarefas"] else "pendente"), None
+
+@st.fragment(run_every=1)
+def aguardar_png(chave):
+    # só esta parte da página é reexecutada enquanto a imagem é gerada
+    if estado_png(chave, informar=False)[0] != "renderizando":
+        st.rerun()
+    st.caption("Gerando imagem do gráfico...")
+
+def mostrar_exportacao_grafico(fig, chave):
+    estado, valor = estado_png(chave)
+    if estado == "erro":
+        # a falha sai do serviço ao ser informada; a mensagem fica com esta sessão, e o botão permite tentar de novo
+        st.session_state['erro_png'] = (chave, valor)
+        estado = "pendente"
+    if estado == "pendente" and st.button("Gerar Imagem do Gráfico", key="gerar_png", type="primary"):
+        st.session_state['erro_png'] = None
+        solicitar_png(fig, chave)
+        estado, valor = estado_png(chave)
+    if estado == "pronto":
+        st.download_button("Exportar Gráfico", valor, "grafico.png", "image/png", type="primary")
+    elif estado == "renderizando":
+        aguardar_png(chave)
+    elif estado == "erro":
+        st.session_state['erro_png'] = (chave, valor)
+    elif estado == "indisponivel":
+        st.warning("Exportação de gráfico PNG não disponível devido a limitações do ambiente.")
+    erro = st.session_state.get('erro_png')
+    if estado in ("pendente", "erro") and erro and erro[0] == chave:
+        st.warning(f"Erro ao gerar a imagem do gráfico: {erro[1]}")
 
 def main():
+    medicao = iniciar_medicao(st.session_state.pop('perfilar_proxima', False))
+    try:
+        mostrar_pagina()
+    except BaseException:
+        medicao["interrompida"] = True  # st.rerun e st.stop também encerram a execução por exceção
+        raise
+    finally:
+        finalizar_medicao(medicao)
+    if medicao["perfil"] is not None:
+        st.rerun()  # mais uma execução, sem perfil, para exibir o resultado no painel
+
+def mostrar_pagina():
+    configurar_pagina()
     st.markdown('<div class="main">', unsafe_allow_html=True)
     st.title("Analisador de Temperatura e Energia")
 
     # Inicialização do estado da sessão
     if 'dados_consolidados' not in st.session_state:
         st.session_state['dados_consolidados'] = pd.DataFrame()
-    if 'dados_filtrados' not in st.session_state:
-        st.session_state['dados_filtrados'] = pd.DataFrame()
+    if 'recorte_filtrado' not in st.session_state:
+        st.session_state['recorte_filtrado'] = None
     if 'pontos_marcados' not in st.session_state:
-        st.session_state['pontos_marcados'] = []
+        st.session_state['pontos_marcados'] = pontos_vazios()
     if 'pontos_filtrados' not in st.session_state:
-        st.session_state['pontos_filtrados'] = []
+        st.session_state['pontos_filtrados'] = pontos_vazios()
     if 'faixas' not in st.session_state:
         st.session_state['faixas'] = []
     if 'filtro_ativo' not in st.session_state:
@@ -346,12 +2816,25 @@ def main():
         st.session_state['filtro_valor_max'] = None
     if 'filtro_valor_tipo' not in st.session_state:
         st.session_state['filtro_valor_tipo'] = None
+    if 'filtro_hora_valor' not in st.session_state:
+        st.session_state['filtro_hora_valor'] = None
+    if 'filtros' not in st.session_state:
+        st.session_state['filtros'] = []
+    if 'regras_excursao' not in st.session_state:
+        st.session_state['regras_excursao'] = []
+    if 'cache_filtros' not in st.session_state:
+        st.session_state['cache_filtros'] = novo_cache_filtros(MAX_BYTES_FILTROS // 4)  # conjuntos do modo incremental
     if 'escala_y_min' not in st.session_state:
         st.session_state['escala_y_min'] = None
     if 'escala_y_max' not in st.session_state:
         st.session_state['escala_y_max'] = None
     if 'grafico_atual' not in st.session_state:
         st.session_state['grafico_atual'] = None
+    if 'janela_grafico' not in st.session_state:
+        st.session_state['janela_grafico'] = None
+    if 'max_pontos_grafico' not in st.session_state:
+        st.session_state['max_pontos_grafico'] = MAX_PONTOS_GRAFICO
+    marcar("inicializacao")
 
     # Parte superior: botões
     with st.container():
@@ -367,56 +2850,115 @@ def main():
         with col2:
             modo = st.session_state.get('modo', 'SITRAD')
             file_types = ["xlsx", "xls"] if modo != "ENERGIA" else ["csv"]
-            uploaded_file = st.file_uploader("Selecionar Arquivo", type=file_types, label_visibility="collapsed")
-            if uploaded_file:
+            arquivos_enviados = st.file_uploader("Selecionar Arquivo", type=file_types, accept_multiple_files=True, label_visibility="collapsed")
+            incremental = st.checkbox("Modo Incremental", key="modo_incremental", help="Para arquivos que continuam crescendo: a cada novo envio, lê apenas as linhas novas.")
+            if pq is None:
+                st.caption("pyarrow não instalado: cache em disco dos arquivos lidos e relatório Parquet desativados.")
+            if arquivos_enviados:
                 try:
-                    if modo in ["SITRAD", "DATALOGGER"]:
-                        excel = pd.ExcelFile(uploaded_file)
-                        aba = st.selectbox("Selecione a Aba", excel.sheet_names)
-                        st.session_state['dados_consolidados'] = analisar_arquivo(uploaded_file, modo, aba)
+                    uploaded_file = arquivos_enviados[0]
+                    if len(arquivos_enviados) > 1:
+                        # vários arquivos: cada um é lido (e mantido em cache) separadamente e depois mesclado numa linha do tempo única
+                        abas_arquivos = {arquivo.name: abas_arquivo(arquivo) for arquivo in arquivos_enviados} if modo in ["SITRAD", "DATALOGGER"] else {}
+                        aba = st.selectbox("Selecione a Aba", list(dict.fromkeys(a for abas in abas_arquivos.values() for a in abas))) if abas_arquivos else None
+                        if incremental:
+                            st.warning("Modo Incremental disponível apenas para um arquivo; os arquivos serão consolidados normalmente.")
+                        sem_aba = [nome for nome, abas in abas_arquivos.items() if aba not in abas]
+                        if sem_aba:
+                            st.warning(f"Aba '{aba}' não encontrada em: {', '.join(sem_aba)}")
+                        if len(sem_aba) == len(arquivos_enviados):
+                            raise ValueError("Nenhum arquivo contém a aba selecionada.")
+                        conjuntos = ingerir_arquivos([arquivo for arquivo in arquivos_enviados if arquivo.name not in sem_aba], modo, aba)
+                        st.session_state['fonte_incremental'] = None
+                        st.session_state['dados_consolidados'] = consolidar_arquivos(tuple(df.attrs["chave"] for df in conjuntos), conjuntos) if conjuntos else pd.DataFrame()
+                        consolidacao = st.session_state['dados_consolidados'].attrs.get("consolidacao")
+                        if consolidacao:
+                            mantidas = consolidacao['linhas'] - consolidacao['duplicadas']
+                            st.caption(f"{consolidacao['arquivos']} arquivos consolidados: {mantidas:,} linhas "
+                                       f"({consolidacao['duplicadas']:,} duplicadas removidas)".replace(",", "."))
                     else:
-                        st.session_state['dados_consolidados'] = analisar_arquivo(uploaded_file, modo)
-                    st.session_state['dados_filtrados'] = st.session_state['dados_consolidados']
+                        aba = st.selectbox("Selecione a Aba", abas_arquivo(uploaded_file)) if modo in ["SITRAD", "DATALOGGER"] else None
+                        if incremental:
+                            acompanhar_ingestoes([])
+                            fontes = st.session_state.setdefault('fontes_incrementais', {})
+                            chave_fonte = (uploaded_file.name, modo, aba)
+                            fontes[chave_fonte] = atualizar_fonte_incremental(uploaded_file, modo, aba, fontes.get(chave_fonte), st.session_state['max_pontos_grafico'])
+                            st.session_state['fonte_incremental'] = fontes[chave_fonte]
+                            st.session_state['dados_consolidados'] = fontes[chave_fonte]["dados"]
+                        else:
+                            st.session_state['fonte_incremental'] = None
+                            conjuntos = ingerir_arquivos([uploaded_file], modo, aba)
+                            st.session_state['dados_consolidados'] = conjuntos[0] if conjuntos else pd.DataFrame()
                     st.session_state['grafico_atual'] = None
-                    st.success("Arquivo analisado com sucesso!")
+                    st.session_state['exportacao_faixas'] = None
+                    st.session_state['exportacao_dados'] = None
+                    if not st.session_state['dados_consolidados'].empty or st.session_state.get('fonte_incremental'):
+                        st.success("Arquivo analisado com sucesso!")
                 except Exception as e:
                     st.error(str(e))
                     return
+            else:
+                acompanhar_ingestoes([])
         with col3:
-            if st.session_state.get('grafico_exportavel', False) and not st.session_state['dados_consolidados'].empty:
-                df = st.session_state['dados_filtrados'] if not st.session_state['dados_filtrados'].empty else st.session_state['dados_consolidados']
-                title = "Gráfico de Dados" if st.session_state['dados_filtrados'].empty else f"Gráfico da Faixa: {df['DataHora'].min().strftime('%Y/%m/%d %H:%M:%S')} a {df['DataHora'].max().strftime('%Y/%m/%d %H:%M:%S')}"
-                fig = gerar_grafico(df, modo, st.session_state['filtro_ativo'], st.session_state['filtro_valor_min'], st.session_state['filtro_valor_max'], st.session_state['filtro_valor_tipo'], st.session_state['escala_y_min'], st.session_state['escala_y_max'], title, st.session_state['pontos_marcados'], st.session_state['pontos_filtrados'])
-                buf = BytesIO()
-                fig.write_image(buf, format="png")
-                st.download_button("Exportar Gráfico", buf.getvalue(), "grafico.png", type="primary")
+            # preenchido depois que o gráfico é montado
+            slot_grafico = st.empty()
         with col4:
             if st.button("Remover Pontos e Filtros", key="reset", type="primary"):
-                st.session_state['dados_filtrados'] = st.session_state['dados_consolidados']
-                st.session_state['pontos_marcados'] = []
-                st.session_state['pontos_filtrados'] = []
-                st.session_state['filtro_ativo'] = None
-                st.session_state['filtro_valor_min'] = None
-                st.session_state['filtro_valor_max'] = None
-                st.session_state['filtro_valor_tipo'] = None
+                st.session_state['filtros'] = []
+                st.session_state['regras_excursao'] = []
+                st.session_state['pontos_marcados'] = pontos_vazios()
                 st.session_state['escala_y_min'] = None
                 st.session_state['escala_y_max'] = None
                 st.session_state['grafico_atual'] = None
+                st.session_state['resumo_faixa'] = None
                 st.success("Pontos e filtros removidos.")
         with col5:
-            buf = BytesIO()
-            df_export = st.session_state['dados_consolidados'].copy() if not st.session_state['dados_consolidados'].empty else pd.DataFrame()
-            if not df_export.empty:
-                if "DataHora_str" in df_export.columns:
-                    df_export = df_export.drop(columns=["DataHora"]).rename(columns={"DataHora_str": "DataHora"})
-                else:
-                    df_export["DataHora"] = df_export["DataHora"].dt.strftime("%Y/%m/%d %H:%M:%S")
-                df_export.to_excel(buf, index=False)
-                st.download_button("Exportar Excel", buf.getvalue(), "dados_consolidados.xlsx", type="primary")
+            if not st.session_state['dados_consolidados'].empty:
+                formato = st.selectbox("Formato", FORMATOS_RELATORIO, key="formato_exportacao", label_visibility="collapsed")
+                if st.button("Exportar Dados", key="exportar_dados", type="primary"):
+                    df = st.session_state['dados_consolidados']
+                    inicio_exportacao = time.perf_counter()
+                    estatisticas = montar_estatisticas(df, modo, st.session_state['pontos_filtrados'], st.session_state['pontos_marcados'])
+                    fig = gerar_grafico(
+                        df, modo, st.session_state['filtro_ativo'],
+                        st.session_state['filtro_valor_min'], st.session_state['filtro_valor_max'],
+                        st.session_state['filtro_valor_tipo'], st.session_state['escala_y_min'],
+                        st.session_state['escala_y_max'], "Gráfico de Dados",
+                        st.session_state['pontos_marcados'], st.session_state['pontos_filtrados'],
+                        max_pontos=st.session_state['max_pontos_grafico'], piramide=piramide_dados(df, modo)
+                    )
+                    st.session_state['exportacao_dados'] = (gerar_relatorio(df, modo, estatisticas, fig, formato, "dados_consolidados"), time.perf_counter() - inicio_exportacao)
+                if st.session_state.get('exportacao_dados'):
+                    arquivos, duracao = st.session_state['exportacao_dados']
+                    for nome_arquivo, conteudo in arquivos:
+                        st.download_button(f"Baixar {nome_arquivo}", conteudo, nome_arquivo, TIPOS_MIME[nome_arquivo.rsplit(".", 1)[-1]], key=f"baixar_{nome_arquivo}", type="primary")
+                    st.caption(f"Exportação gerada em {duracao:.2f}s ({len(st.session_state['dados_consolidados'])} linhas).")
         with col6:
             if st.button("Configurar Filtros", key="config_filtros", type="primary"):
                 st.session_state['mostrar_filtros'] = not st.session_state.get('mostrar_filtros', False)
 
+    marcar("controles e leitura")
+
+    # Filtros aplicados sobre o conjunto consolidado a cada execução (máscaras e posições em cache); a sessão
+    # guarda só as posições selecionadas, e os pontos filtrados são refeitos quando o recorte muda
+    st.session_state.update(estado_filtros(st.session_state['filtros']))
+    consolidados = st.session_state['dados_consolidados']
+    try:
+        recorte = posicoes_filtradas(consolidados, st.session_state['filtros'], cache_do_conjunto(consolidados))
+        chave_pontos = (modo, identidade_recorte(consolidados, recorte))
+        if st.session_state.get('chave_pontos_filtrados') != chave_pontos:
+            st.session_state['pontos_filtrados'] = pontos_recorte(consolidados, modo, st.session_state['filtros'], recorte)
+            st.session_state['chave_pontos_filtrados'] = chave_pontos
+    except (KeyError, ValueError) as e:
+        st.error(f"Filtro inválido para estes dados ({e}); filtros removidos.")
+        st.session_state['filtros'] = []
+        st.session_state.update(estado_filtros([]))
+        recorte = None
+        st.session_state['pontos_filtrados'], st.session_state['chave_pontos_filtrados'] = pontos_vazios(), None
+    st.session_state['recorte_filtrado'] = recorte
+
+    marcar("filtros")
+
     # Parte inferior: layout em três partes
     col_left, col_right = st.columns([1, 3])
 
@@ -438,78 +2980,125 @@ def main():
                     with col_f4:
                         if st.button("Visualizar", key=f"visualizar_{i}", type="primary"):
                             try:
-                                inicio = pd.to_datetime(faixa["inicio"], format="%Y/%m/%d %H:%M:%S")
-                                fim = pd.to_datetime(faixa["fim"], format="%Y/%m/%d %H:%M:%S")
-                                df = st.session_state['dados_consolidados']
-                                df_filtrado = df[(df["DataHora"] >= inicio) & (df["DataHora"] <= fim)]
+                                inicio, fim = intervalo_faixa(faixa)
+                            except ValueError:
+                                inicio = fim = None
+                                st.error(f"Erro na faixa {faixa['nome']}: Formato de data inválido.")
+                            if inicio is not None:
+                                df_filtrado = fatiar_intervalo(st.session_state['dados_consolidados'], inicio, fim)
                                 if df_filtrado.empty:
                                     st.warning(f"Nenhum dado para a faixa {faixa['nome']}.")
                                 else:
+                                    piramide = piramide_dados(st.session_state['dados_consolidados'], modo)
+                                    resumo = resumo_intervalo(st.session_state['dados_consolidados'], piramide, colunas_series(df_filtrado, modo), inicio, fim)
+                                    st.session_state['resumo_faixa'] = (faixa['nome'], resumo)
+                                    st.session_state['intervalo_resumo_faixa'] = (inicio, fim)
+                                    st.session_state['chave_grafico_atual'] = chave_grafico(
+                                        identidade_dados(df_filtrado), modo, faixa['nome'], estado_filtros(st.session_state['filtros']),
+                                        st.session_state['escala_y_min'], st.session_state['escala_y_max'],
+                                        st.session_state['pontos_marcados'].to_numpy().tolist(), st.session_state['max_pontos_grafico']
+                                    )
                                     st.session_state['grafico_atual'] = gerar_grafico(
                                         df_filtrado, modo, st.session_state['filtro_ativo'],
                                         st.session_state['filtro_valor_min'], st.session_state['filtro_valor_max'],
                                         st.session_state['filtro_valor_tipo'], st.session_state['escala_y_min'],
                                         st.session_state['escala_y_max'], f"Gráfico da Faixa: {faixa['nome']}",
-                                        st.session_state['pontos_marcados'], st.session_state['pontos_filtrados']
+                                        st.session_state['pontos_marcados'], st.session_state['pontos_filtrados'],
+                                        max_pontos=st.session_state['max_pontos_grafico'], piramide=piramide
                                     )
                                     st.success(f"Gráfico da faixa {faixa['nome']} gerado.")
-                            except:
-                                st.error(f"Erro na faixa {faixa['nome']}: Formato de data inválido.")
+            if st.session_state.get('resumo_faixa'):
+                mostrar_resumo_faixa(*st.session_state['resumo_faixa'])
+                if modo == "ENERGIA" and st.session_state.get('intervalo_resumo_faixa'):
+                    consolidados = st.session_state['dados_consolidados']
+                    mostrar_energia(consolidados, modo, cache_do_conjunto(consolidados), st.session_state['intervalo_resumo_faixa'],
+                                    f"Energia da Faixa {st.session_state['resumo_faixa'][0]}", "energia_faixa")
+            formato_faixas = st.radio("Formato da Exportação", ["ZIP (um arquivo por faixa)", "Planilha Única (uma aba por faixa)"], horizontal=True)
             if st.button("Exportar Todas as Faixas", type="primary"):
-                for faixa in st.session_state['faixas']:
-                    try:
-                        inicio = pd.to_datetime(faixa["inicio"], format="%Y/%m/%d %H:%M:%S")
-                        fim = pd.to_datetime(faixa["fim"], format="%Y/%m/%d %H:%M:%S")
-                        df = st.session_state['dados_consolidados']
-                        filtrado = df[(df["DataHora"] >= inicio) & (df["DataHora"] <= fim)]
-                        if filtrado.empty:
-                            st.warning(f"Nenhum dado para a faixa {faixa['nome']}.")
-                            continue
-                        buf = BytesIO()
-                        df_export = filtrado.copy()
-                        if "DataHora_str" in df_export.columns:
-                            df_export = df_export.drop(columns=["DataHora"]).rename(columns={"DataHora_str": "DataHora"})
-                        else:
-                            df_export["DataHora"] = df_export["DataHora"].dt.strftime("%Y/%m/%d %H:%M:%S")
-                        df_export.to_excel(buf, index=False)
-                        st.download_button(f"Baixar {faixa['nome']}.xlsx", buf.getvalue(), f"{faixa['nome']}.xlsx", type="primary")
-                    except:
-                        st.error(f"Erro na faixa {faixa['nome']}: Formato de data inválido.")
+                formato = "zip" if formato_faixas.startswith("ZIP") else "xlsx"
+                conteudo, avisos = exportar_faixas(st.session_state['dados_consolidados'], st.session_state['faixas'], formato)
+                for aviso in avisos:
+                    st.warning(aviso)
+                st.session_state['exportacao_faixas'] = (formato, conteudo) if conteudo is not None else None
+            if st.session_state.get('exportacao_faixas'):
+                formato, conteudo = st.session_state['exportacao_faixas']
+                tipo = "application/zip" if formato == "zip" else TIPOS_MIME["xlsx"]
+                st.download_button(f"Baixar faixas.{formato}", conteudo, f"faixas.{formato}", tipo, type="primary")
+    marcar("faixas")
 
     with col_right:
         if not st.session_state['dados_consolidados'].empty:
             # Dados do arquivo
             with st.container():
                 st.markdown("### Dados do Arquivo")
-                df = st.session_state['dados_filtrados'] if not st.session_state['dados_filtrados'].empty else st.session_state['dados_consolidados']
-                df_display = df.copy()
-                if "DataHora_str" in df_display.columns:
-                    df_display = df_display.drop(columns=["DataHora"]).rename(columns={"DataHora_str": "DataHora"})
-                else:
-                    df_display["DataHora"] = df_display["DataHora"].dt.strftime("%Y/%m/%d %H:%M:%S")
-                st.markdown('<div class="data-table">', unsafe_allow_html=True)
-                st.dataframe(df_display, use_container_width=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-                estatisticas = mostrar_estatisticas(df, modo, st.session_state['pontos_filtrados'], st.session_state['pontos_marcados'])
+                df = st.session_state['dados_consolidados']
+                recorte = st.session_state['recorte_filtrado']
+                if recorte is not None and not len(recorte["posicoes"]):
+                    recorte = None  # filtros sem nenhuma linha: mostra o conjunto completo
+                # só a página visível é lida do conjunto, formatada e enviada ao navegador
+                mostrar_tabela_dados(df, cache_do_conjunto(df), recorte)
+                marcar("tabela")
+                fonte = st.session_state.get('fonte_incremental') if recorte is None else None
+                estatisticas = mostrar_estatisticas(df, modo, st.session_state['pontos_filtrados'], st.session_state['pontos_marcados'],
+                                                   fonte["resumo"] if fonte else None, impressao_dados(df, modo, recorte=recorte), recorte)
+                if modo == "ENERGIA":
+                    mostrar_energia(df, modo, cache_do_conjunto(df), recorte=recorte)
+                marcar("estatisticas")
+
+            eventos = excursoes_conjunto(df, st.session_state['regras_excursao'], cache_do_conjunto(df), recorte)
+            # o gráfico precisa de todas as linhas do recorte, mas só das colunas das séries; a cópia vale só para esta execução
+            dados_grafico = recorte_filtrado(df, recorte, ["DataHora", *colunas_series(df, modo)])
 
             # Gráfico
             with st.container():
                 st.markdown("### Gráfico")
+                st.session_state['janela_grafico'] = seletor_janela(dados_grafico)
                 if st.session_state['grafico_atual'] is not None:
                     fig = st.session_state['grafico_atual']
+                    chave_fig = st.session_state.get('chave_grafico_atual')
                 else:
-                    title = "Gráfico de Dados" if st.session_state['dados_filtrados'].empty else f"Gráfico da Faixa: {df['DataHora'].min().strftime('%Y/%m/%d %H:%M:%S')} a {df['DataHora'].max().strftime('%Y/%m/%d %H:%M:%S')}"
-                    fig = gerar_grafico(df, modo, st.session_state['filtro_ativo'], st.session_state['filtro_valor_min'], st.session_state['filtro_valor_max'], st.session_state['filtro_valor_tipo'], st.session_state['escala_y_min'], st.session_state['escala_y_max'], title, st.session_state['pontos_marcados'], st.session_state['pontos_filtrados'])
+                    title = "Gráfico de Dados" if recorte is None else f"Gráfico da Faixa: {dados_grafico['DataHora'].min().strftime('%Y/%m/%d %H:%M:%S')} a {dados_grafico['DataHora'].max().strftime('%Y/%m/%d %H:%M:%S')}"
+                    fig = gerar_grafico(
+                        dados_grafico, modo, st.session_state['filtro_ativo'],
+                        st.session_state['filtro_valor_min'], st.session_state['filtro_valor_max'],
+                        st.session_state['filtro_valor_tipo'], st.session_state['escala_y_min'],
+                        st.session_state['escala_y_max'], title,
+                        st.session_state['pontos_marcados'], st.session_state['pontos_filtrados'],
+                        st.session_state['janela_grafico'], st.session_state['max_pontos_grafico'], fonte["buffers"] if fonte else None,
+                        piramide_dados(df, modo) if recorte is None else None
+                    )
+                    fig = adicionar_excursoes(fig, eventos, st.session_state['janela_grafico'])
+                    chave_fig = chave_grafico(
+                        identidade_dados(dados_grafico), modo, title, estado_filtros(st.session_state['filtros']),
+                        st.session_state['escala_y_min'], st.session_state['escala_y_max'],
+                        st.session_state['pontos_marcados'].to_numpy().tolist(), st.session_state['janela_grafico'],
+                        st.session_state['max_pontos_grafico'], st.session_state['regras_excursao'], fonte["assinatura"] if fonte else None
+                    )
                 st.plotly_chart(fig, use_container_width=True)
+                if depuracao_ativa():
+                    registrar_tamanho("gráfico (dados das séries)", tamanho_objeto(fig))
+                marcar("grafico")
+                with slot_grafico.container():
+                    mostrar_exportacao_grafico(fig, chave_fig)
+                if depuracao_ativa() and not tamanho_registrado("gráfico (JSON)"):
+                    registrar_tamanho("gráfico (JSON)", len(fig.to_json()))
+                marcar("exportacao png")
 
-                # Verificar exportação de gráfico
-                try:
-                    buf = BytesIO()
-                    fig.write_image(buf, format="png")
-                    st.session_state['grafico_exportavel'] = True
-                except Exception as e:
-                    st.session_state['grafico_exportavel'] = False
-                    st.warning("Exportação de gráfico PNG não disponível devido a limitações do ambiente.")
+            # Excursões: um intervalo por período fora dos limites, em vez de um ponto por linha
+            if st.session_state['regras_excursao']:
+                with st.container():
+                    st.markdown("### Excursões")
+                    if eventos.empty:
+                        st.write("Nenhuma excursão encontrada.")
+                    else:
+                        resumo_tipos = eventos.groupby("Tipo")["Duração"].agg(["count", "sum"])
+                        st.write(" | ".join(f"**{tipo.capitalize()} do limite:** {int(r['count'])} eventos, {r['sum']}" for tipo, r in resumo_tipos.iterrows()))
+                        if len(eventos) > MAX_EXCURSOES_GRAFICO:
+                            st.caption(f"O gráfico sombreia as {MAX_EXCURSOES_GRAFICO} excursões mais longas.")
+                        tabela = tabela_excursoes(eventos)
+                        st.dataframe(tabela, use_container_width=True, hide_index=True)
+                        st.download_button("Baixar Excursões (CSV)", tabela.to_csv(index=False).encode("utf-8"), "excursoes.csv", "text/csv", key="baixar_excursoes")
+                marcar("excursoes")
 
     # Configuração de filtros (mostrado ao clicar no botão)
     if st.session_state.get('mostrar_filtros', False):
@@ -526,32 +3115,14 @@ def main():
                             if hora > 23 or minuto > 59:
                                 st.error("Hora inválida.")
                             else:
-                                df = st.session_state['dados_filtrados'] if not st.session_state['dados_filtrados'].empty else st.session_state['dados_consolidados']
-                                mask = (df["DataHora"].dt.hour == hora) & (df["DataHora"].dt.minute == minuto)
-                                st.session_state['dados_filtrados'] = df[mask]
-                                st.session_state['filtro_ativo'] = "hora"
-                                st.session_state['pontos_filtrados'] = []
-                                main_column = "Potência" if modo == "ENERGIA" else "Temperatura"
-                                for _, row in st.session_state['dados_filtrados'].iterrows():
-                                    x = row["DataHora"]
-                                    y = row[main_column]
-                                    st.session_state['pontos_filtrados'].append((None, x, y, main_column))
-                                    if modo == "DATALOGGER" and "Umidade" in row:
-                                        y_umidade = row["Umidade"]
-                                        if not pd.isna(y_umidade):
-                                            st.session_state['pontos_filtrados'].append((None, x, y_umidade, "Umidade"))
-                                    if modo in ["SITRAD", "ENERGIA"]:
-                                        for col in [c for c in df.columns if (c.startswith("Dados_Extra") or c.startswith("Potência_Trafo")) and pd.api.types.is_numeric_dtype(df[c])]:
-                                            y_extra = row[col]
-                                            if not pd.isna(y_extra):
-                                                st.session_state['pontos_filtrados'].append((None, x, y_extra, col))
+                                st.session_state['filtros'] = adicionar_filtro(st.session_state['filtros'], {"tipo": "hora", "hora": filtro_hora})
                                 st.session_state['grafico_atual'] = None
-                                st.success("Filtro de hora aplicado.")
-                        except:
+                                st.rerun()
+                        except ValueError:
                             st.error("Formato inválido. Use HH:MM.")
             with col_f2:
                 st.write("**Filtro de Valor**")
-                df = st.session_state['dados_filtrados'] if not st.session_state['dados_filtrados'].empty else st.session_state['dados_consolidados']
+                df = st.session_state['dados_consolidados']
                 columns = atualizar_menu_tipo_valor(modo, df)
                 filtro_valor_tipo = st.selectbox("Tipo de Valor", columns)
                 filtro_valor_min = st.number_input("Valor Mínimo", value=0.0, step=0.1)
@@ -560,15 +3131,93 @@ def main():
                     if filtro_valor_min > filtro_valor_max:
                         st.error("Mínimo deve ser menor que máximo.")
                     else:
-                        mask = (df[filtro_valor_tipo] >= filtro_valor_min) & (df[filtro_valor_tipo] <= filtro_valor_max) & (~df[filtro_valor_tipo].isna())
-                        st.session_state['dados_filtrados'] = df[mask]
-                        st.session_state['filtro_ativo'] = "valor"
-                        st.session_state['filtro_valor_min'] = filtro_valor_min
-                        st.session_state['filtro_valor_max'] = filtro_valor_max
-                        st.session_state['filtro_valor_tipo'] = filtro_valor_tipo
-                        st.session_state['pontos_filtrados'] = [(None, row["DataHora"], row[filtro_valor_tipo], filtro_valor_tipo) for _, row in st.session_state['dados_filtrados'].iterrows()]
+                        filtro = {"tipo": "valor", "coluna": filtro_valor_tipo, "min": filtro_valor_min, "max": filtro_valor_max}
+                        st.session_state['filtros'] = adicionar_filtro(st.session_state['filtros'], filtro)
                         st.session_state['grafico_atual'] = None
-                        st.success("Filtro de valor aplicado.")
+                        st.rerun()
+            col_f3, col_f4, col_f5 = st.columns(3)
+            with col_f3:
+                st.write("**Filtro de Período**")
+                periodo_inicio = st.text_input("Início (YYYY/MM/DD HH:MM:SS)", "")
+                periodo_fim = st.text_input("Fim (YYYY/MM/DD HH:MM:SS)", "")
+                if st.button("Aplicar Filtro de Período", key="filtro_periodo", type="primary"):
+                    try:
+                        inicio, fim = intervalo_faixa({"inicio": periodo_inicio, "fim": periodo_fim})
+                        if inicio > fim:
+                            st.error("Início deve ser anterior ao fim.")
+                        else:
+                            st.session_state['filtros'] = adicionar_filtro(st.session_state['filtros'], {"tipo": "intervalo", "inicio": periodo_inicio, "fim": periodo_fim})
+                            st.session_state['grafico_atual'] = None
+                            st.rerun()
+                    except ValueError:
+                        st.error("Formato de data inválido.")
+            with col_f4:
+                st.write("**Dias da Semana**")
+                dias = st.multiselect("Dias", DIAS_SEMANA, default=DIAS_SEMANA[:5])
+                if st.button("Aplicar Filtro de Dias", key="filtro_dias", type="primary"):
+                    if not dias:
+                        st.error("Selecione ao menos um dia.")
+                    else:
+                        st.session_state['filtros'] = adicionar_filtro(st.session_state['filtros'], {"tipo": "dia_semana", "dias": sorted(DIAS_SEMANA.index(d) for d in dias)})
+                        st.session_state['grafico_atual'] = None
+                        st.rerun()
+            with col_f5:
+                st.write("**Valores Ausentes**")
+                colunas_nan = st.multiselect("Colunas", columns, default=columns[:1])
+                manter = st.radio("Manter", ["Somente válidos", "Somente ausentes"], horizontal=True)
+                if st.button("Aplicar Filtro de Ausentes", key="filtro_nan", type="primary"):
+                    if not colunas_nan:
+                        st.error("Selecione ao menos uma coluna.")
+                    else:
+                        filtro = {"tipo": "nan", "colunas": colunas_nan, "manter": "validos" if manter == "Somente válidos" else "ausentes"}
+                        st.session_state['filtros'] = adicionar_filtro(st.session_state['filtros'], filtro)
+                        st.session_state['grafico_atual'] = None
+                        st.rerun()
+            if st.session_state['filtros']:
+                st.write("**Filtros Ativos**")
+                for i, filtro in enumerate(st.session_state['filtros']):
+                    col_d, col_r = st.columns([5, 1])
+                    with col_d:
+                        st.write(descricao_filtro(filtro))
+                    with col_r:
+                        if st.button("Remover", key=f"remover_filtro_{i}"):
+                            st.session_state['filtros'] = st.session_state['filtros'][:i] + st.session_state['filtros'][i + 1:]
+                            st.session_state['grafico_atual'] = None
+                            st.rerun()
+                st.caption(f"{linhas_recorte(df, st.session_state['recorte_filtrado'])} de {len(df)} linhas selecionadas.")
+            st.write("**Excursões (Limites)**")
+            col_e1, col_e2, col_e3, col_e4, col_e5 = st.columns(5)
+            with col_e1:
+                serie_excursao = st.selectbox("Série", columns, key="serie_excursao")
+            with col_e2:
+                limite_inferior = st.number_input("Limite Inferior", value=None, step=0.1, key="limite_inferior_excursao")
+            with col_e3:
+                limite_superior = st.number_input("Limite Superior", value=None, step=0.1, key="limite_superior_excursao")
+            with col_e4:
+                duracao_minima = st.number_input("Duração Mínima (min)", min_value=0.0, value=0.0, step=1.0, key="duracao_excursao")
+            with col_e5:
+                histerese = st.number_input("Histerese", min_value=0.0, value=0.0, step=0.1, key="histerese_excursao",
+                                            help="A excursão só termina quando o valor volta ao limite com esta margem.")
+            if st.button("Detectar Excursões", key="detectar_excursoes", type="primary"):
+                if limite_inferior is None and limite_superior is None:
+                    st.error("Informe ao menos um limite.")
+                elif limite_inferior is not None and limite_superior is not None and limite_inferior >= limite_superior:
+                    st.error("Limite inferior deve ser menor que o superior.")
+                else:
+                    regra = {"coluna": serie_excursao, "min": limite_inferior, "max": limite_superior,
+                             "duracao_minima": duracao_minima, "histerese": histerese}
+                    st.session_state['regras_excursao'] = adicionar_regra_excursao(st.session_state['regras_excursao'], regra)
+                    st.session_state['grafico_atual'] = None
+                    st.rerun()
+            for i, regra in enumerate(st.session_state['regras_excursao']):
+                col_d, col_r = st.columns([5, 1])
+                with col_d:
+                    st.write(descricao_regra_excursao(regra))
+                with col_r:
+                    if st.button("Remover", key=f"remover_excursao_{i}"):
+                        st.session_state['regras_excursao'] = st.session_state['regras_excursao'][:i] + st.session_state['regras_excursao'][i + 1:]
+                        st.session_state['grafico_atual'] = None
+                        st.rerun()
             col_s1, col_s2 = st.columns(2)
             with col_s1:
                 st.write("**Escala Y**")
@@ -583,6 +3232,12 @@ def main():
                     st.session_state['escala_y_max'] = escala_y_max
                     st.session_state['grafico_atual'] = None
                     st.success("Escala Y aplicada.")
+            st.write("**Detalhe do Gráfico**")
+            max_pontos = st.number_input("Máximo de Pontos por Série", min_value=500, value=int(st.session_state['max_pontos_grafico']), step=500)
+            if st.button("Aplicar Detalhe", key="max_pontos", type="primary"):
+                st.session_state['max_pontos_grafico'] = int(max_pontos)
+                st.session_state['grafico_atual'] = None
+                st.success("Detalhe do gráfico aplicado.")
             with st.container():
                 st.write("**Marcar Ponto Manualmente**")
                 col_p1, col_p2, col_p3 = st.columns(3)
@@ -595,7 +3250,7 @@ def main():
                 if st.button("Marcar Ponto", key="marcar_ponto", type="primary"):
                     try:
                         x = pd.to_datetime(data_ponto)
-                        st.session_state['pontos_marcados'].append((None, None, x, valor_ponto, tipo_ponto))
+                        st.session_state['pontos_marcados'] = adicionar_ponto(st.session_state['pontos_marcados'], x, valor_ponto, tipo_ponto)
                         st.session_state['grafico_atual'] = None
                         st.success("Ponto marcado!")
                     except:
@@ -608,6 +3263,17 @@ def main():
                 carregar_configuracoes(config_file)
                 st.session_state['grafico_atual'] = None
 
+    marcar("configuracao de filtros")
+
+    mostrar_comparacao(arquivos_enviados, modo)
+    marcar("comparacao")
+
+    mostrar_memoria()
+    marcar("memoria")
+    registrar_contexto(modo=modo, linhas=len(st.session_state['dados_consolidados']),
+                       linhas_filtradas=linhas_recorte(st.session_state['dados_consolidados'], st.session_state['recorte_filtrado']), cache_conjuntos=estatisticas_conjuntos())
+    if depuracao_ativa():
+        mostrar_desempenho()
     st.markdown('</div>', unsafe_allow_html=True)
 
 if __name__ == "__main__":
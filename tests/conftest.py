@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+
+@pytest.fixture(scope="session")
+def arquivo_sintetico(tmp_path_factory):
+    # mesmos geradores do benchmark, com arquivos reaproveitados entre os testes da sessão
+    diretorio = str(tmp_path_factory.mktemp("sinteticos"))
+    return lambda modo, n, semente=0: benchmark.arquivo_sintetico(diretorio, modo, n, semente)
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+import benchmark
+
+
+def resultado(tempo, pico, etapa="leitura"):
+    return {"modo": "SITRAD", "linhas": 10000, "etapa": etapa, "tempo": tempo, "pico_memoria": pico}
+
+
+def test_regressao_de_tempo_e_memoria_acima_da_tolerancia():
+    referencia = {"resultados": [resultado(1.0, 1000), resultado(0.01, 1000, "filtro_hora")]}
+    atual = {"resultados": [resultado(1.5, 1100), resultado(0.03, 2000, "filtro_hora"), resultado(1.0, 1000, "grafico")]}
+    comparacoes = benchmark.comparar(atual, referencia, tolerancia=0.25)
+    assert [c["etapa"] for c in comparacoes] == ["leitura", "filtro_hora"]  # etapa sem referência é ignorada
+    assert comparacoes[0]["regressao"] == ["tempo"]
+    assert comparacoes[1]["regressao"] == ["memoria"]  # 3x mais lento, mas abaixo do tempo mínimo
+
+
+def test_referencia_ausente_ou_incompativel_e_ignorada(tmp_path):
+    assert benchmark.carregar_referencia(str(tmp_path / "nao_existe.json")) is None
+    antiga = tmp_path / "antiga.json"
+    antiga.write_text(json.dumps({"versao": 0, "resultados": []}))
+    assert benchmark.carregar_referencia(str(antiga)) is None
+
+
+def test_referencia_versionada_cobre_as_etapas_medidas():
+    referencia = benchmark.carregar_referencia(benchmark.REFERENCIA_PADRAO)
+    assert referencia is not None
+    chaves = {benchmark.chave_resultado(r) for r in referencia["resultados"]}
+    assert {m for m, _, _ in chaves} == set(benchmark.MODOS)
+    assert {l for _, l, _ in chaves} == set(benchmark.LINHAS_PADRAO)
+    assert {e for _, _, e in chaves} >= {"leitura", "leitura_cache", "filtro_hora", "filtro_valor", "estatisticas", "grafico", "faixas"}
+
+
+@pytest.mark.parametrize("cpus, codigo", [(None, 1), (999, 0)])
+def test_regressao_so_falha_no_mesmo_ambiente(tmp_path, monkeypatch, cpus, codigo):
+    ambiente = benchmark.ambiente()
+    referencia = tmp_path / "referencia.json"
+    referencia.write_text(json.dumps({"versao": benchmark.VERSAO_RESULTADOS, "ambiente": dict(ambiente, cpus=cpus or ambiente["cpus"]), "resultados": [resultado(1.0, 1000)]}))
+    atual = {"versao": benchmark.VERSAO_RESULTADOS, "ambiente": ambiente, "resultados": [resultado(2.0, 1000)]}
+    monkeypatch.setattr(benchmark, "executar_benchmark", lambda *args: atual)
+    assert benchmark.main(["--saida", str(tmp_path / "saida.json"), "--referencia", str(referencia)]) == codigo
@@ -0,0 +1,24 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+pytest.importorskip("pyarrow")
+
+
+def test_cache_devolve_o_mesmo_conjunto_e_respeita_o_limite(tmp_path, monkeypatch):
+    monkeypatch.setattr(analisador, "CACHE_DIR", str(tmp_path))
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=1000, freq="min"), "Temperatura": np.arange(1000, dtype="float32"), "Aba": pd.Categorical(["A", "B"] * 500)})
+    chave = analisador.chave_cache(b"conteudo", "SITRAD", "A")
+    assert analisador.ler_cache_parquet(chave) is None
+    assert analisador.gravar_cache_parquet(chave, df)
+    pd.testing.assert_frame_equal(analisador.ler_cache_parquet(chave), df)
+    assert chave != analisador.chave_cache(b"conteudo", "SITRAD", "B")
+    outra = analisador.chave_cache(b"outro", "SITRAD", "A")
+    analisador.gravar_cache_parquet(outra, df)
+    os.utime(analisador.caminho_cache(chave), (0, 0))  # mais antigo: sai primeiro
+    analisador.limpar_cache_parquet(os.path.getsize(analisador.caminho_cache(outra)))
+    assert not os.path.exists(analisador.caminho_cache(chave)) and os.path.exists(analisador.caminho_cache(outra))
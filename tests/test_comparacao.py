@@ -0,0 +1,80 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def sensor(inicio, n, passo_s, deslocamento, semente, fuso=None):
+    rng = np.random.default_rng(semente)
+    datas = pd.Timestamp(inicio, tz=fuso) + pd.to_timedelta(np.arange(n) * passo_s + rng.integers(0, 3, n), unit="s")
+    valores = 4 + 3 * np.sin(np.arange(n) * passo_s / 3600) + deslocamento + rng.normal(0, 0.3, n)
+    df = pd.DataFrame({"DataHora": datas, "Temperatura": valores})
+    df.loc[rng.random(n) < 0.03, "Temperatura"] = np.nan
+    return df
+
+
+def series(fuso=None):
+    return {
+        "A": sensor("2024-01-01 00:00:07", 3000, 60, 0.0, 1, fuso),
+        "B": sensor("2024-01-01 00:30:00", 2500, 60, 0.5, 2, fuso),
+        "C": sensor("2024-01-01 10:00:00", 500, 300, -1.0, 3, fuso),
+    }
+
+
+def referencia(dfs, passo, tolerancia):
+    # merge_asof de cada sensor sobre a grade: última leitura válida até o instante, dentro da tolerância
+    locais = {r: df.assign(DataHora=analisador.tempo_local(df["DataHora"])).dropna().sort_values("DataHora") for r, df in dfs.items()}
+    inicio = min(df["DataHora"].iloc[0] for df in locais.values()).floor(passo)
+    fim = max(df["DataHora"].iloc[-1] for df in locais.values())
+    grade = pd.DataFrame({"DataHora": pd.date_range(inicio, fim, freq=passo)})
+    for rotulo, df in locais.items():
+        grade[rotulo] = pd.merge_asof(grade[["DataHora"]], df.rename(columns={"Temperatura": rotulo}), on="DataHora", direction="backward", tolerance=pd.Timedelta(tolerancia))[rotulo]
+    return grade
+
+
+@pytest.mark.parametrize("fuso", [None, analisador.FUSO_ENERGIA])
+@pytest.mark.parametrize("passo, tolerancia", [("1min", "1min"), ("5min", "2min"), ("30s", "10min")])
+def test_alinhamento_igual_ao_merge_asof(fuso, passo, tolerancia):
+    dfs = series(fuso)
+    alinhado = analisador.alinhar_series({r: analisador.serie_temporal(df, "Temperatura") for r, df in dfs.items()}, passo, tolerancia)
+    esperado = referencia(dfs, passo, tolerancia)
+    np.testing.assert_array_equal(alinhado["tempos"], esperado["DataHora"].to_numpy("datetime64[ns]"))
+    np.testing.assert_array_equal(alinhado["matriz"], esperado[list(dfs)].to_numpy("float32").T)
+
+
+def test_passo_automatico_e_o_da_serie_mais_espacada():
+    dfs = series()
+    alinhado = analisador.alinhar_series({r: analisador.serie_temporal(df, "Temperatura") for r, df in dfs.items()})
+    assert alinhado["passo"] == alinhado["tolerancia"] == pd.Timedelta("5min")
+
+
+def test_diferencas_e_correlacoes_iguais_ao_pandas():
+    dfs = series()
+    alinhado = analisador.alinhar_series({r: analisador.serie_temporal(df, "Temperatura") for r, df in dfs.items()}, "1min", "1min")
+    tabela = pd.DataFrame(alinhado["matriz"].T.astype("float64"), columns=alinhado["rotulos"])
+    esperado = tabela.corr(min_periods=analisador.MIN_AMOSTRAS_CORRELACAO)
+    pd.testing.assert_frame_equal(analisador.correlacoes_series(alinhado), esperado, rtol=1e-5)
+    diferencas = analisador.diferencas_series(alinhado, "A")
+    for _, linha in diferencas.iterrows():
+        d = (tabela[linha["Série"]] - tabela["A"]).dropna()
+        assert linha["Amostras Comuns"] == len(d)
+        assert linha["Diferença Média"] == pytest.approx(d.mean(), rel=1e-5)
+        assert linha["Diferença Absoluta Média"] == pytest.approx(d.abs().mean(), rel=1e-5)
+        assert (linha["Diferença Mínima"], linha["Diferença Máxima"]) == pytest.approx((d.min(), d.max()), rel=1e-5)
+        assert linha["Desvio Padrão"] == pytest.approx(d.std(ddof=0), rel=1e-5)
+
+
+def test_correlacao_exige_amostras_minimas():
+    tempos = np.arange(5, dtype="int64") * 60 * 10**9
+    alinhado = analisador.alinhar_series({"A": (tempos, np.arange(5.0)), "B": (tempos, np.arange(5.0) ** 2)})
+    assert analisador.correlacoes_series(alinhado).isna().all().all()
+
+
+def test_resumo_do_datalogger_nao_e_fonte():
+    buf = BytesIO()
+    analisador.escrever_xlsx(buf, [("Resumo", pd.DataFrame({"Campo": ["Modelo"]})), ("Dados", pd.DataFrame({"Nº": [1]})), ("Dados_2", pd.DataFrame({"Nº": [2]}))])
+    buf.name = "logger.xlsx"
+    assert list(analisador.fontes_comparacao([buf], "DATALOGGER")) == ["Dados", "Dados_2"]
@@ -0,0 +1,50 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import temperature_analyzer_web as analisador
+
+
+def novos_conjuntos(limite, validade=3600):
+    return {"itens": OrderedDict(), "bytes": 0, "limite": limite, "validade": validade, "contadores": {"acertos": 0, "falhas": 0, "compartilhadas": 0, "despejos": 0, "expirados": 0}}
+
+
+def test_impressao_de_arquivo_pequeno_cobre_todo_o_conteudo():
+    dados = bytes(range(256)) * 100
+    alterado = bytearray(dados)
+    alterado[12345] ^= 1
+    assert analisador.impressao_digital(dados) == f"{len(dados)}:{hashlib.blake2b(dados, digest_size=16).hexdigest()}"
+    assert analisador.impressao_digital(dados) != analisador.impressao_digital(bytes(alterado))
+
+
+def test_impressao_de_arquivo_grande_amostra_inicio_meio_e_fim():
+    rng = np.random.default_rng(29)
+    dados = rng.integers(0, 256, 8 * 1024 * 1024, dtype=np.uint8).tobytes()
+    impressao = analisador.impressao_digital(dados)
+    passo = (len(dados) - analisador.BYTES_BLOCO_IMPRESSAO) // (analisador.BLOCOS_IMPRESSAO - 1)
+    for posicao in (0, 7 * passo + 10, len(dados) - 1):
+        alterado = bytearray(dados)
+        alterado[posicao] ^= 1
+        assert analisador.impressao_digital(bytes(alterado)) != impressao
+    assert analisador.impressao_digital(dados + b"x") != impressao  # tamanho faz parte da impressão
+    assert analisador.impressao_digital(memoryview(dados)) == impressao
+
+
+def test_cache_despeja_o_menos_usado_por_bytes_e_expira_por_validade(monkeypatch):
+    conjunto = pd.DataFrame({"a": np.zeros(1000)})
+    tamanho = analisador.tamanho_objeto(conjunto)
+    conjuntos = novos_conjuntos(limite=int(2.5 * tamanho), validade=60)
+    agora = [1000.0]
+    monkeypatch.setattr(analisador.time, "time", lambda: agora[0])
+    for chave in "abc":
+        analisador.guardar_conjunto(conjuntos, chave, conjunto.copy())
+        agora[0] += 1
+    assert list(conjuntos["itens"]) == ["b", "c"] and conjuntos["contadores"]["despejos"] == 1
+    assert analisador.buscar_conjunto(conjuntos, "b") is not None  # "b" passa a ser o mais recente
+    analisador.guardar_conjunto(conjuntos, "d", conjunto.copy())
+    assert list(conjuntos["itens"]) == ["b", "d"] and conjuntos["bytes"] == 2 * tamanho
+    agora[0] += 61
+    assert analisador.buscar_conjunto(conjuntos, "d") is None
+    assert conjuntos["bytes"] == 0 and conjuntos["contadores"]["expirados"] == 2
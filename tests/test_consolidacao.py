@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+import temperature_analyzer_web as analisador
+
+
+def conjunto(inicio, n, freq, abas, extras=0, semente=0):
+    rng = np.random.default_rng(semente)
+    df = pd.DataFrame({"DataHora": pd.date_range(inicio, periods=n, freq=freq), "Temperatura": rng.normal(4, 2, n).round(1), "Aba": rng.choice(abas, n)})
+    for i in range(extras):
+        df[f"Dados_Extra{i + 1}"] = rng.normal(10, 1, n)
+    df.loc[rng.random(n) < 0.01, "DataHora"] = pd.NaT
+    df = analisador.indexar_tempo(df)
+    df.attrs["chave"] = f"{inicio}-{semente}"
+    return df
+
+
+def referencia(conjuntos):
+    # concatenação, ordenação estável por data e remoção de (DataHora, Aba) repetidos, mantendo o primeiro arquivo
+    todos = pd.concat(conjuntos, ignore_index=True)
+    validos = todos[todos["DataHora"].notna()].sort_values("DataHora", kind="stable")
+    validos = validos[~validos.duplicated(["DataHora", "Aba"], keep="first")]
+    return pd.concat([validos, todos[todos["DataHora"].isna()]], ignore_index=True)
+
+
+def test_mescla_igual_a_concatenar_ordenar_e_deduplicar():
+    # arquivos sobrepostos no tempo, com leituras repetidas entre eles e colunas diferentes
+    conjuntos = [
+        conjunto("2024-01-01 00:00", 3000, "min", ["A", "B"], extras=1, semente=1),
+        conjunto("2024-01-02 00:00", 3000, "min", ["A", "B"], semente=2),
+        conjunto("2024-01-01 12:00", 2000, "2min", ["B", "C"], extras=2, semente=3),
+    ]
+    conjuntos.append(conjuntos[1].iloc[100:400].copy())
+    resultado = analisador.consolidar_conjuntos(conjuntos)
+    esperado = referencia(conjuntos)
+    pd.testing.assert_frame_equal(resultado[esperado.columns], esperado, check_dtype=False)
+    info = resultado.attrs["consolidacao"]
+    assert info["arquivos"] == 4 and info["linhas"] - info["duplicadas"] == len(resultado)
+    assert resultado.attrs["chave"] != analisador.consolidar_conjuntos(conjuntos[::-1]).attrs["chave"]
+
+
+def test_abas_categoricas_continuam_categoricas():
+    conjuntos = [conjunto("2024-01-01", 500, "s", ["ENERGIA"], semente=s) for s in range(3)]
+    for df in conjuntos:
+        df["Aba"] = df["Aba"].astype("category")
+    resultado = analisador.consolidar_conjuntos(conjuntos)
+    assert isinstance(resultado["Aba"].dtype, pd.CategoricalDtype)
+    esperado = referencia([df.assign(Aba=df["Aba"].astype(object)) for df in conjuntos])
+    pd.testing.assert_frame_equal(resultado.assign(Aba=resultado["Aba"].astype(object)), esperado, check_dtype=False)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=6000, passo="20s"):
+    rng = np.random.default_rng(23)
+    datas = pd.Series(pd.date_range("2024-03-09 18:00", periods=n, freq=passo, tz=analisador.FUSO_ENERGIA))
+    datas.iloc[3000:] += pd.Timedelta(minutes=11)  # lacuna maior que a máxima: não é integrada
+    df = pd.DataFrame({"DataHora": datas, "Potência": rng.uniform(20000, 60000, n), "Potência_Trafo2": rng.uniform(5000, 9000, n), "Aba": "ENERGIA"})
+    df.loc[rng.random(n) < 0.01, "Potência_Trafo2"] = np.nan
+    return analisador.indexar_tempo(df)
+
+
+def referencia(df, col, periodo):
+    # intervalo a intervalo: trapézio entre leituras consecutivas, atribuído ao período e à janela do seu início
+    local = df["DataHora"].dt.tz_localize(None)
+    inicio, fim = df["DataHora"].iloc[:-1].reset_index(drop=True), df["DataHora"].iloc[1:].reset_index(drop=True)
+    dt = (fim - inicio).dt.total_seconds()
+    valores = df[col].to_numpy()
+    media = pd.Series((valores[:-1] + valores[1:]) / 2)
+    integrar = (dt > 0) & (dt <= analisador.LACUNA_MAXIMA_ENERGIA.total_seconds()) & media.notna()
+    intervalos = pd.DataFrame({"local": local.iloc[:-1].reset_index(drop=True), "dt": dt, "wh": (media * dt / 3600).where(integrar, 0.0), "segundos": dt.where(integrar, 0.0)})
+    intervalos["periodo"] = intervalos["local"].dt.strftime("%Y/%m/%d") if periodo == "Dia" else "Total"
+    intervalos["janela"] = intervalos["local"].dt.floor(analisador.JANELA_DEMANDA)
+    janelas = intervalos.groupby(["periodo", "janela"])["wh"].sum() / 1000 / (analisador.JANELA_DEMANDA.total_seconds() / 3600)
+    # demanda móvel: média dos intervalos que começam nos últimos 15 minutos de cada leitura, com cobertura mínima
+    utc, wh, segundos = df["DataHora"].to_numpy(), intervalos["wh"].to_numpy(), intervalos["segundos"].to_numpy()
+    movel = []
+    for k in range(1, len(df)):
+        s = np.searchsorted(utc, utc[k] - analisador.JANELA_DEMANDA.to_timedelta64())
+        coberto = segundos[s:k].sum()
+        suficiente = coberto >= analisador.COBERTURA_MINIMA_JANELA * analisador.JANELA_DEMANDA.total_seconds()
+        movel.append(wh[s:k].sum() * 3.6 / analisador.JANELA_DEMANDA.total_seconds() if suficiente else np.nan)
+    intervalos["movel"] = movel
+    linhas = []
+    for rotulo, grupo in intervalos.groupby("periodo", sort=True):
+        demanda = janelas.loc[rotulo]
+        horas = grupo["segundos"].sum() / 3600
+        kwh = grupo["wh"].sum() / 1000
+        linhas.append({"Período": rotulo, "Série": col, "Energia (kWh)": kwh, "Demanda Máxima (kW)": demanda.max(), "Janela da Demanda": demanda.idxmax(), "Demanda Móvel Máxima (kW)": grupo["movel"].max(), "Potência Média (kW)": kwh / horas, "Fator de Carga": kwh / horas / demanda.max(), "Horas com Dados": horas, "Horas sem Dados": grupo["dt"].sum() / 3600 - horas})
+    return pd.DataFrame(linhas, columns=analisador.COLUNAS_ENERGIA)
+
+
+@pytest.mark.parametrize("periodo", ["Dia", "Total"])
+def test_energia_igual_ao_calculo_intervalo_a_intervalo(periodo):
+    df = dados()
+    colunas = ["Potência", "Potência_Trafo2"]
+    resultado = analisador.calcular_energia(df, colunas, periodo)
+    esperado = pd.concat([referencia(df, col, periodo) for col in colunas], ignore_index=True)
+    assert len(esperado) == (3 * 2 if periodo == "Dia" else 2)
+    pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False, rtol=1e-9)
+
+
+def test_potencia_constante():
+    # 1 kW por 24 h de leituras a cada minuto, sem lacunas: 23,98 kWh (último intervalo termina na última leitura)
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=1440, freq="min"), "Potência": 1000.0, "Aba": "ENERGIA"})
+    r = analisador.calcular_energia(analisador.indexar_tempo(df), ["Potência"], "Total").iloc[0]
+    assert r["Energia (kWh)"] == pytest.approx(1439 / 60)
+    assert r["Demanda Máxima (kW)"] == pytest.approx(1.0) and r["Demanda Móvel Máxima (kW)"] == pytest.approx(1.0)
+    assert r["Fator de Carga"] == pytest.approx(1.0) and r["Horas sem Dados"] == 0
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=1000):
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=n, freq="min"), "Temperatura": rng.normal(4, 2, n), "Umidade": rng.uniform(30, 90, n), "Aba": "A"})
+    df.loc[rng.random(n) < 0.05, "Temperatura"] = np.nan
+    df.attrs["chave"] = "dados"
+    return df
+
+
+def referencia(serie):
+    s = serie.dropna()
+    return {"total": len(serie), "validos": len(s), "min": s.min(), "max": s.max(), "soma": s.sum(), "desvio": s.std(), **{f"p{p}": s.quantile(p / 100) for p in analisador.PERCENTIS}}
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 7, 1000])
+def test_estatisticas_iguais_ao_pandas(n):
+    df = dados(1000).iloc[:n]
+    resumo = analisador.calcular_estatisticas(df, ["Temperatura", "Umidade"])
+    for col in ["Temperatura", "Umidade"]:
+        esperado = referencia(df[col])
+        assert resumo[col].keys() == esperado.keys()
+        for k, v in esperado.items():
+            assert resumo[col][k] == pytest.approx(v, nan_ok=True), (col, k)
+
+
+def test_serie_sem_valores_validos():
+    df = dados(50).assign(Temperatura=np.nan)
+    r = analisador.calcular_estatisticas(df, ["Temperatura"])["Temperatura"]
+    assert r["validos"] == 0 and r["soma"] == 0.0 and np.isnan(r["min"]) and np.isnan(r["p50"])
+
+
+def test_filtros_diferentes_do_mesmo_tamanho_nao_compartilham_estatisticas():
+    # os dois recortes têm o mesmo tamanho e as mesmas pontas, mas linhas diferentes no meio
+    df = dados()
+    df["Temperatura"] = df["Temperatura"].fillna(4.0)
+    df.loc[100:199, "Umidade"] = np.nan
+    df.loc[500:599, "Temperatura"] = 1000.0
+    sem_nan, _ = analisador.aplicar_filtros(df, "DATALOGGER", [{"tipo": "nan", "colunas": ["Umidade"], "manter": "validos"}])
+    por_valor, _ = analisador.aplicar_filtros(df, "DATALOGGER", [{"tipo": "valor", "coluna": "Temperatura", "min": -100.0, "max": 100.0}])
+    assert len(sem_nan) == len(por_valor) and (sem_nan.index[[0, -1]] == por_valor.index[[0, -1]]).all()
+    impressoes = [analisador.impressao_dados(recorte, "DATALOGGER") for recorte in (sem_nan, por_valor)]
+    assert impressoes[0] != impressoes[1]
+    for recorte, impressao in zip((sem_nan, por_valor), impressoes):
+        resumo = analisador.obter_estatisticas(recorte, ["Temperatura", "Umidade"], impressao)
+        assert resumo["Temperatura"]["max"] == recorte["Temperatura"].max()
+        assert resumo["Umidade"]["validos"] == recorte["Umidade"].count()
+
+
+def test_mesmo_filtro_tem_a_mesma_impressao():
+    df = dados()
+    filtros = [{"tipo": "dia_semana", "dias": [0, 1]}]
+    a, _ = analisador.aplicar_filtros(df, "DATALOGGER", filtros)
+    b, _ = analisador.aplicar_filtros(df, "DATALOGGER", [dict(f) for f in filtros])
+    assert analisador.impressao_dados(a, "DATALOGGER") == analisador.impressao_dados(b, "DATALOGGER")
+    assert analisador.impressao_dados(a, "SITRAD") != analisador.impressao_dados(a, "DATALOGGER")
+    assert analisador.impressao_dados(df.iloc[:10], "DATALOGGER") != analisador.impressao_dados(df.iloc[1:11], "DATALOGGER")
+
+
+def test_estatisticas_por_posicoes_iguais_as_do_recorte_copiado():
+    df = dados()
+    filtros = [{"tipo": "valor", "coluna": "Umidade", "min": 40.0, "max": 70.0}]
+    recorte = analisador.posicoes_filtradas(df, filtros)
+    copiado, _ = analisador.aplicar_filtros(df, "DATALOGGER", filtros)
+    por_posicoes = analisador.calcular_estatisticas(df, ["Temperatura", "Umidade"], recorte["posicoes"])
+    esperado = analisador.calcular_estatisticas(copiado, ["Temperatura", "Umidade"])
+    assert por_posicoes["DataHora"] == esperado["DataHora"]
+    for col in ["Temperatura", "Umidade"]:
+        assert por_posicoes[col] == pytest.approx(esperado[col], nan_ok=True), col
+    assert analisador.impressao_dados(df, "DATALOGGER", recorte=recorte) == analisador.impressao_dados(copiado, "DATALOGGER")
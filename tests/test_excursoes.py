@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=6000, fuso=None):
+    rng = np.random.default_rng(19)
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=n, freq="min", tz=fuso), "Temperatura": (4 + 3 * np.sin(np.arange(n) / 40) + rng.normal(0, 0.8, n)).round(1), "Aba": np.where(np.arange(n) % 3 == 0, "Câmara 1", "Câmara 2")})
+    df.loc[rng.random(n) < 0.01, "Temperatura"] = np.nan
+    return analisador.indexar_tempo(df)
+
+
+def referencia(df, regra):
+    # laço leitura a leitura: a excursão começa na primeira leitura fora do limite e continua enquanto a leitura
+    # seguinte estiver fora dele (ou, com histerese, dentro da banda limite ± histerese)
+    histerese = float(regra.get("histerese") or 0.0)
+    duracao_minima = pd.Timedelta(minutes=float(regra.get("duracao_minima") or 0))
+    eventos = []
+    for aba, grupo in df.groupby("Aba", sort=False):
+        tempos, valores = grupo["DataHora"].tolist(), grupo[regra["coluna"]].tolist()
+        for tipo, limite in (("acima", regra.get("max")), ("abaixo", regra.get("min"))):
+            if limite is None:
+                continue
+            fora = (lambda v: v > limite) if tipo == "acima" else (lambda v: v < limite)
+            continua = fora if not histerese else (lambda v: v >= limite - histerese) if tipo == "acima" else (lambda v: v <= limite + histerese)
+            i = 0
+            while i < len(valores):
+                if not fora(valores[i]):
+                    i += 1
+                    continue
+                j = i
+                while j + 1 < len(valores) and continua(valores[j + 1]):
+                    j += 1
+                trecho = valores[i:j + 1]
+                if tempos[j] - tempos[i] >= duracao_minima:
+                    eventos.append({"Série": regra["coluna"], "Aba": aba, "Tipo": tipo, "Início": tempos[i], "Fim": tempos[j], "Duração": tempos[j] - tempos[i], "Pico": max(trecho) if tipo == "acima" else min(trecho), "Média": sum(trecho) / len(trecho), "Amostras": len(trecho)})
+                i = j + 1
+    return pd.DataFrame(eventos, columns=analisador.COLUNAS_EXCURSOES)
+
+
+def ordenar(eventos):
+    return eventos.sort_values(["Aba", "Tipo", "Início"], kind="stable", ignore_index=True)
+
+
+@pytest.mark.parametrize("fuso", [None, analisador.FUSO_ENERGIA])
+@pytest.mark.parametrize("regra", [
+    {"coluna": "Temperatura", "min": 1.0, "max": 7.0},
+    {"coluna": "Temperatura", "min": None, "max": 6.0, "duracao_minima": 10},
+    {"coluna": "Temperatura", "min": 2.0, "max": 6.5, "histerese": 0.5},
+    {"coluna": "Temperatura", "min": 0.5, "max": None, "histerese": 1.0, "duracao_minima": 3},
+])
+def test_excursoes_iguais_ao_laco_de_referencia(fuso, regra):
+    df = dados(fuso=fuso)
+    eventos = analisador.detectar_excursoes(df, regra)
+    esperado = referencia(df, regra)
+    assert len(esperado) > 0
+    pd.testing.assert_frame_equal(ordenar(eventos), ordenar(esperado), check_dtype=False)
+
+
+def test_regras_de_varias_series_em_cache():
+    df = dados()
+    df["Umidade"] = np.linspace(20, 95, len(df))
+    df.attrs["chave"] = "dados"
+    cache = analisador.novo_cache_filtros()
+    regras = analisador.adicionar_regra_excursao([{"coluna": "Temperatura", "min": 1.0, "max": 7.0}], {"coluna": "Umidade", "min": None, "max": 90.0})
+    eventos = analisador.excursoes_conjunto(df, regras, cache)
+    assert eventos["Início"].is_monotonic_increasing
+    assert set(eventos["Série"]) == {"Temperatura", "Umidade"}
+    assert len(eventos[eventos["Série"] == "Umidade"]) == 2  # uma excursão por aba
+    assert analisador.excursoes_conjunto(df, regras, cache) is eventos
@@ -0,0 +1,113 @@
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=1200):
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        "DataHora": pd.date_range("2024-01-01", periods=n, freq="min"),
+        "Temperatura": rng.normal(4, 2, n).round(3),
+        "Contagem": np.arange(n),
+        "Alarme": np.arange(n) % 5 == 0,
+        "Aba": np.where(np.arange(n) % 2, "Câmara <1> & \"A\"", "Câmara\x01 2"),
+    })
+    df.loc[3, "Temperatura"] = np.nan
+    df.loc[4, "Temperatura"] = np.inf
+    df.loc[5, "Aba"] = None
+    return analisador.indexar_tempo(df)
+
+
+def linhas_planilha(conteudo, aba=None):
+    wb = openpyxl.load_workbook(BytesIO(conteudo), read_only=True)
+    planilha = wb[aba] if aba else wb.worksheets[0]
+    linhas = list(planilha.iter_rows(values_only=True))
+    wb.close()
+    return linhas
+
+
+def celula(valor):
+    # valor relido de cada célula: ausentes e não finitos ficam vazios e caracteres de controle são removidos
+    if isinstance(valor, str):
+        return valor.replace("\x01", "")
+    if valor is None or (isinstance(valor, float) and not np.isfinite(valor)):
+        return None
+    return valor
+
+
+def esperado(df):
+    export = analisador.preparar_exportacao(df)
+    return [tuple(export.columns)] + [tuple(celula(v) for v in linha) for linha in export.astype(object).itertuples(index=False, name=None)]
+
+
+def test_planilha_igual_aos_dados(monkeypatch):
+    monkeypatch.setattr(analisador, "LINHAS_POR_BLOCO_EXPORTACAO", 500)  # vários blocos por aba
+    df = dados()
+    assert linhas_planilha(analisador.planilha_faixa(df)) == esperado(df)
+
+
+def test_varias_abas_na_mesma_planilha():
+    df = dados()
+    buf = BytesIO()
+    analisador.escrever_xlsx(buf, [("Primeira & <1>", df.iloc[:10]), ("Segunda", df.iloc[10:25])])
+    wb = openpyxl.load_workbook(BytesIO(buf.getvalue()), read_only=True)
+    assert wb.sheetnames == ["Primeira & <1>", "Segunda"]
+    wb.close()
+    assert linhas_planilha(buf.getvalue(), "Segunda") == esperado(df.iloc[10:25])
+
+
+def faixas():
+    return [
+        {"nome": "Manhã", "inicio": "2024/01/01 06:00:00", "fim": "2024/01/01 08:00:00"},
+        {"nome": "Manhã", "inicio": "2024/01/01 09:00:00", "fim": "2024/01/01 09:30:00"},
+        {"nome": "a/b", "inicio": "2024/01/01 10:00:00", "fim": "2024/01/01 10:10:00"},
+        {"nome": "Vazia", "inicio": "2025/01/01 00:00:00", "fim": "2025/01/02 00:00:00"},
+        {"nome": "Inválida", "inicio": "ontem", "fim": "hoje"},
+    ]
+
+
+def test_faixas_em_zip_e_em_planilha_unica():
+    df = dados()
+    fatias = [analisador.fatiar_intervalo(df, *analisador.intervalo_faixa(f)) for f in faixas()[:3]]
+    conteudo, avisos = analisador.exportar_faixas(df, faixas(), "zip", max_workers=2)
+    assert avisos == ["Nenhum dado para a faixa Vazia.", "Erro na faixa Inválida: Formato de data inválido."]
+    with zipfile.ZipFile(BytesIO(conteudo)) as zf:
+        assert zf.namelist() == ["Manhã.xlsx", "Manhã (2).xlsx", "a_b.xlsx"]
+        for nome, fatia in zip(zf.namelist(), fatias):
+            assert linhas_planilha(zf.read(nome)) == esperado(fatia)
+    conteudo, _ = analisador.exportar_faixas(df, faixas(), "xlsx")
+    for nome, fatia in zip(["Manhã", "Manhã (2)", "a_b"], fatias):
+        assert linhas_planilha(conteudo, nome) == esperado(fatia)
+
+
+def test_faixa_acima_do_limite_de_linhas_vira_varias_abas(monkeypatch):
+    monkeypatch.setattr(analisador, "LIMITE_LINHAS_EXCEL", 501)  # 500 linhas de dados por aba
+    df = dados()
+    faixa = [{"nome": "Dia", "inicio": "2024/01/01 00:00:00", "fim": "2024/01/01 23:59:59"}]
+    conteudo, _ = analisador.exportar_faixas(df, faixa, "zip", max_workers=1)
+    with zipfile.ZipFile(BytesIO(conteudo)) as zf:
+        planilha = zf.read("Dia.xlsx")
+    conteudo, _ = analisador.exportar_faixas(df, faixa, "xlsx")
+    for arquivo, base in ((planilha, "Sheet1"), (conteudo, "Dia")):
+        abas = [base, f"{base}_2", f"{base}_3"]
+        wb = openpyxl.load_workbook(BytesIO(arquivo), read_only=True)
+        assert wb.sheetnames == abas
+        wb.close()
+        for aba, inicio in zip(abas, [0, 500, 1000]):
+            assert linhas_planilha(arquivo, aba) == esperado(df.iloc[inicio:inicio + 500])
+
+
+def test_zip_em_paralelo_igual_ao_sequencial():
+    df = dados()
+    paralelo, avisos_paralelo = analisador.exportar_faixas(df, faixas(), "zip", max_workers=2)
+    sequencial, avisos_sequencial = analisador.exportar_faixas(df, faixas(), "zip", max_workers=1)
+    assert avisos_paralelo == avisos_sequencial
+    with zipfile.ZipFile(BytesIO(paralelo)) as zp, zipfile.ZipFile(BytesIO(sequencial)) as zs:
+        assert zp.namelist() == zs.namelist()
+        for nome in zp.namelist():
+            assert linhas_planilha(zp.read(nome)) == linhas_planilha(zs.read(nome))
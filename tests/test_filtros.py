@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=20000):
+    rng = np.random.default_rng(13)
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=n, freq="3min"), "Temperatura": rng.normal(4, 3, n).round(1), "Umidade": rng.uniform(30, 90, n).round(1), "Aba": "Dados"})
+    df.loc[rng.random(n) < 0.03, "Temperatura"] = np.nan
+    df.loc[rng.random(n) < 0.03, "Umidade"] = np.nan
+    df = analisador.indexar_tempo(df)
+    df.attrs["chave"] = "dados"
+    return df
+
+
+FILTROS = {
+    "hora": ({"tipo": "hora", "hora": "08:30"}, lambda df: (df["DataHora"].dt.hour == 8) & (df["DataHora"].dt.minute == 30)),
+    "valor": ({"tipo": "valor", "coluna": "Temperatura", "min": 2.0, "max": 6.5}, lambda df: df["Temperatura"].between(2.0, 6.5)),
+    "intervalo": ({"tipo": "intervalo", "inicio": "2024/01/10 12:00:00", "fim": "2024/01/20 00:00:00"}, lambda df: df["DataHora"].between(pd.Timestamp("2024-01-10 12:00"), pd.Timestamp("2024-01-20"))),
+    "dia_semana": ({"tipo": "dia_semana", "dias": [5, 6]}, lambda df: df["DataHora"].dt.dayofweek >= 5),
+    "nan": ({"tipo": "nan", "colunas": ["Temperatura", "Umidade"], "manter": "validos"}, lambda df: df["Temperatura"].notna() & df["Umidade"].notna()),
+    "somente_nan": ({"tipo": "nan", "colunas": ["Umidade"], "manter": "ausentes"}, lambda df: df["Umidade"].isna()),
+}
+
+
+@pytest.mark.parametrize("nome", FILTROS)
+def test_cada_filtro_igual_a_mascara_do_pandas(nome):
+    df = dados()
+    filtro, referencia = FILTROS[nome]
+    filtrado, _ = analisador.aplicar_filtros(df, "DATALOGGER", [filtro])
+    pd.testing.assert_frame_equal(filtrado, df[referencia(df)])
+
+
+@pytest.mark.parametrize("nomes", [["valor", "dia_semana"], ["intervalo", "nan", "hora"], ["valor", "intervalo", "dia_semana", "nan"]])
+def test_combinacao_e_o_e_das_mascaras(nomes):
+    df = dados()
+    cache = analisador.novo_cache_filtros()
+    esperado = np.logical_and.reduce([FILTROS[n][1](df).to_numpy() for n in nomes])
+    filtrado, pontos = analisador.aplicar_filtros(df, "DATALOGGER", [FILTROS[n][0] for n in nomes], cache)
+    pd.testing.assert_frame_equal(filtrado, df[esperado])
+    assert filtrado.attrs["filtros"] == tuple(analisador.chave_filtro(FILTROS[n][0]) for n in nomes)
+    # mesma combinação de novo: as posições vêm do cache, que não guarda cópias do conjunto, e o original não é alterado
+    recorte = analisador.posicoes_filtradas(df, [FILTROS[n][0] for n in nomes], cache)
+    np.testing.assert_array_equal(recorte["posicoes"], np.flatnonzero(esperado))
+    assert analisador.posicoes_filtradas(df, [FILTROS[n][0] for n in nomes], cache)["posicoes"] is recorte["posicoes"]
+    assert not any(isinstance(valor, pd.DataFrame) for valor, _ in cache["itens"].values())
+    assert "filtros" not in df.attrs
+    if "valor" in nomes:
+        esperados = filtrado[["DataHora", "Temperatura"]].dropna()
+        assert (pontos["Tipo"] == "Temperatura").all() and len(pontos) == len(esperados)
+        np.testing.assert_array_equal(pontos["Valor"].to_numpy(), esperados["Temperatura"].to_numpy())
+
+
+def test_filtro_do_mesmo_alvo_substitui_o_anterior():
+    filtros = analisador.adicionar_filtro([FILTROS["valor"][0], FILTROS["hora"][0]], {"tipo": "valor", "coluna": "Temperatura", "min": 0.0, "max": 1.0})
+    assert [f["tipo"] for f in filtros] == ["hora", "valor"] and filtros[-1]["max"] == 1.0
+    assert len(analisador.adicionar_filtro(filtros, {"tipo": "valor", "coluna": "Umidade", "min": 0.0, "max": 1.0})) == 3
+
+
+def test_filtros_invalidos():
+    df = dados(10)
+    with pytest.raises(ValueError):
+        analisador.aplicar_filtros(df, "DATALOGGER", [{"tipo": "hora", "hora": "25:00"}])
+    with pytest.raises(ValueError):
+        analisador.aplicar_filtros(df, "DATALOGGER", [{"tipo": "valor", "coluna": "Temperatura", "min": 5.0, "max": 1.0}])
@@ -0,0 +1,91 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def csv_energia(n, inicio=0):
+    tempos = pd.Timestamp("2024-01-01", tz=analisador.FUSO_ENERGIA).value // 10**6 + np.arange(inicio, inicio + n) * 1000
+    return pd.DataFrame({"timestamp": tempos, "Potência": np.arange(inicio, inicio + n) * 0.5}).to_csv(index=False, lineterminator="\n").encode("utf-8")
+
+
+def acompanhar(versoes, modo="ENERGIA", estado=None):
+    # simula as leituras periódicas de um arquivo que cresce; cada versão é o conteúdo no momento da leitura
+    for conteudo in versoes:
+        estado = analisador.atualizar_fonte_incremental(conteudo, modo, estado=estado, max_pontos=100)
+    return estado
+
+
+def completo(conteudo, modo="ENERGIA"):
+    return analisador.indexar_tempo(analisador.ler_csv_energia(conteudo)) if modo == "ENERGIA" else analisador.ler_arquivo(conteudo, modo)
+
+
+def test_csv_crescendo_com_cortes_no_meio_da_linha():
+    conteudo = csv_energia(1000)
+    cortes = [40, 41, 300, 301, 5000, 9000, len(conteudo) - 3, len(conteudo)]
+    estado = acompanhar([conteudo[:c] for c in cortes])
+    pd.testing.assert_frame_equal(estado["dados"], completo(conteudo), check_dtype=False)
+    assert estado["resumo"]["Potência"]["validos"] == 1000
+
+
+def test_ultima_linha_sem_quebra_entra_quando_o_arquivo_para_de_crescer():
+    conteudo = csv_energia(500).rstrip(b"\n")
+    estado = acompanhar([conteudo])
+    assert len(estado["dados"]) == 499  # a última linha ainda pode estar sendo escrita
+    estado = acompanhar([conteudo], estado=estado)
+    pd.testing.assert_frame_equal(estado["dados"], completo(conteudo), check_dtype=False)
+    # a linha consumida sem quebra continua a ser escrita: a leitura recomeça e não duplica linhas
+    maior = conteudo + b"5\n" + csv_energia(10, 500).split(b"\n", 1)[1]
+    estado = acompanhar([maior], estado=estado)
+    pd.testing.assert_frame_equal(estado["dados"], completo(maior), check_dtype=False)
+
+
+def test_conteudo_anterior_reescrito_recomeca_a_leitura():
+    conteudo = csv_energia(300)
+    reescrito = csv_energia(300, 1000) + csv_energia(5, 1300).split(b"\n", 1)[1]
+    estado = acompanhar([conteudo, reescrito])
+    pd.testing.assert_frame_equal(estado["dados"], completo(reescrito), check_dtype=False)
+
+
+def planilha(n):
+    buf = BytesIO()
+    analisador.escrever_xlsx(buf, [("Resumo", pd.DataFrame({"Campo": ["Modelo"]})), ("Dados", pd.DataFrame({"Nº": range(n), "Data/Hora": pd.date_range("2024-01-01", periods=n, freq="5min"), "Temperatura": np.arange(n) * 0.1, "Umidade": 50.0}))])
+    return buf.getvalue()
+
+
+def test_planilha_crescendo_converte_so_as_linhas_novas():
+    primeira, segunda = planilha(200), planilha(350)
+    novos, leitura, _ = analisador.ler_incremento(primeira, "DATALOGGER", None, None)
+    assert len(novos) == 200
+    novos, leitura, continua = analisador.ler_incremento(segunda, "DATALOGGER", None, leitura)
+    assert continua and len(novos) == 150 and leitura["linhas"] == {"Dados": 350}
+    estado = acompanhar([primeira, segunda], "DATALOGGER")
+    pd.testing.assert_frame_equal(estado["dados"], completo(segunda, "DATALOGGER"), check_dtype=False)
+
+
+def test_linhas_sem_data_nao_forcam_reordenacao(monkeypatch):
+    # a linha sem data fica no fim do conjunto; as leituras seguintes continuam sendo só anexadas
+    conteudo = csv_energia(100) + b",1.5\n" + csv_energia(100, 100).split(b"\n", 1)[1]
+    primeira = conteudo[:conteudo.index(b"\n,1.5") + 1] + b",1.5\n"
+    lidas, ler_incremento = [], analisador.ler_incremento
+    monkeypatch.setattr(analisador, "ler_incremento", lambda *args: lidas.append(ler_incremento(*args)) or lidas[-1])
+    monkeypatch.setattr(analisador, "resumo_colunas", lambda *args: pytest.fail("reordenou o conjunto inteiro"))
+    estado = acompanhar([primeira, conteudo])
+    assert [(len(novos), continua) for novos, _, continua in lidas] == [(101, False), (100, True)]
+    pd.testing.assert_frame_equal(estado["dados"], completo(conteudo), check_dtype=False)
+    assert estado["dados"]["DataHora"].iloc[-1] is pd.NaT and analisador.posicao_nat(estado["dados"]) == 200
+    assert estado["resumo"]["Potência"]["total"] == 201
+
+
+def test_cada_atualizacao_tem_chave_propria():
+    conteudo = csv_energia(300)
+    estado = acompanhar([conteudo[:2000]])
+    anterior = estado["dados"]
+    estado = acompanhar([conteudo], estado=estado)
+    assert anterior.attrs["chave"] != estado["dados"].attrs["chave"]
+    assert analisador.identidade_dados(anterior) != analisador.identidade_dados(estado["dados"])
+    # arquivo inalterado: mesmo conjunto, mesma chave
+    assert acompanhar([conteudo], estado=estado)["dados"].attrs["chave"] == estado["dados"].attrs["chave"]
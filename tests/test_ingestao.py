@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+class Leitura:
+    # substitui carregar_dados: informa progresso e espera ser liberada, verificando o cancelamento a cada bloco
+    def __init__(self, erro=None):
+        self.chamadas = 0
+        self.liberar = threading.Event()
+        self.erro = erro
+
+    def __call__(self, conteudo, modo, aba=None, progresso=None):
+        self.chamadas += 1
+        progresso(linhas=100, total_linhas=1000, abas=0, total_abas=1)
+        while not self.liberar.wait(0.01):
+            progresso(linhas=100, total_linhas=1000, abas=0, total_abas=1)
+        if self.erro:
+            raise ValueError(self.erro)
+        df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=3, freq="min"), "Potência": [1.0, 2.0, 3.0]})
+        df.attrs["chave"] = f"leitura-{self.chamadas}"
+        return df
+
+
+@pytest.fixture
+def servico(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=2)
+    conjuntos = {"itens": OrderedDict(), "bytes": 0, "limite": 1 << 30, "validade": 3600,
+                 "contadores": {"acertos": 0, "falhas": 0, "compartilhadas": 0, "despejos": 0, "expirados": 0}}
+    servico = {"executor": executor, "tarefas": OrderedDict(), "conjuntos": conjuntos, "trava": threading.Lock()}
+    monkeypatch.setattr(analisador, "servico_ingestao", lambda: servico)
+    monkeypatch.setattr(analisador, "ESPERA_INGESTAO", 0.05)
+    yield servico
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def esperar(chave, *estados):
+    for _ in range(500):
+        estado = analisador.estado_ingestoes([chave])[0]
+        if estado["estado"] in estados:
+            return estado
+        time.sleep(0.01)
+    raise AssertionError(f"tarefa não chegou a {estados}")
+
+
+def test_leitura_em_segundo_plano_com_progresso_e_sem_duplicar(servico, monkeypatch):
+    leitura = Leitura()
+    monkeypatch.setattr(analisador, "carregar_dados", leitura)
+    estado, chave, resultado = analisador.solicitar_ingestao(b"arquivo", "ENERGIA")
+    assert estado in ("fila", "lendo") and resultado is None
+    assert esperar(chave, "lendo")["progresso"] == {"linhas": 100, "total_linhas": 1000, "abas": 0, "total_abas": 1}
+    # o mesmo arquivo pedido de novo durante a leitura não inicia outra
+    assert analisador.solicitar_ingestao(b"arquivo", "ENERGIA")[0] == "lendo"
+    leitura.liberar.set()
+    esperar(chave, "pronta")
+    estado, _, df = analisador.solicitar_ingestao(b"arquivo", "ENERGIA")
+    assert estado == "pronta" and len(df) == 3 and leitura.chamadas == 1
+    assert servico["conjuntos"]["contadores"]["acertos"] == 1 and servico["conjuntos"]["contadores"]["falhas"] == 1
+
+
+def test_cancelamento_quando_ninguem_mais_espera(servico, monkeypatch):
+    leitura = Leitura()
+    monkeypatch.setattr(analisador, "carregar_dados", leitura)
+    _, chave, _ = analisador.solicitar_ingestao(b"grande", "ENERGIA")
+    tarefa = servico["tarefas"][chave]
+    esperar(chave, "lendo")
+    analisador.liberar_ingestoes([chave])
+    tarefa["futuro"].result(timeout=5)
+    assert tarefa["estado"] == "cancelada" and chave not in servico["tarefas"]
+    assert analisador.estado_ingestoes([chave])[0]["estado"] == "cancelada"
+    # um novo pedido recomeça a leitura
+    leitura.liberar.set()
+    analisador.solicitar_ingestao(b"grande", "ENERGIA")
+    esperar(chave, "pronta")
+    assert leitura.chamadas == 2
+
+
+def test_erro_informado_e_novo_envio_tenta_de_novo(servico, monkeypatch):
+    leitura = Leitura(erro="Formato de data/hora inválido.")
+    leitura.liberar.set()
+    monkeypatch.setattr(analisador, "carregar_dados", leitura)
+    _, chave, _ = analisador.solicitar_ingestao(b"quebrado", "ENERGIA")
+    assert esperar(chave, "erro")["resultado"] == "Formato de data/hora inválido."
+    assert analisador.solicitar_ingestao(b"quebrado", "ENERGIA")[0] == "erro" and leitura.chamadas == 1
+    analisador.liberar_ingestoes([chave])
+    leitura.erro = None
+    analisador.solicitar_ingestao(b"quebrado", "ENERGIA")
+    esperar(chave, "pronta")
+    assert leitura.chamadas == 2
@@ -0,0 +1,76 @@
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+
+import temperature_analyzer_web as analisador
+
+
+class Registros(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.linhas = []
+
+    def emit(self, registro):
+        self.linhas.append(registro.getMessage())
+
+
+@pytest.fixture
+def log(monkeypatch):
+    manipulador = Registros()
+    monkeypatch.setattr(analisador.logger_desempenho, "level", logging.INFO)
+    analisador.logger_desempenho.addHandler(manipulador)
+    yield manipulador
+    analisador.logger_desempenho.removeHandler(manipulador)
+
+
+def dados(n=5000):
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=n, freq="min"), "Temperatura": np.arange(n) % 17 * 1.0, "Aba": "A"})
+    df.attrs["chave"] = "instrumentacao"
+    return analisador.indexar_tempo(df)
+
+
+def test_sem_medicao_nada_e_registrado():
+    assert analisador.medicao_atual() is None
+    analisador.marcar("etapa")
+    analisador.registrar_cache("filtros/posicoes", True)
+    assert analisador.posicoes_filtradas(dados(), [{"tipo": "hora", "hora": "00:10"}]) is not None
+
+
+def test_etapas_funcoes_caches_e_tamanhos(log):
+    df = dados()
+    cache = analisador.novo_cache_filtros()
+    filtros = [{"tipo": "valor", "coluna": "Temperatura", "min": 2.0, "max": 5.0}]
+    medicao = analisador.iniciar_medicao()
+    try:
+        analisador.marcar("inicio")
+        for _ in range(3):
+            analisador.posicoes_filtradas(df, filtros, cache)
+        analisador.marcar("filtros")
+        analisador.registrar_tamanho("página da tabela", 1234)
+        analisador.registrar_contexto(modo="SITRAD", linhas=len(df))
+    finally:
+        registro = analisador.finalizar_medicao(medicao)
+    assert analisador.medicao_atual() is None
+    assert [e["etapa"] for e in registro["etapas"]] == ["inicio", "filtros"]
+    assert registro["funcoes"]["posicoes_filtradas"]["chamadas"] == 3
+    assert registro["cache"]["filtros/posicoes"] == {"acertos": 2, "falhas": 1}
+    assert registro["cache"]["filtros/mascara"] == {"acertos": 0, "falhas": 1}
+    assert registro["tamanhos"] == {"página da tabela": 1234}
+    assert registro["modo"] == "SITRAD" and registro["linhas"] == len(df)
+    # uma linha JSON por execução no log estruturado, e o mesmo registro na sessão para o painel
+    assert len(log.linhas) == 1 and json.loads(log.linhas[0])["funcoes"]["posicoes_filtradas"]["chamadas"] == 3
+    assert st.session_state["medicao_anterior"] == registro
+
+
+def test_perfil_de_uma_execucao(log):
+    medicao = analisador.iniciar_medicao(perfilar=True)
+    try:
+        analisador.calcular_estatisticas(dados(), ["Temperatura"])
+    finally:
+        analisador.finalizar_medicao(medicao)
+    perfil = st.session_state["perfil_execucao"]
+    assert "calcular_estatisticas" in perfil["texto"] and perfil["dados"]
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def dados(fuso=None):
+    rng = np.random.default_rng(0)
+    datas = pd.Series(pd.date_range("2024-03-09", periods=5000, freq="37s", tz=fuso)).sample(frac=1, random_state=1)
+    datas.iloc[::97] = pd.NaT
+    return analisador.indexar_tempo(pd.DataFrame({"DataHora": datas.to_numpy(), "Temperatura": rng.normal(size=len(datas)), "Aba": "A"}))
+
+
+@pytest.mark.parametrize("fuso", [None, analisador.FUSO_ENERGIA])
+def test_indexacao_ordena_com_nat_no_fim(fuso):
+    df = dados(fuso)
+    validas = analisador.posicao_nat(df)
+    assert df["DataHora"].iloc[:validas].is_monotonic_increasing
+    assert df["DataHora"].iloc[validas:].isna().all() and validas == df["DataHora"].notna().sum()
+    esperado = (df["DataHora"].dt.hour * 60 + df["DataHora"].dt.minute).fillna(-1)
+    assert (df["MinutoDia"] == esperado).all()
+
+
+@pytest.mark.parametrize("fuso", [None, analisador.FUSO_ENERGIA])
+@pytest.mark.parametrize("inicio, fim", [("2024-03-09 10:00:00", "2024-03-09 12:30:00"), ("2024-03-08", "2024-03-09 00:00:37"), ("2024-03-10 23:00:00", "2024-03-12"), ("2024-03-11", "2024-03-10")])
+def test_fatia_igual_a_mascara_booleana(fuso, inicio, fim):
+    df = dados(fuso)
+    a, b = (analisador.alinhar_fuso(v, df["DataHora"]) for v in (inicio, fim))
+    esperado = df[(df["DataHora"] >= a) & (df["DataHora"] <= b)]
+    pd.testing.assert_frame_equal(analisador.fatiar_intervalo(df, inicio, fim), esperado)
+
+
+def test_faixa_no_salto_do_horario_de_verao():
+    # em 04/11/2018 os relógios de São Paulo pularam de 00:00 para 01:00: 00:30 não existe nesse dia
+    datas = pd.date_range("2018-11-02 12:00", "2018-11-05", freq="5min", tz=analisador.FUSO_ENERGIA)
+    df = analisador.indexar_tempo(pd.DataFrame({"DataHora": datas, "Potência": np.arange(len(datas), dtype=float), "Aba": "A"}))
+    inicio, fim = analisador.intervalo_faixa({"inicio": "2018/11/02 13:00:00", "fim": "2018/11/04 00:30:00"})
+    fatia = analisador.fatiar_intervalo(df, inicio, fim)
+    assert fatia["DataHora"].iloc[0] == pd.Timestamp("2018-11-02 13:00", tz=analisador.FUSO_ENERGIA)
+    assert fatia["DataHora"].iloc[-1] == pd.Timestamp("2018-11-04 01:00", tz=analisador.FUSO_ENERGIA)
+    resumo = analisador.resumo_intervalo(df, analisador.piramide_dados(df, "ENERGIA"), ["Potência"], inicio, fim)
+    assert resumo["Potência"]["total"] == len(fatia)
+    assert resumo["Potência"]["soma"] == fatia["Potência"].sum()
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def referencia(caminho):
+    # leitura original: o CSV inteiro de uma vez, com conversões coluna a coluna
+    df = pd.read_csv(caminho)
+    columns = ["DataHora", "Potência"] + [f"Potência_Trafo{i+2}" for i in range(min(3, len(df.columns)-2))]
+    df = df.iloc[:, :len(columns)]
+    df.columns = columns
+    if pd.api.types.is_numeric_dtype(df["DataHora"]):
+        df["DataHora"] = pd.to_datetime(df["DataHora"], unit="ms", errors="coerce").dt.tz_localize("UTC").dt.tz_convert(analisador.FUSO_ENERGIA)
+    else:
+        df["DataHora"] = pd.to_datetime(df["DataHora"], errors="coerce")
+    for col in columns[1:]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["Aba"] = "ENERGIA"
+    return df
+
+
+def comparar(df, esperado):
+    assert list(df.columns) == list(esperado.columns)
+    pd.testing.assert_series_equal(df["DataHora"], esperado["DataHora"], check_dtype=False)
+    for col in esperado.columns[1:-1]:
+        assert df[col].dtype == np.float32
+        np.testing.assert_allclose(df[col].to_numpy(dtype="float64"), esperado[col].astype("float32").to_numpy(dtype="float64"), equal_nan=True)
+    assert (df["Aba"] == "ENERGIA").all()
+
+
+def test_epoch_em_blocos(arquivo_sintetico):
+    caminho = arquivo_sintetico("ENERGIA", 12345)
+    comparar(analisador.ler_csv_energia(caminho, linhas_por_bloco=1000), referencia(caminho))
+
+
+@pytest.mark.filterwarnings("ignore:Could not infer format")
+@pytest.mark.parametrize("linhas_por_bloco", [3, 1000])
+def test_datas_em_texto_e_valores_invalidos(tmp_path, linhas_por_bloco):
+    caminho = tmp_path / "energia.csv"
+    caminho.write_text("data,p,t2\n2024-01-01 00:00:00,1.5,2\n2024-01-01 00:00:10,erro,3\n2024-01-01 00:00:20,,4\nx,7,8\n2024-01-01 00:00:40,9,10\n", encoding="utf-8")
+    comparar(analisador.ler_csv_energia(str(caminho), linhas_por_bloco=linhas_por_bloco), referencia(caminho))
+
+
+def test_progresso_e_leitura_de_bytes(arquivo_sintetico):
+    caminho = arquivo_sintetico("ENERGIA", 5000)
+    eventos = []
+    df = analisador.ler_csv_energia(open(caminho, "rb").read(), linhas_por_bloco=2000, progresso=lambda lidas, total: eventos.append((lidas, total)))
+    comparar(df, referencia(caminho))
+    assert [lidas for lidas, _ in eventos] == [2000, 4000, 5000]
+    assert all(total >= lidas for lidas, total in eventos)
+
+
+def test_arquivo_sem_colunas_suficientes(tmp_path):
+    caminho = tmp_path / "energia.csv"
+    caminho.write_text("data\n2024-01-01\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="pelo menos 2 colunas"):
+        analisador.ler_csv_energia(str(caminho))
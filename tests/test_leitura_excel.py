@@ -0,0 +1,96 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def planilha_sitrad():
+    rng = np.random.default_rng(1)
+    buf = BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        for i, n in enumerate([300, 250, 5]):
+            dados = pd.DataFrame({"Data/Hora": pd.date_range("2024-01-01", periods=n, freq="min") + pd.Timedelta(seconds=i), "Temperatura": rng.normal(4, 2, n).round(1), "Extra 1": rng.normal(10, 1, n).round(1)})
+            dados.loc[dados.index % 37 == 0, "Temperatura"] = np.nan
+            dados.to_excel(writer, sheet_name=f"Instrumento {i + 1}", index=False)
+    return buf.getvalue()
+
+
+def planilha_datalogger():
+    buf = BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        pd.DataFrame({"Campo": ["Modelo"], "Valor": ["X"]}).to_excel(writer, sheet_name="Resumo", index=False)
+        pd.DataFrame({"Nº": range(1, 201), "Data/Hora": pd.date_range("2024-01-01", periods=200, freq="5min"), "Temperatura": np.linspace(-5, 5, 200), "Umidade": np.linspace(40, 80, 200)}).to_excel(writer, sheet_name="Dados", index=False)
+    return buf.getvalue()
+
+
+def referencia(conteudo, modo):
+    # leitura original: pd.ExcelFile + normalização por aba, depois ordenação estável por DataHora
+    excel = pd.ExcelFile(BytesIO(conteudo))
+    abas = excel.sheet_names if modo == "SITRAD" else excel.sheet_names[1:2]
+    dados = [analisador.normalizar_aba(excel.parse(sheet), modo, sheet) for sheet in abas]
+    return pd.concat(dados, ignore_index=True).sort_values("DataHora", kind="stable", ignore_index=True)
+
+
+def comparar(df, esperado):
+    pd.testing.assert_frame_equal(df.drop(columns=analisador.COLUNAS_INTERNAS), esperado, check_dtype=False)
+
+
+@pytest.mark.parametrize("modo, gerar", [("SITRAD", planilha_sitrad), ("DATALOGGER", planilha_datalogger)])
+def test_leitura_igual_ao_pandas(modo, gerar):
+    conteudo = gerar()
+    comparar(analisador.ler_arquivo(conteudo, modo), referencia(conteudo, modo))
+
+
+def test_leitura_em_processos_e_com_progresso(monkeypatch):
+    conteudo = planilha_sitrad()
+    esperado = referencia(conteudo, "SITRAD")
+    monkeypatch.setattr(analisador, "MAX_WORKERS", 2)
+    comparar(analisador.ler_arquivo(conteudo, "SITRAD"), esperado)
+    eventos = []
+    comparar(analisador.ler_arquivo(conteudo, "SITRAD", progresso=lambda **p: eventos.append(p)), esperado)
+    assert eventos[-1]["abas"] == eventos[-1]["total_abas"] == 3
+    assert eventos[-1]["linhas"] == len(esperado)
+
+
+def test_progresso_sequencial_por_bloco(monkeypatch):
+    conteudo = planilha_sitrad()
+    monkeypatch.setattr(analisador, "MAX_WORKERS", 1)
+    monkeypatch.setattr(analisador, "LINHAS_PROGRESSO", 100)
+    eventos = []
+    df = analisador.ler_arquivo(conteudo, "SITRAD", aba="Instrumento 1", progresso=lambda **p: eventos.append(p))
+    assert len(df) == 300
+    assert [e["linhas"] for e in eventos] == [100, 200, 300, 300]
+
+
+def test_caminho_xls_le_as_abas_do_workbook_aberto():
+    conteudo = planilha_sitrad()
+    assert analisador.abrir_xls(conteudo) is None  # xlsx segue pelo openpyxl
+    with pd.ExcelFile(BytesIO(conteudo)) as xls:
+        dados = analisador.ler_abas_xls(xls, xls.sheet_names, "SITRAD")
+    comparar(analisador.indexar_tempo(pd.concat(dados, ignore_index=True)), referencia(conteudo, "SITRAD"))
+
+
+def test_leitura_a_partir_de_uma_linha():
+    conteudo = planilha_datalogger()
+    cabecalho, registros, anterior = analisador.ler_registros_excel(conteudo, "Dados", 150)
+    completo = pd.read_excel(BytesIO(conteudo), sheet_name="Dados", header=None)
+    assert cabecalho[1] == "Data/Hora"
+    assert len(registros) == 50
+    assert anterior[0] == completo.iloc[150, 0] and registros[0][0] == completo.iloc[151, 0]
+
+
+def test_abas_listadas_uma_vez_por_arquivo(monkeypatch):
+    listar_abas = analisador.listar_abas
+    chamadas = []
+    monkeypatch.setattr(analisador, "listar_abas", lambda arquivo: chamadas.append(1) or listar_abas(arquivo))
+    conteudo = planilha_sitrad()
+    for _ in range(3):
+        assert analisador.abas_arquivo(BytesIO(conteudo)) == ["Instrumento 1", "Instrumento 2", "Instrumento 3"]
+    assert len(chamadas) == 1
+
+
+def test_processos_nao_sao_criados_por_fork():
+    assert analisador.contexto_processos().get_start_method() in ("forkserver", "spawn")
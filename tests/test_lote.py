@@ -0,0 +1,50 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import processar_lote
+
+CONFIGURACAO = {
+    "filtros": [{"tipo": "valor", "coluna": "Temperatura", "min": 0.0, "max": 8.0}],
+    "faixas": [{"inicio": "2024/01/01 02:00:00", "fim": "2024/01/01 05:00:00", "nome": "madrugada"}, {"inicio": "ontem", "fim": "hoje", "nome": "invalida"}],
+    "excursoes": [{"coluna": "Temperatura", "max": 7.0}],
+    "formato_relatorio": "csv.gz",
+}
+
+
+@pytest.fixture
+def diretorio(tmp_path, arquivo_sintetico):
+    entrada = tmp_path / "entrada"
+    entrada.mkdir()
+    for modo in ["SITRAD", "ENERGIA"]:
+        caminho = arquivo_sintetico(modo, 3000)
+        shutil.copy(caminho, entrada / f"{modo.lower()}{os.path.splitext(caminho)[1]}")
+    (entrada / "quebrado.xlsx").write_bytes(b"isto nao e uma planilha")
+    return entrada
+
+
+def executar(diretorio, saida, workers):
+    progresso = []
+    resumo = processar_lote.processar_lote(str(diretorio), CONFIGURACAO, str(saida), None, workers, lambda *args: progresso.append(args[:2]))
+    assert sorted(progresso) == [(i, 3) for i in range(1, 4)]
+    return resumo
+
+
+def test_lote_em_paralelo_igual_ao_sequencial(diretorio, tmp_path):
+    sequencial = executar(diretorio, tmp_path / "sequencial", 1)
+    paralelo = executar(diretorio, tmp_path / "paralelo", 2)
+    # um arquivo com erro não interrompe o lote
+    assert [(os.path.basename(r["arquivo"]), r["status"]) for r in sequencial] == [("energia.csv", "ok"), ("quebrado.xlsx", "erro"), ("sitrad.xlsx", "ok")]
+    sem_tempo = lambda resumo: [{k: v for k, v in r.items() if k not in ("tempo", "saidas")} for r in resumo]
+    assert sem_tempo(paralelo) == sem_tempo(sequencial)
+    assert any(aviso.startswith("Faixa invalida") for aviso in sequencial[2]["avisos"])
+    nomes = sorted(os.listdir(tmp_path / "sequencial"))
+    assert nomes == sorted(os.listdir(tmp_path / "paralelo"))
+    assert {"resumo_lote.json", "sitrad_excursoes.csv", "sitrad_madrugada.xlsx", "sitrad_relatorio.csv.gz", "energia_energia.csv"} <= set(nomes)
+    for nome in nomes:
+        if nome.endswith(".csv"):
+            assert (tmp_path / "sequencial" / nome).read_bytes() == (tmp_path / "paralelo" / nome).read_bytes(), nome
+    with open(tmp_path / "paralelo" / "resumo_lote.json", encoding="utf-8") as f:
+        assert [r["status"] for r in json.load(f)] == ["ok", "erro", "ok"]
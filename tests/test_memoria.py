@@ -0,0 +1,39 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=5000, chave=None):
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=n, freq="min"), "Temperatura": np.arange(n, dtype=float), "Aba": [f"Aba {i % 7}" for i in range(n)]})
+    if chave:
+        df.attrs["chave"] = chave
+    return df
+
+
+def test_tamanho_igual_ao_memory_usage_do_pandas():
+    df = dados()
+    assert analisador.tamanho_objeto(df) == df.memory_usage(deep=True).sum()
+    assert analisador.tamanho_objeto(df["Aba"]) == df["Aba"].memory_usage(index=True, deep=True)
+    assert analisador.tamanho_objeto({"a": df, "b": [df, df["Temperatura"].to_numpy()]}) > df.memory_usage(deep=True).sum() + df["Temperatura"].to_numpy().nbytes
+
+
+def test_conjunto_com_chave_e_medido_uma_vez(monkeypatch):
+    df = dados(chave="conjunto-medido")
+    esperado = int(df.memory_usage(deep=True).sum())
+    assert analisador.tamanho_dataframe(df) == esperado
+    medicoes = []
+    monkeypatch.setattr(pd.DataFrame, "memory_usage", lambda self, *a, **k: medicoes.append(1) or pd.Series([0]))
+    assert analisador.tamanho_dataframe(df) == esperado and not medicoes
+    filtrado = df.iloc[:100]
+    filtrado.attrs["filtros"] = ("x",)
+    analisador.tamanho_dataframe(filtrado)  # recorte filtrado é outro objeto: medido à parte
+    assert medicoes == [1]
+
+
+def test_objetos_repetidos_sao_contados_uma_vez():
+    df = dados(100)
+    lista = [df, df]
+    assert analisador.tamanho_objeto(lista) == sys.getsizeof(lista) + df.memory_usage(deep=True).sum()
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n, freq="7s", fuso=None):
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-03-01", periods=n, freq=freq, tz=fuso), "Temperatura": rng.normal(4, 2, n), "Aba": "A"})
+    df.loc[rng.random(n) < 0.02, "Temperatura"] = np.nan
+    return analisador.indexar_tempo(df)
+
+
+@pytest.mark.parametrize("freq", analisador.NIVEIS_PIRAMIDE)
+def test_niveis_iguais_ao_resample(freq):
+    df = dados(200000)
+    piramide = analisador.construir_piramide(df, ["Temperatura"])
+    grupos = df.set_index("DataHora")["Temperatura"].resample(freq)
+    esperado = pd.DataFrame({"count": grupos.count(), "min": grupos.min(), "max": grupos.max(), "sum": grupos.sum()})
+    esperado = esperado[grupos.size() > 0]
+    nivel = piramide[freq]["Temperatura"]
+    pd.testing.assert_frame_equal(nivel[["count", "min", "max"]], esperado[["count", "min", "max"]], check_dtype=False, check_names=False, check_freq=False)
+    np.testing.assert_allclose(nivel["sum"], esperado["sum"])
+
+
+@pytest.mark.parametrize("fuso", [None, analisador.FUSO_ENERGIA])
+@pytest.mark.parametrize("inicio, fim", [("2024-03-01 00:00:03", "2024-03-01 00:00:50"), ("2024-03-01 05:17:40", "2024-03-02 13:02:09"), ("2024-03-01 23:59:59", "2024-03-15 00:00:01"), ("2024-02-01", "2024-05-01")])
+def test_resumo_de_faixa_igual_ao_calculo_direto(fuso, inicio, fim):
+    df = dados(200000, fuso=fuso)
+    piramide = analisador.construir_piramide(df, ["Temperatura"])
+    resumo = analisador.resumo_intervalo(df, piramide, ["Temperatura"], inicio, fim)
+    trecho = analisador.fatiar_intervalo(df, inicio, fim)["Temperatura"]
+    r = resumo["Temperatura"]
+    assert (r["total"], r["validos"], r["min"], r["max"]) == (len(trecho), trecho.count(), trecho.min(), trecho.max())
+    assert r["soma"] == pytest.approx(trecho.sum())
+
+
+def test_grafico_de_faixa_nao_mistura_leituras_de_fora():
+    df = dados(300000)
+    inicio, fim = pd.Timestamp("2024-03-02 10:20:30"), pd.Timestamp("2024-03-15 07:45:10")
+    dentro = (df["DataHora"] >= inicio) & (df["DataHora"] <= fim)
+    df.loc[~dentro, "Temperatura"] = 1000.0  # qualquer vazamento das bordas aparece no máximo
+    piramide = analisador.construir_piramide(df, ["Temperatura"])
+    trecho = analisador.fatiar_intervalo(df, inicio, fim)
+    primeiro, ultimo = trecho["DataHora"].iloc[[0, -1]]
+    x, y = analisador.serie_agregada(trecho, piramide, "Temperatura", primeiro, ultimo, 1000)
+    assert len(x) <= 1000
+    assert x.min() >= primeiro and x.max() <= ultimo
+    assert y.max() == trecho["Temperatura"].max() and y.min() == trecho["Temperatura"].min()
+
+
+def test_piramide_so_para_series_muito_maiores_que_o_limite():
+    df = dados(20000, freq="min")
+    piramide = analisador.construir_piramide(df, ["Temperatura"])
+    x, y = analisador.dados_serie(df, "Temperatura", piramide=piramide, max_pontos=4000)
+    assert len(x) == len(df)  # a redução mínimo/máximo é feita depois, sobre os dados brutos
+    grande = dados(2000000, freq="s")
+    piramide = analisador.construir_piramide(grande, ["Temperatura"])
+    x, y = analisador.dados_serie(grande, "Temperatura", piramide=piramide, max_pontos=4000)
+    assert 1000 <= len(x) <= 4000
+    assert y.max() == grande["Temperatura"].max() and y.min() == grande["Temperatura"].min()
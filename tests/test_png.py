@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import plotly.graph_objects as go
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+class Renderizador:
+    # substitui pio.from_json(spec).to_image: conta as renderizações e falha nas primeiras `falhas` chamadas
+    def __init__(self, falhas=0):
+        self.chamadas = 0
+        self.falhas = falhas
+
+    def __call__(self, spec):
+        return self
+
+    def to_image(self, format):
+        self.chamadas += 1
+        if self.chamadas <= self.falhas:
+            raise RuntimeError("kaleido travou")
+        return b"\x89PNG"
+
+
+@pytest.fixture
+def servico(monkeypatch):
+    disponivel = Future()
+    disponivel.set_result(True)
+    executor = ThreadPoolExecutor(max_workers=1)
+    servico = {"executor": executor, "disponivel": disponivel, "cache": OrderedDict(), "tarefas": {}, "erros": OrderedDict(), "trava": threading.Lock()}
+    monkeypatch.setattr(analisador, "servico_png", lambda: servico)
+    yield servico
+    executor.shutdown(wait=True)
+
+
+def solicitar(servico, chave):
+    analisador.solicitar_png(go.Figure(), chave)
+    with servico["trava"]:
+        tarefa = servico["tarefas"].get(chave)
+    if tarefa is not None:
+        tarefa.result()
+
+
+def test_cache_de_png(servico, monkeypatch):
+    renderizador = Renderizador()
+    monkeypatch.setattr(analisador.pio, "from_json", renderizador)
+    assert analisador.estado_png("a") == ("pendente", None)
+    solicitar(servico, "a")
+    solicitar(servico, "a")
+    assert analisador.estado_png("a") == ("pronto", b"\x89PNG")
+    assert renderizador.chamadas == 1
+    solicitar(servico, "b")
+    assert renderizador.chamadas == 2
+
+
+def test_falha_informada_uma_vez_e_novo_pedido_tenta_de_novo(servico, monkeypatch):
+    renderizador = Renderizador(falhas=1)
+    monkeypatch.setattr(analisador.pio, "from_json", renderizador)
+    solicitar(servico, "a")
+    # a espera em segundo plano só consulta; a sessão que pediu recebe a falha, e o serviço a esquece
+    assert analisador.estado_png("a", informar=False) == ("erro", "kaleido travou")
+    assert analisador.estado_png("a") == ("erro", "kaleido travou")
+    assert analisador.estado_png("a") == ("pendente", None)
+    solicitar(servico, "a")
+    assert analisador.estado_png("a") == ("pronto", b"\x89PNG")
+
+
+def test_falhas_limitadas_e_com_prazo(servico, monkeypatch):
+    monkeypatch.setattr(analisador.pio, "from_json", Renderizador(falhas=100))
+    monkeypatch.setattr(analisador, "MAX_PNGS_CACHE", 3)
+    for chave in "abcde":
+        solicitar(servico, chave)
+    assert list(servico["erros"]) == ["c", "d", "e"]
+    agora = analisador.time.time()
+    monkeypatch.setattr(analisador.time, "time", lambda: agora + analisador.PRAZO_ERRO_PNG + 1)
+    assert analisador.estado_png("e") == ("pendente", None)
+    assert not servico["erros"]
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from plotly.subplots import make_subplots
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=60000):
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=n, freq="min"), "Temperatura": rng.normal(5, 3, n).round(1),
+                       "Umidade": rng.uniform(20, 90, n).round(1), "Aba": "Dados"})
+    df.loc[rng.random(n) < 0.01, ["Temperatura", "Umidade"]] = np.nan
+    return analisador.indexar_tempo(df)
+
+
+def test_pontos_filtrados_sao_colunas_sem_nan():
+    df = dados(500)
+    filtros = [{"tipo": "hora", "hora": "00:10"}]
+    _, pontos = analisador.aplicar_filtros(df, "DATALOGGER", filtros)
+    assert list(pontos.columns) == analisador.COLUNAS_PONTOS
+    linhas = df[df["MinutoDia"] == 10]
+    esperado = sum(linhas[col].notna().sum() for col in ["Temperatura", "Umidade"])
+    assert len(pontos) == esperado and pontos["Valor"].notna().all()
+    assert set(pontos["Tipo"]) <= {"Temperatura", "Umidade"}
+    assert analisador.pontos_como_lista(pontos)[0] == (pontos["DataHora"].iloc[0].strftime("%Y/%m/%d %H:%M:%S"), pontos["Valor"].iloc[0], pontos["Tipo"].iloc[0])
+
+
+def test_muitos_pontos_viram_um_trace_por_serie():
+    df = dados()
+    _, pontos = analisador.aplicar_filtros(df, "DATALOGGER", [{"tipo": "valor", "coluna": "Umidade", "min": 20.0, "max": 80.0}])
+    assert len(pontos) > 40000
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    analisador.adicionar_trace_pontos(fig, pontos, "Filtro", "orange")
+    assert len(fig.data) == 1
+    trace = fig.data[0]
+    assert trace.type == "scattergl" and trace.text is None and trace.yaxis == "y2"
+    assert len(trace.x) == len(pontos)
+
+
+def test_poucos_pontos_levam_rotulos():
+    pontos = pd.DataFrame({"DataHora": pd.to_datetime(["2024-01-01 00:00", "2024-01-01 00:05", "2024-01-01 00:10"]),
+                           "Valor": [1.3, 2.0, 55.0], "Tipo": ["Temperatura", "Temperatura", "Umidade"]})
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    analisador.adicionar_trace_pontos(fig, pontos, "Marcado", "red")
+    assert [t.name for t in fig.data] == ["Temperatura (Marcado)", "Umidade (Marcado)"]
+    assert fig.data[0].type == "scatter" and list(fig.data[0].text) == ["2024/01/01 00:00:00\n1.3", "2024/01/01 00:05:00\n2.0"]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+import temperature_analyzer_web as analisador
+
+
+def serie(n, semente=0):
+    rng = np.random.default_rng(semente)
+    y = pd.Series(rng.normal(0, 1, n).cumsum())
+    y[rng.random(n) < 0.01] = np.nan
+    return pd.Series(pd.date_range("2024-01-01", periods=n, freq="s")), y
+
+
+def test_serie_curta_nao_e_reduzida():
+    x, y = serie(500)
+    rx, ry = analisador.reduzir_pontos(x, y, 600)
+    assert rx is x and ry is y
+
+
+def test_minimo_e_maximo_de_cada_intervalo_sao_mantidos():
+    x, y = serie(100000)
+    max_pontos = 900
+    rx, ry = analisador.reduzir_pontos(x, y, max_pontos)
+    assert len(rx) <= max_pontos
+    assert rx.index.is_monotonic_increasing and rx.index.is_unique
+    tamanho = int(np.ceil(len(y) / (max_pontos // 3)))
+    grupos = y.groupby(np.arange(len(y)) // tamanho)
+    escolhidos = ry.groupby(ry.index // tamanho)
+    pd.testing.assert_series_equal(escolhidos.min(), grupos.min(), check_names=False)
+    pd.testing.assert_series_equal(escolhidos.max(), grupos.max(), check_names=False)
+    # intervalos com leitura ausente mantêm um NaN, que interrompe a linha do gráfico
+    assert set(ry[ry.isna()].index // tamanho) == set(np.flatnonzero(grupos.apply(lambda g: g.isna().any())))
+    assert ry.max() == y.max() and ry.min() == y.min()
+    pd.testing.assert_series_equal(rx, x.loc[rx.index])
@@ -0,0 +1,48 @@
+import gzip
+from io import BytesIO
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=2500):
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame({"DataHora": pd.date_range("2024-01-01", periods=n, freq="30s", tz=analisador.FUSO_ENERGIA), "Potência": rng.normal(5000, 300, n).astype("float32"), "Aba": pd.Categorical(["ENERGIA"] * n)})
+    df.loc[7, "Potência"] = np.nan
+    return analisador.indexar_tempo(df)
+
+
+ESTATISTICAS = {"Arquivo": "teste", "Máxima Potência": 1.5, "Pontos": [1, 2]}
+
+
+def test_csv_gz_igual_ao_csv_do_pandas(monkeypatch):
+    monkeypatch.setattr(analisador, "LINHAS_POR_BLOCO_EXPORTACAO", 1000)
+    df = dados()
+    arquivos = dict(analisador.gerar_relatorio(df, "ENERGIA", ESTATISTICAS, None, "csv.gz", "r"))
+    assert set(arquivos) == {"r.csv.gz", "r_estatisticas.csv"}
+    assert gzip.decompress(arquivos["r.csv.gz"]).decode("utf-8") == analisador.preparar_exportacao(df).to_csv(index=False)
+
+
+def test_parquet_preserva_tipos_e_valores():
+    pytest.importorskip("pyarrow")
+    df = dados()
+    arquivos = dict(analisador.gerar_relatorio(df, "ENERGIA", ESTATISTICAS, None, "parquet", "r"))
+    pd.testing.assert_frame_equal(pd.read_parquet(BytesIO(arquivos["r.parquet"])), df.drop(columns=analisador.COLUNAS_INTERNAS))
+
+
+def test_xlsx_divide_os_dados_no_limite_de_linhas(monkeypatch):
+    monkeypatch.setattr(analisador, "LIMITE_LINHAS_EXCEL", 1001)
+    df = dados()
+    abas = analisador.abas_dados(df, limite=analisador.LIMITE_LINHAS_EXCEL - 1)
+    assert [(nome, len(parte)) for nome, parte in abas] == [("Dados", 1000), ("Dados_2", 1000), ("Dados_3", 500)]
+    (nome, conteudo), = analisador.gerar_relatorio(df.iloc[:50], "ENERGIA", ESTATISTICAS, None, "xlsx", "r")
+    wb = openpyxl.load_workbook(BytesIO(conteudo), read_only=True)
+    assert nome == "r.xlsx" and wb.sheetnames == ["Dados", "Estatísticas"]
+    # float32 é gravado pela sua menor representação decimal, como o pandas o exibe
+    assert [linha[1] for linha in wb["Dados"].iter_rows(values_only=True)][1:] == [None if np.isnan(v) else float(str(v)) for v in df["Potência"].to_numpy()[:50]]
+    assert list(wb["Estatísticas"].iter_rows(values_only=True))[1] == ("teste", 1.5, "[1, 2]")
+    wb.close()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import temperature_analyzer_web as analisador
+
+
+def dados(n=2345):
+    rng = np.random.default_rng(17)
+    datas = pd.Series(pd.date_range("2024-01-01", periods=n, freq="min"))
+    datas.iloc[rng.choice(n, 20, replace=False)] = pd.NaT
+    df = pd.DataFrame({"DataHora": datas, "Temperatura": rng.integers(0, 40, n).astype(float), "Aba": rng.choice(["B", "A", "C"], n)})
+    df.loc[rng.random(n) < 0.05, "Temperatura"] = np.nan
+    return analisador.indexar_tempo(df)
+
+
+@pytest.mark.parametrize("coluna", ["DataHora", "Temperatura", "Aba"])
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_paginas_iguais_a_ordenacao_do_pandas(coluna, decrescente):
+    df = dados()
+    cache = analisador.novo_cache_filtros()
+    ordenado = analisador.preparar_exportacao(df.sort_values(coluna, ascending=not decrescente, kind="stable", na_position="last"))
+    paginas = [analisador.pagina_tabela(df, p, 500, coluna, decrescente, cache) for p in range(1, 6)]
+    pd.testing.assert_frame_equal(pd.concat(paginas), ordenado)
+    assert len(paginas[-1]) == 345
+
+
+def linhas_da_pagina(df, pagina, tamanho, coluna, decrescente):
+    return df.iloc[analisador.posicoes_pagina(df, (pagina - 1) * tamanho, pagina * tamanho, coluna, decrescente, analisador.novo_cache_filtros())].index
+
+
+@pytest.mark.parametrize("coluna", ["DataHora", "Temperatura"])
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_pagina_do_instante(coluna, decrescente):
+    df = dados()
+    instante = pd.Timestamp("2024-01-02 03:04:30")
+    alvo = df.index[df["DataHora"] >= instante][0]
+    assert alvo in linhas_da_pagina(df, analisador.pagina_do_instante(df, instante, 100, coluna, decrescente), 100, coluna, decrescente)
+    # instante posterior a todas as datas: página da última data válida
+    ultima = df.index[analisador.posicao_nat(df) - 1]
+    assert ultima in linhas_da_pagina(df, analisador.pagina_do_instante(df, "2030-01-01", 100, coluna, decrescente), 100, coluna, decrescente)
+
+
+@pytest.mark.parametrize("coluna", ["DataHora", "Temperatura", "Aba"])
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_recorte_por_posicoes_igual_ao_recorte_copiado(coluna, decrescente):
+    df = dados()
+    filtros = [{"tipo": "valor", "coluna": "Temperatura", "min": 5.0, "max": 30.0}]
+    cache = analisador.novo_cache_filtros()
+    recorte = analisador.posicoes_filtradas(df, filtros, cache)
+    copiado, _ = analisador.aplicar_filtros(df, "SITRAD", filtros)
+    assert analisador.linhas_recorte(df, recorte) == len(copiado)
+    paginas = [analisador.pagina_tabela(df, p, 300, coluna, decrescente, cache, recorte) for p in range(1, 6)]
+    pd.testing.assert_frame_equal(pd.concat(paginas), pd.concat([analisador.pagina_tabela(copiado, p, 300, coluna, decrescente) for p in range(1, 6)]))
+    instante = pd.Timestamp("2024-01-02 03:04:30")
+    assert analisador.pagina_do_instante(df, instante, 100, coluna, decrescente, cache, recorte) == analisador.pagina_do_instante(copiado, instante, 100, coluna, decrescente)